@@ -0,0 +1,180 @@
+import os
+import socket
+import secrets
+import threading
+from datetime import datetime, timedelta
+from pymongo import ReturnDocument
+from database import Database
+
+
+class AccountDeleter:
+    """Delete accounts' predictions in the background, in small _id-range batches.
+
+    Jobs live in db.account_deletions (one per user, keyed by user id), so they survive
+    restarts. A process claims a job by taking a lease and renews it after every batch; if
+    the process dies the lease runs out and any process resumes the job after the last
+    deleted _id. on_finished(user_id) removes the rest of the account once no predictions
+    are left and settle_seconds have passed since the request: until then other processes
+    may still accept the account's cached sessions, so the job waits and sweeps once more.
+    """
+
+    STATUS_FIELDS = {'_id': 0, 'status': 1, 'deleted': 1, 'requested_at': 1, 'started_at': 1, 'finished_at': 1}
+
+    def __init__(self, batch_size=500, batch_delay=0.1, lease_seconds=60, poll_interval=5, settle_seconds=0,
+                 on_finished=None):
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay  # Pause after each batch, capping the delete rate per process
+        self.lease_seconds = lease_seconds
+        self.settle_seconds = settle_seconds
+        self.poll_interval = poll_interval
+        self.on_finished = on_finished
+        self.deleted = 0
+        self.finished = 0
+        self._owner = None
+        self._owner_pid = None
+        self._thread = None
+        self._pid = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def request(self, user_id):
+        """Queue deletion of a user's data (idempotent); returns the job's status token"""
+        job = Database.collection('account_deletions', acknowledged=True).find_one_and_update(
+            {'_id': user_id},
+            {'$setOnInsert': {
+                'token': secrets.token_urlsafe(16),
+                'status': 'pending',
+                'deleted': 0,
+                'last_id': None,
+                'requested_at': datetime.utcnow()
+            }},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        self.start()
+        self._wake.set()
+        return job['token']
+
+    def status(self, token):
+        """Progress of a deletion job by its token, or None"""
+        job = Database.collection('account_deletions').find_one({'token': token}, self.STATUS_FIELDS)
+        if job is None:
+            return None
+        for field in ('requested_at', 'started_at', 'finished_at'):
+            if job.get(field):
+                job[field] = job[field].isoformat() + 'Z'
+        return job
+
+    def start(self):
+        """Start this process's background worker"""
+        # The worker thread does not survive a fork, so start one per process
+        if self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid != os.getpid() or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+                self._pid = os.getpid()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.run_pending()
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def run_pending(self):
+        """Work through claimable jobs until there are none; returns how many finished"""
+        finished = 0
+        while not self._stop.is_set():
+            try:
+                job = self._claim()
+                if job is None:
+                    break
+                finished += self._process(job)
+            except Exception as e:
+                # The job keeps its lease until it runs out, then it is retried
+                print(f"⚠ Warning: Account deletion interrupted: {e}")
+                break
+        return finished
+
+    @property
+    def owner(self):
+        """This process's name on the jobs it holds"""
+        if self._owner_pid != os.getpid():
+            self._owner = f"{socket.gethostname()}:{os.getpid()}:{secrets.token_hex(4)}"
+            self._owner_pid = os.getpid()
+        return self._owner
+
+    def _lease(self):
+        return datetime.utcnow() + timedelta(seconds=self.lease_seconds)
+
+    def _claim(self):
+        now = datetime.utcnow()
+        return Database.collection('account_deletions', acknowledged=True).find_one_and_update(
+            {'$or': [
+                {'status': 'pending'},
+                {'status': 'running', 'lease_until': {'$lt': now}}
+            ]},
+            {'$set': {'status': 'running', 'owner': self.owner, 'lease_until': self._lease()}, '$min': {'started_at': now}},
+            sort=[('requested_at', 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    def _renew(self, user_id, update, lease_until=None):
+        """Record progress and extend the lease; False if another process took the job over"""
+        update.setdefault('$set', {})['lease_until'] = lease_until or self._lease()
+        result = Database.collection('account_deletions', acknowledged=True).update_one(
+            {'_id': user_id, 'owner': self.owner}, update
+        )
+        return result.matched_count == 1
+
+    def _process(self, job):
+        user_id = job['_id']
+        last_id = job.get('last_id')
+        predictions = Database.collection('predictions', acknowledged=True)
+        while True:
+            if self._stop.is_set():
+                return 0
+            query = {'user_id': user_id}
+            if last_id is not None:
+                query['_id'] = {'$gt': last_id}
+            ids = [doc['_id'] for doc in predictions.find(query, {'_id': 1}).sort('_id', 1).limit(self.batch_size)]
+            if not ids:
+                # Writes that landed behind the sweep (e.g. from write-behind) get a second pass
+                if last_id is not None and predictions.find_one({'user_id': user_id}, {'_id': 1}):
+                    last_id = None
+                    continue
+                break
+
+            result = predictions.delete_many({'user_id': user_id, '_id': {'$gte': ids[0], '$lte': ids[-1]}})
+            last_id = ids[-1]
+            self.deleted += result.deleted_count
+            if not self._renew(user_id, {'$inc': {'deleted': result.deleted_count}, '$set': {'last_id': last_id}}):
+                return 0
+            self._stop.wait(self.batch_delay)
+
+        settle_until = job['requested_at'] + timedelta(seconds=self.settle_seconds)
+        if datetime.utcnow() < settle_until:
+            # Keep the lease until then; whichever process claims the job next sweeps from the start
+            self._renew(user_id, {'$set': {'last_id': None}}, lease_until=settle_until)
+            return 0
+
+        if self.on_finished is not None:
+            self.on_finished(user_id)
+        if not self._renew(user_id, {'$set': {'status': 'done', 'finished_at': datetime.utcnow()}}):
+            return 0
+        self.finished += 1
+        return 1
+
+    def stats(self):
+        return {
+            'deleted': self.deleted,
+            'finished': self.finished,
+            'running': bool(self._thread and self._thread.is_alive() and self._pid == os.getpid())
+        }
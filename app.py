@@ -1,81 +1,367 @@
 import os
-import warnings
-warnings.filterwarnings('ignore', category=RuntimeWarning)
-
-import pandas as pd
-import joblib
+import time
+import hmac
 import json
-import jwt
+import pymongo
+import click
 from datetime import datetime, timedelta
-from flask import Flask, request, render_template, jsonify, redirect, url_for, make_response
+from bson import ObjectId
+from flask import Flask, Response, g, request, render_template, jsonify, redirect, url_for, make_response
 from config import Config
 from database import Database
 from models.user import User
 from models.prediction import Prediction
-from auth import token_required
+from models.user_stats import UserStats
+from auth import token_required, admin_required, issue_token
+from encoders import HouseFeatureEncoder, DiabetesFeatureEncoder
+from cache import PredictionCache
+from model_registry import ModelRegistry, replace_model_file
+from batching import MicroBatcher
+from export import ndjson_chunks, csv_chunks, gzip_chunks
+from process_stats import memory_usage
+from password_hashing import HashingOverloaded
+from account_deletion import AccountDeleter
+from http_cache import StaticPages, ResponseCompressor, etagged
+from json_provider import OrjsonProvider
+import metrics
+from metrics import stage, timed_model
 
 # Initialize the app
 app = Flask(__name__)
 app.config.from_object(Config)
+metrics.registry.enabled = Config.METRICS_ENABLED
 
-# Initialize database
-try:
-    Database.initialize()
-    print("✓ Database connected successfully")
-except Exception as e:
-    print(f"⚠ Warning: Could not connect to MongoDB: {e}")
-    print("  Make sure MongoDB is running on localhost:27017")
-    print("  The app will start but database features won't work.")
+if Config.METRICS_ENABLED:
+    @app.before_request
+    def start_request_timer():
+        g.request_start = time.perf_counter()
 
-# Load the trained model
-try:
-    model = joblib.load(Config.MODEL_PATH)
-    print("✓ House price model loaded successfully")
-except Exception as e:
-    print(f"✗ Error loading house price model: {e}")
-    model = None
+    @app.after_request
+    def record_request_metrics(response):
+        # Streamed bodies are still being generated here, so this is the time to the first byte
+        start = g.pop('request_start', None)
+        if start is not None:
+            route = request.url_rule.rule if request.url_rule else 'unmatched'
+            metrics.HTTP_LATENCY.observe(time.perf_counter() - start, route, request.method)
+            metrics.HTTP_REQUESTS.inc(route, request.method, str(response.status_code))
+        return response
 
-# Load the column list
-with open(Config.MODEL_COLUMNS_PATH, 'r') as f:
-    MODEL_COLUMNS = json.load(f)
+# Faster JSON for responses and request bodies
+if Config.JSON_PROVIDER == 'orjson':
+    try:
+        app.json = OrjsonProvider(app)
+    except ImportError as e:
+        print(f"⚠ Warning: {e}; using the standard JSON provider")
 
-# Load diabetes model and scaler
-try:
-    diabetes_model = joblib.load(Config.DIABETES_MODEL_PATH)
-    diabetes_scaler = joblib.load(Config.DIABETES_SCALER_PATH)
-    print("✓ Diabetes model loaded successfully")
-except Exception as e:
-    print(f"✗ Error loading diabetes model: {e}")
-    diabetes_model = None
-    diabetes_scaler = None
+# Compress text responses the client accepts in brotli or gzip
+if Config.HTTP_COMPRESSION:
+    compressor = ResponseCompressor(
+        min_size=Config.HTTP_COMPRESSION_MIN_SIZE,
+        gzip_level=Config.HTTP_GZIP_LEVEL,
+        brotli_quality=Config.HTTP_BROTLI_QUALITY,
+        cache_size=Config.HTTP_COMPRESSION_CACHE_SIZE
+    )
+
+    @app.after_request
+    def compress_response(response):
+        return compressor.apply(response, request.accept_encodings)
+else:
+    compressor = None
+
+# Public pages are the same for everyone: rendered once per process, served as cached bytes
+static_pages = StaticPages()
+STATIC_PAGE_TEMPLATES = ('landing.html', 'login.html', 'signup.html')
+
+# Load the column list and build the feature encoder
+house_encoder = HouseFeatureEncoder.from_file(Config.MODEL_COLUMNS_PATH)
+MODEL_COLUMNS = house_encoder.columns
 
-# Load diabetes model columns
+# Load diabetes model columns and build the feature encoder
 try:
-    with open('diabetes_model_columns.json', 'r') as f:
-        DIABETES_COLUMNS = json.load(f)
+    diabetes_encoder = DiabetesFeatureEncoder.from_file(Config.DIABETES_COLUMNS_PATH)
+    DIABETES_COLUMNS = diabetes_encoder.columns
 except Exception as e:
     print(f"✗ Error loading diabetes columns: {e}")
+    diabetes_encoder = None
     DIABETES_COLUMNS = None
 
+# Map diabetes classes to readable results
+DIABETES_RESULT_MAP = {
+    0: 'No Diabetes',
+    1: 'Prediabetes',
+    2: 'Diabetes'
+}
+
+# Cache model outputs for repeated inputs
+if Config.PREDICTION_CACHE_ENABLED:
+    prediction_cache = PredictionCache(
+        max_entries=Config.PREDICTION_CACHE_MAX_ENTRIES,
+        max_bytes=Config.PREDICTION_CACHE_MAX_BYTES,
+        ttl=Config.PREDICTION_CACHE_TTL
+    )
+else:
+    prediction_cache = None
+
+
+def compile_model(model, label):
+    """Flatten a forest for the NumPy engine when MODEL_ENGINE=compiled (compacted artifacts already are)"""
+    from forest_engine import CompiledForest
+    if isinstance(model, CompiledForest) or Config.MODEL_ENGINE != 'compiled':
+        return model
+    try:
+        return CompiledForest.from_sklearn(model, fallback_rows=Config.MODEL_ENGINE_FALLBACK_ROWS or None)
+    except (TypeError, ValueError) as e:
+        print(f"⚠ Warning: Could not compile {label} model, using sklearn: {e}")
+        return model
+
+
+def index_house_model(model, predictor):
+    """Wrap the house forest in exact lookup tables when HOUSE_LOOKUP_INDEX is set"""
+    if not Config.HOUSE_LOOKUP_INDEX:
+        return predictor
+    from house_index import HouseLookupIndex
+    try:
+        start = time.perf_counter()
+        index = HouseLookupIndex.from_forest(model, house_encoder, Config.HOUSE_LOOKUP_MAX_BEDROOMS, fallback=predictor)
+        print(f"✓ House price lookup index built: {index.table_count} tables, {index.interval_count} intervals "
+              f"in {time.perf_counter() - start:.1f}s")
+        return index
+    except (TypeError, ValueError) as e:
+        print(f"⚠ Warning: Could not build the house price lookup index, using the model: {e}")
+        return predictor
+
+
+# joblib (and sklearn, when unpickling) is imported by the loaders so importing the app stays fast
+def load_house_model():
+    import joblib
+    model = house_encoder.bind(joblib.load(Config.MODEL_PATH, mmap_mode=Config.MODEL_MMAP_MODE), 'House price model')
+    return index_house_model(model, compile_model(model, 'house price'))
+
+
+def load_diabetes_model():
+    import joblib
+    return {
+        'model': compile_model(
+            diabetes_encoder.bind(joblib.load(Config.DIABETES_MODEL_PATH, mmap_mode=Config.MODEL_MMAP_MODE), 'Diabetes model'),
+            'diabetes'
+        ),
+        'scaler': diabetes_encoder.bind(joblib.load(Config.DIABETES_SCALER_PATH), 'Diabetes scaler')
+    }
+
+
+def run_house_model(loaded, features):
+    with timed_model('house', len(features)):
+        return loaded.artifact.predict(features)
+
+
+def run_diabetes_model(loaded, features):
+    with timed_model('diabetes', len(features)):
+        return loaded.artifact['model'].predict_proba(loaded.artifact['scaler'].transform(features))
+
+
+def on_model_swap(name, loaded):
+    """Drop cached outputs of the replaced version"""
+    if prediction_cache is not None:
+        prediction_cache.invalidate(name)
+
+
+# Register the trained models; they load on first use or in warm_up() when MODEL_LAZY_LOAD is set
+# (watched for changes when MODEL_WATCH_INTERVAL is set)
+model_registry = ModelRegistry(watch_interval=Config.MODEL_WATCH_INTERVAL, on_swap=on_model_swap)
+model_registry.register(
+    'house', load_house_model, [Config.MODEL_PATH],
+    label='House price',
+    lazy=Config.MODEL_LAZY_LOAD,
+    warmup=lambda artifact: artifact.predict(house_encoder.matrix(1))
+)
+model_registry.register(
+    'diabetes', load_diabetes_model, [Config.DIABETES_MODEL_PATH, Config.DIABETES_SCALER_PATH],
+    label='Diabetes',
+    lazy=Config.MODEL_LAZY_LOAD,
+    warmup=lambda artifact: artifact['model'].predict_proba(artifact['scaler'].transform(diabetes_encoder.matrix(1)))
+)
+
+# Coalesce concurrent model calls into batches (opt-in)
+if Config.MICRO_BATCH_ENABLED:
+    house_batcher = MicroBatcher(
+        run_house_model,
+        max_batch_size=Config.MICRO_BATCH_MAX_SIZE,
+        max_delay=Config.MICRO_BATCH_MAX_DELAY_MS / 1000
+    )
+    diabetes_batcher = MicroBatcher(
+        run_diabetes_model,
+        max_batch_size=Config.MICRO_BATCH_MAX_SIZE,
+        max_delay=Config.MICRO_BATCH_MAX_DELAY_MS / 1000
+    )
+else:
+    house_batcher = None
+    diabetes_batcher = None
+
+
+def finish_account_deletion(user_id):
+    """Remove what is left of an account once its predictions are gone"""
+    UserStats.reset(user_id)
+    User.delete_user(ObjectId(user_id))
+
+
+# Deletes accounts' predictions in the background, resuming jobs left by workers that died
+account_deleter = AccountDeleter(
+    batch_size=Config.ACCOUNT_DELETION_BATCH_SIZE,
+    batch_delay=Config.ACCOUNT_DELETION_BATCH_DELAY,
+    lease_seconds=Config.ACCOUNT_DELETION_LEASE,
+    poll_interval=Config.ACCOUNT_DELETION_POLL_INTERVAL,
+    settle_seconds=Config.ACCOUNT_DELETION_SETTLE,
+    on_finished=finish_account_deletion
+)
+
+
+def warm_up(database=True, models=True, hashing=True):
+    """Connect to MongoDB, load the models and start the background workers ahead of the first request"""
+    # Fork the hashing processes first, while this process has no MongoDB or background threads yet
+    if hashing:
+        User.hasher.start()
+    
+    if database:
+        try:
+            Database.initialize()
+            print("✓ Database connected successfully")
+        except Exception as e:
+            print(f"⚠ Warning: Could not connect to MongoDB: {e}")
+            print("  Make sure MongoDB is running on localhost:27017")
+            print("  The app will start but database features won't work.")
+        
+        # Create indexes (bounded so an unreachable MongoDB does not stall startup)
+        if Config.CREATE_INDEXES_ON_STARTUP:
+            try:
+                with pymongo.timeout(5):
+                    Database.ensure_indexes()
+                print("✓ Database indexes verified")
+            except Exception as e:
+                print(f"⚠ Warning: Could not create MongoDB indexes: {e}")
+        
+        account_deleter.start()
+    
+    if models:
+        model_registry.warm()
+    
+    with app.test_request_context():
+        static_pages.warm(*STATIC_PAGE_TEMPLATES)
+
+
+def predict_with_model(name, run, batcher, features):
+    """Run encoded rows through the current version of a model; returns (outputs, loaded model)"""
+    loaded = model_registry.get(name)
+    if batcher is not None:
+        predict_fn = lambda rows: batcher.predict(rows, loaded)
+    else:
+        predict_fn = lambda rows: run(loaded, rows)
+    
+    if prediction_cache is None:
+        return predict_fn(features), loaded
+    return prediction_cache.predict(name, loaded.version, features, predict_fn), loaded
+
+
+def predict_house_prices(features):
+    """Predict house prices for encoded rows, using the prediction cache"""
+    return predict_with_model('house', run_house_model, house_batcher, features)
+
+
+def predict_diabetes_probabilities(features):
+    """Predict diabetes class probabilities for encoded rows, using the prediction cache"""
+    return predict_with_model('diabetes', run_diabetes_model, diabetes_batcher, features)
+
+
+def house_input_data(data):
+    """The stored input of a house prediction"""
+    return {
+        'SquareFootage': data['SquareFootage'],
+        'Bedrooms': data['Bedrooms'],
+        'Location': data['Location']
+    }
+
+
+def house_output(output_price, loaded, prediction_id):
+    """API result for one house price prediction"""
+    return {
+        'prediction': output_price,
+        'formatted_price': f'LKR {output_price:,.2f}',
+        'model_version': loaded.version,
+        'prediction_id': prediction_id
+    }
+
+
+def diabetes_output(proba, loaded):
+    """Class, readable result, confidence and probabilities for one row of class probabilities"""
+    result_value = int(loaded.artifact['model'].classes_[proba.argmax()])
+    return {
+        'prediction': result_value,
+        'result': DIABETES_RESULT_MAP.get(result_value, 'Unknown'),
+        'confidence': float(proba[result_value]) * 100,
+        'probabilities': {
+            'no_diabetes': float(proba[0]) * 100,
+            'prediabetes': float(proba[1]) * 100,
+            'diabetes': float(proba[2]) * 100
+        }
+    }
+
+
+def diabetes_metadata(output, loaded):
+    """Stored metadata of a diabetes prediction"""
+    return {
+        'result_text': output['result'],
+        'confidence': output['confidence'],
+        'probabilities': output['probabilities'],
+        'model_version': loaded.version
+    }
+
+
+def overloaded_response(message):
+    """503 asking the client to retry shortly"""
+    response = jsonify({'success': False, 'message': message})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
+
+def get_batch_rows():
+    """Read a batch request body as a list of rows (JSON array or NDJSON)"""
+    if request.mimetype in ('application/x-ndjson', 'application/ndjson'):
+        rows = []
+        for line in request.get_data(as_text=True).splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                rows.append(json.loads(line))
+            except ValueError:
+                rows.append(None)
+        return rows
+    
+    data = request.get_json(silent=True)
+    if isinstance(data, dict):
+        data = data.get('rows')
+    if not isinstance(data, list):
+        return None
+    return data
+
 
 # ==================== PUBLIC ROUTES ====================
 
 @app.route('/')
 def landing():
     """Landing page"""
-    return render_template('landing.html')
+    return static_pages.response('landing.html')
 
 
 @app.route('/login')
 def login_page():
     """Login page"""
-    return render_template('login.html')
+    return static_pages.response('login.html')
 
 
 @app.route('/signup')
 def signup_page():
     """Signup page"""
-    return render_template('signup.html')
+    return static_pages.response('signup.html')
 
 
 # ==================== AUTH API ROUTES ====================
@@ -102,15 +388,7 @@ def signup():
         user = User.create_user(email=email, name=name, password=password)
         
         # Generate JWT token
-        token = jwt.encode(
-            {
-                'email': user.email,
-                'name': user.name,
-                'exp': datetime.utcnow() + Config.JWT_ACCESS_TOKEN_EXPIRES
-            },
-            Config.JWT_SECRET_KEY,
-            algorithm='HS256'
-        )
+        token = issue_token(user)
         
         return jsonify({
             'success': True,
@@ -119,6 +397,8 @@ def signup():
             'user': user.to_dict()
         }), 201
         
+    except HashingOverloaded as e:
+        return overloaded_response(str(e))
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
 
@@ -142,15 +422,7 @@ def login():
             return jsonify({'success': False, 'message': 'Invalid email or password'}), 401
         
         # Generate JWT token
-        token = jwt.encode(
-            {
-                'email': user.email,
-                'name': user.name,
-                'exp': datetime.utcnow() + Config.JWT_ACCESS_TOKEN_EXPIRES
-            },
-            Config.JWT_SECRET_KEY,
-            algorithm='HS256'
-        )
+        token = issue_token(user)
         
         return jsonify({
             'success': True,
@@ -159,6 +431,8 @@ def login():
             'user': user.to_dict()
         }), 200
         
+    except HashingOverloaded as e:
+        return overloaded_response(str(e))
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
 
@@ -174,6 +448,7 @@ def logout():
 # ==================== PROTECTED ROUTES ====================
 
 @app.route('/dashboard')
+@etagged
 @token_required
 def dashboard(current_user):
     """Dashboard page - requires authentication"""
@@ -181,6 +456,7 @@ def dashboard(current_user):
 
 
 @app.route('/house-predictor')
+@etagged
 @token_required
 def house_predictor_page(current_user):
     """House predictor page - requires authentication"""
@@ -188,6 +464,7 @@ def house_predictor_page(current_user):
 
 
 @app.route('/diabetes-predictor')
+@etagged
 @token_required
 def diabetes_predictor_page(current_user):
     """Diabetes predictor page - requires authentication"""
@@ -195,6 +472,7 @@ def diabetes_predictor_page(current_user):
 
 
 @app.route('/history')
+@etagged
 @token_required
 def history_page(current_user):
     """History page - requires authentication"""
@@ -202,6 +480,7 @@ def history_page(current_user):
 
 
 @app.route('/settings')
+@etagged
 @token_required
 def settings_page(current_user):
     """Settings page - requires authentication"""
@@ -217,48 +496,98 @@ def predict_house(current_user):
     try:
         data = request.get_json()
         
+        if model_registry.get('house') is None:
+            return jsonify({'success': False, 'message': 'Model not available'}), 400
+        
         # Validate required fields
         if not data or 'SquareFootage' not in data or 'Bedrooms' not in data or 'Location' not in data:
             return jsonify({'success': False, 'message': 'Missing required fields'}), 400
         
-        # Create input data dictionary
-        input_data = {col: 0 for col in MODEL_COLUMNS}
-        
-        # Update with form data
-        input_data['SquareFootage'] = float(data['SquareFootage'])
-        input_data['Bedrooms'] = int(data['Bedrooms'])
-        
-        # Handle location (One-Hot Encoding)
-        selected_location = data['Location']
-        location_column = f"Location_{selected_location}"
-        
-        if location_column in input_data:
-            input_data[location_column] = 1
-        
-        # Convert to DataFrame
-        df_to_predict = pd.DataFrame([input_data], columns=MODEL_COLUMNS)
+        # Encode into the model's feature row (location is one-hot encoded)
+        with stage('encode_features'):
+            features = house_encoder.encode(data)
         
         # Make prediction
-        prediction = model.predict(df_to_predict)
+        prediction, loaded = predict_house_prices(features)
         output_price = float(prediction[0])
         
         # Save prediction to database
         prediction_record = Prediction.create_prediction(
             user_id=str(current_user._id),
             prediction_type='house',
-            input_data={
-                'SquareFootage': data['SquareFootage'],
-                'Bedrooms': data['Bedrooms'],
-                'Location': data['Location']
-            },
-            predicted_value=output_price
+            input_data=house_input_data(data),
+            predicted_value=output_price,
+            metadata={'model_version': loaded.version}
         )
         
         return jsonify({
             'success': True,
-            'prediction': output_price,
-            'formatted_price': f'LKR {output_price:,.2f}',
-            'prediction_id': str(prediction_record._id)
+            **house_output(output_price, loaded, str(prediction_record._id))
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+
+@app.route('/api/predict/house/batch', methods=['POST'])
+@token_required
+def predict_house_batch(current_user):
+    """Handle batch house price prediction with a single model call"""
+    try:
+        if model_registry.get('house') is None:
+            return jsonify({'success': False, 'message': 'Model not available'}), 400
+        
+        rows = get_batch_rows()
+        if rows is None:
+            return jsonify({'success': False, 'message': 'Expected a JSON array or NDJSON body'}), 400
+        if len(rows) > Config.MAX_BATCH_SIZE:
+            return jsonify({'success': False, 'message': f'Batch exceeds {Config.MAX_BATCH_SIZE} rows'}), 413
+        
+        results = [None] * len(rows)
+        valid_indices = []
+        valid_inputs = []
+        features = house_encoder.matrix(len(rows))
+        
+        # Validate and encode every row, recording errors per row
+        with stage('encode_features'):
+            for i, data in enumerate(rows):
+                try:
+                    house_encoder.encode_into(features[len(valid_indices)], data)
+                except (TypeError, ValueError) as e:
+                    results[i] = {'index': i, 'success': False, 'message': str(e)}
+                    continue
+                
+                valid_indices.append(i)
+                valid_inputs.append(house_input_data(data))
+        
+        if valid_indices:
+            # Make all predictions in one call
+            predictions, loaded = predict_house_prices(features[:len(valid_indices)])
+            
+            # Save all predictions in one insert
+            prediction_records = Prediction.create_predictions([
+                {
+                    'user_id': str(current_user._id),
+                    'prediction_type': 'house',
+                    'input_data': input_data,
+                    'predicted_value': float(price),
+                    'metadata': {'model_version': loaded.version}
+                }
+                for input_data, price in zip(valid_inputs, predictions)
+            ])
+            
+            for i, record in zip(valid_indices, prediction_records):
+                results[i] = {
+                    'index': i,
+                    'success': True,
+                    **house_output(record.predicted_value, loaded, str(record._id))
+                }
+        
+        return jsonify({
+            'success': True,
+            'count': len(valid_indices),
+            'error_count': len(rows) - len(valid_indices),
+            'results': results
         }), 200
         
     except Exception as e:
@@ -272,66 +601,34 @@ def predict_diabetes(current_user):
     try:
         data = request.get_json()
         
-        if not data or not diabetes_model or not diabetes_scaler:
+        if not data or model_registry.get('diabetes') is None:
             return jsonify({'success': False, 'message': 'Model not available'}), 400
         
-        # Create input data in the correct order
-        input_values = []
-        for col in DIABETES_COLUMNS:
-            if col not in data:
-                return jsonify({'success': False, 'message': f'Missing field: {col}'}), 400
-            input_values.append(float(data[col]))
-        
-        # Create DataFrame
-        df_to_predict = pd.DataFrame([input_values], columns=DIABETES_COLUMNS)
-        
-        # Scale the data
-        scaled_data = diabetes_scaler.transform(df_to_predict)
+        # Encode input data in the correct order
+        try:
+            with stage('encode_features'):
+                features = diabetes_encoder.encode(data)
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
         
-        # Make prediction
-        prediction = diabetes_model.predict(scaled_data)
-        prediction_proba = diabetes_model.predict_proba(scaled_data)
-        
-        result_value = int(prediction[0])
+        # Scale the data and make prediction (the class is the argmax of the probabilities)
+        prediction_proba, loaded = predict_diabetes_probabilities(features)
         
-        # Map prediction to readable result
-        result_map = {
-            0: 'No Diabetes',
-            1: 'Prediabetes',
-            2: 'Diabetes'
-        }
-        result_text = result_map.get(result_value, 'Unknown')
-        
-        # Get probability for the predicted class
-        confidence = float(prediction_proba[0][result_value]) * 100
+        output = diabetes_output(prediction_proba[0], loaded)
         
         # Save prediction to database
         prediction_record = Prediction.create_prediction(
             user_id=str(current_user._id),
             prediction_type='diabetes',
             input_data=data,
-            predicted_value=result_value,
-            metadata={
-                'result_text': result_text,
-                'confidence': confidence,
-                'probabilities': {
-                    'no_diabetes': float(prediction_proba[0][0]) * 100,
-                    'prediabetes': float(prediction_proba[0][1]) * 100,
-                    'diabetes': float(prediction_proba[0][2]) * 100
-                }
-            }
+            predicted_value=output['prediction'],
+            metadata=diabetes_metadata(output, loaded)
         )
         
         return jsonify({
             'success': True,
-            'prediction': result_value,
-            'result': result_text,
-            'confidence': confidence,
-            'probabilities': {
-                'no_diabetes': float(prediction_proba[0][0]) * 100,
-                'prediabetes': float(prediction_proba[0][1]) * 100,
-                'diabetes': float(prediction_proba[0][2]) * 100
-            },
+            **output,
+            'model_version': loaded.version,
             'prediction_id': str(prediction_record._id)
         }), 200
         
@@ -340,24 +637,158 @@ def predict_diabetes(current_user):
         return jsonify({'success': False, 'message': str(e)}), 500
 
 
+@app.route('/api/predict/diabetes/batch', methods=['POST'])
+@token_required
+def predict_diabetes_batch(current_user):
+    """Handle batch diabetes prediction with a single scaler and model pass"""
+    try:
+        if model_registry.get('diabetes') is None or not diabetes_encoder:
+            return jsonify({'success': False, 'message': 'Model not available'}), 400
+        
+        rows = get_batch_rows()
+        if rows is None:
+            return jsonify({'success': False, 'message': 'Expected a JSON array or NDJSON body'}), 400
+        if len(rows) > Config.MAX_BATCH_SIZE:
+            return jsonify({'success': False, 'message': f'Batch exceeds {Config.MAX_BATCH_SIZE} rows'}), 413
+        
+        results = [None] * len(rows)
+        valid_indices = []
+        valid_inputs = []
+        features = diabetes_encoder.matrix(len(rows))
+        
+        # Validate and encode every row; rows are objects or arrays in DIABETES_COLUMNS order
+        with stage('encode_features'):
+            for i, data in enumerate(rows):
+                try:
+                    diabetes_encoder.encode_into(features[len(valid_indices)], data)
+                except (TypeError, ValueError) as e:
+                    results[i] = {'index': i, 'success': False, 'message': str(e)}
+                    continue
+                
+                if isinstance(data, list):
+                    data = dict(zip(DIABETES_COLUMNS, data))
+                valid_indices.append(i)
+                valid_inputs.append(data)
+        
+        if valid_indices:
+            # Scale and predict all rows at once
+            prediction_proba, loaded = predict_diabetes_probabilities(features[:len(valid_indices)])
+            outputs = [diabetes_output(proba, loaded) for proba in prediction_proba]
+            
+            # Save all predictions in one insert
+            prediction_records = Prediction.create_predictions([
+                {
+                    'user_id': str(current_user._id),
+                    'prediction_type': 'diabetes',
+                    'input_data': input_data,
+                    'predicted_value': output['prediction'],
+                    'metadata': diabetes_metadata(output, loaded)
+                }
+                for input_data, output in zip(valid_inputs, outputs)
+            ])
+            
+            for i, output, record in zip(valid_indices, outputs, prediction_records):
+                results[i] = {
+                    'index': i,
+                    'success': True,
+                    **output,
+                    'model_version': loaded.version,
+                    'prediction_id': str(record._id)
+                }
+        
+        return jsonify({
+            'success': True,
+            'count': len(valid_indices),
+            'error_count': len(rows) - len(valid_indices),
+            'results': results
+        }), 200
+        
+    except Exception as e:
+        print(f"Error in batch diabetes prediction: {e}")
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+
 # ==================== USER API ROUTES ====================
 
+def prediction_page(rows, limit, total_count):
+    """History response payload from up to limit + 1 projected rows"""
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        created_at = datetime.fromisoformat(rows[-1]['created_at'].rstrip('Z'))
+        next_cursor = Prediction.encode_cursor(created_at, rows[-1]['id'])
+    return {'success': True, 'predictions': rows, 'next_cursor': next_cursor, 'total_count': total_count}
+
+
 @app.route('/api/user/predictions', methods=['GET'])
+@etagged
 @token_required
 def get_predictions(current_user):
     """Get user's prediction history"""
     try:
-        limit = request.args.get('limit', type=int)
-        skip = request.args.get('skip', 0, type=int)
+        limit = request.args.get('limit', Config.HISTORY_PAGE_SIZE, type=int)
+        limit = max(1, min(limit, Config.HISTORY_MAX_PAGE_SIZE))
+        cursor = request.args.get('cursor')
+        skip = request.args.get('skip', 0, type=int) if not cursor else 0
         
-        predictions = Prediction.get_user_predictions(str(current_user._id), limit=limit, skip=skip)
-        total_count = Prediction.get_user_prediction_count(str(current_user._id))
+        if cursor:
+            try:
+                Prediction.decode_cursor(cursor)
+            except ValueError as e:
+                return jsonify({'success': False, 'message': str(e)}), 400
         
-        return jsonify({
-            'success': True,
-            'predictions': [pred.to_dict() for pred in predictions],
-            'total_count': total_count
-        }), 200
+        user_id = str(current_user._id)
+        total_count = UserStats.summary(user_id)['total_predictions']
+        
+        # Fetch one extra row to know whether another page exists; the page is built whole so
+        # it can carry an ETag (pages are at most HISTORY_MAX_PAGE_SIZE rows)
+        rows = list(Prediction.iter_user_prediction_dicts(user_id, limit=limit + 1, skip=skip, after=cursor))
+        
+        return jsonify(prediction_page(rows, limit, total_count)), 200
+        
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+
+@app.route('/api/user/predictions/export', methods=['GET'])
+@token_required
+def export_predictions(current_user):
+    """Stream the user's prediction history as NDJSON or CSV"""
+    try:
+        export_format = request.args.get('format', 'ndjson').lower()
+        if export_format not in ('ndjson', 'csv'):
+            return jsonify({'success': False, 'message': 'Format must be ndjson or csv'}), 400
+        
+        # Date range: 'from' is inclusive, 'to' is exclusive (a bare date includes that whole day)
+        filters = {'prediction_type': request.args.get('type') or None}
+        try:
+            if request.args.get('from'):
+                filters['created_from'] = datetime.fromisoformat(request.args['from'])
+            if request.args.get('to'):
+                created_to = datetime.fromisoformat(request.args['to'])
+                if len(request.args['to']) == 10:
+                    created_to += timedelta(days=1)
+                filters['created_to'] = created_to
+        except ValueError:
+            return jsonify({'success': False, 'message': 'Dates must be ISO 8601 (YYYY-MM-DD)'}), 400
+        
+        rows = Prediction.iter_user_prediction_dicts(str(current_user._id), **filters)
+        if export_format == 'csv':
+            chunks = csv_chunks(rows)
+            mimetype = 'text/csv'
+        else:
+            chunks = ndjson_chunks(rows)
+            mimetype = 'application/x-ndjson'
+        
+        filename = f"predictions-{datetime.utcnow():%Y%m%d}.{export_format}"
+        if request.args.get('gzip', '').lower() in ('1', 'true'):
+            chunks = gzip_chunks(chunks)
+            mimetype = 'application/gzip'
+            filename += '.gz'
+        
+        response = Response(chunks, mimetype=mimetype)
+        response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
         
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
@@ -368,23 +799,10 @@ def get_predictions(current_user):
 def get_user_stats(current_user):
     """Get user statistics"""
     try:
-        total_predictions = Prediction.get_user_prediction_count(str(current_user._id))
-        
-        # Get this month's predictions
-        db = Database.get_db()
-        from datetime import datetime
-        start_of_month = datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        month_count = db.predictions.count_documents({
-            'user_id': str(current_user._id),
-            'created_at': {'$gte': start_of_month}
-        })
-        
+        # Precomputed counters, one point read
         return jsonify({
             'success': True,
-            'stats': {
-                'total_predictions': total_predictions,
-                'month_predictions': month_count
-            }
+            'stats': UserStats.summary(str(current_user._id))
         }), 200
         
     except Exception as e:
@@ -423,26 +841,152 @@ def update_user(current_user):
 def delete_user_account(current_user):
     """Delete user account and all associated data"""
     try:
-        # Delete all user predictions
-        Prediction.delete_user_predictions(str(current_user._id))
+        # Queue the job first, so an account is never left flagged without one
+        deletion_id = account_deleter.request(str(current_user._id))
         
-        # Delete user account
-        User.delete_user(current_user._id)
+        # Sign the user out everywhere now; predictions, stats and the user go in the background
+        User.mark_deleted(current_user)
         
         response = make_response(jsonify({
             'success': True,
-            'message': 'Account deleted successfully'
+            'message': 'Account deletion started',
+            'deletion_id': deletion_id,
+            'status_url': url_for('get_account_deletion_status', token=deletion_id)
         }))
         
         # Clear cookie
         response.set_cookie('token', '', expires=0)
         
-        return response, 200
+        return response, 202
+        
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+
+@app.route('/api/user/delete/status/<token>', methods=['GET'])
+def get_account_deletion_status(token):
+    """Progress of an account deletion (the account's own token no longer works)"""
+    try:
+        job = account_deleter.status(token)
+        if job is None:
+            return jsonify({'success': False, 'message': 'Deletion not found'}), 404
+        
+        return jsonify({'success': True, **job}), 200
         
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
 
 
+# ==================== METRICS ====================
+
+def collect_process_gauges():
+    """Memory, cache, write-behind, password hashing, compression and account deletion figures read at scrape time"""
+    usage = memory_usage()
+    gauges = [
+        ('process_resident_memory_bytes', 'gauge', 'Resident memory of this process',
+         usage['rss'] * 1024 * 1024 if usage['rss'] is not None else None),
+        ('process_proportional_memory_bytes', 'gauge', 'Proportional set size (shared pages split between workers)',
+         usage['pss'] * 1024 * 1024 if usage['pss'] is not None else None)
+    ]
+    if prediction_cache is not None:
+        stats = prediction_cache.stats()
+        gauges += [
+            ('prediction_cache_hits_total', 'counter', 'Prediction cache hits', stats['hits']),
+            ('prediction_cache_misses_total', 'counter', 'Prediction cache misses', stats['misses']),
+            ('prediction_cache_entries', 'gauge', 'Entries in the prediction cache', stats['entries'])
+        ]
+    if Prediction.writer is not None:
+        stats = Prediction.writer.stats()
+        gauges += [
+            ('write_behind_queue_depth', 'gauge', 'Prediction records waiting to be written', stats['queued']),
+            ('write_behind_dropped_total', 'counter', 'Prediction records dropped after retries', stats['dropped']),
+            ('write_behind_corrupt_total', 'counter', 'Unreadable spill records set aside in the .bad file', stats['corrupt'])
+        ]
+    stats = User.hasher.stats()
+    gauges += [
+        ('password_hash_pending', 'gauge', 'Password operations queued or running', stats['pending']),
+        ('password_hash_rehashed_total', 'counter', 'Stored password hashes upgraded at login', stats['rehashed'])
+    ]
+    if compressor is not None:
+        stats = compressor.stats()
+        gauges += [
+            ('http_compressed_responses_total', 'counter', 'Response bodies compressed', stats['compressed']),
+            ('http_compression_cache_hits_total', 'counter', 'Compressed bodies reused by ETag', stats['cache_hits']),
+            ('http_compression_bytes_saved_total', 'counter', 'Bytes saved by compression', stats['bytes_in'] - stats['bytes_out'])
+        ]
+    stats = account_deleter.stats()
+    gauges += [
+        ('account_deletion_predictions_deleted_total', 'counter', 'Predictions removed by account deletion', stats['deleted']),
+        ('account_deletions_finished_total', 'counter', 'Account deletions completed by this worker', stats['finished'])
+    ]
+    return gauges
+
+
+metrics.registry.add_collector(collect_process_gauges)
+
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Request, model and MongoDB timings of this worker in the Prometheus text format"""
+    if not Config.METRICS_ENABLED:
+        return jsonify({'message': 'Metrics are disabled'}), 404
+    
+    # The counters cover every user's traffic, so scrapes need a token unless explicitly made public
+    if not Config.METRICS_PUBLIC:
+        if not Config.METRICS_TOKEN and not Config.ADMIN_TOKEN:
+            return jsonify({'message': 'Metrics need METRICS_TOKEN or ADMIN_TOKEN to be configured'}), 403
+        
+        token = request.headers.get('Authorization', '')[len('Bearer '):]
+        admin_token = request.headers.get('X-Admin-Token', '')
+        if not ((Config.METRICS_TOKEN and hmac.compare_digest(token, Config.METRICS_TOKEN))
+                or (Config.ADMIN_TOKEN and hmac.compare_digest(admin_token, Config.ADMIN_TOKEN))):
+            return jsonify({'message': 'Metrics token is invalid'}), 401
+    
+    return Response(metrics.registry.render(), mimetype='text/plain; version=0.0.4')
+
+
+# ==================== ADMIN API ====================
+
+@app.route('/api/admin/models', methods=['GET'])
+@admin_required
+def get_models():
+    """Get loaded model versions"""
+    return jsonify({
+        'success': True,
+        'models': model_registry.status(),
+        'engine': Config.MODEL_ENGINE,
+        'house_lookup_index': Config.HOUSE_LOOKUP_INDEX,
+        'process': {'pid': os.getpid(), 'memory_mb': memory_usage()}
+    }), 200
+
+
+@app.route('/api/admin/models/reload', methods=['POST'])
+@admin_required
+def reload_models():
+    """Load, warm and swap in new model files in the background"""
+    data = request.get_json(silent=True) or {}
+    name = data.get('name')
+    if name and name not in model_registry.status():
+        return jsonify({'success': False, 'message': f'Unknown model: {name}'}), 404
+    
+    names = model_registry.reload_in_background(name, force=bool(data.get('force')))
+    return jsonify({'success': True, 'message': 'Reload started', 'models': names}), 202
+
+
+@app.route('/api/admin/cache/stats', methods=['GET'])
+@admin_required
+def get_cache_stats():
+    """Get prediction cache counters"""
+    if prediction_cache is None:
+        return jsonify({'success': True, 'enabled': False}), 200
+    
+    return jsonify({
+        'success': True,
+        'enabled': True,
+        'stats': prediction_cache.stats()
+    }), 200
+
+
 # ==================== ERROR HANDLERS ====================
 
 @app.errorhandler(404)
@@ -461,9 +1005,134 @@ def favicon():
     return '', 204  # No content
 
 
+# ==================== CLI COMMANDS ====================
+
+@app.cli.command('init-db')
+def init_db_command():
+    """Create the MongoDB indexes used by the app"""
+    for name in Database.ensure_indexes():
+        print(f"✓ Index {name}")
+
+
+@app.cli.command('index-report')
+def index_report_command():
+    """Report index usage and flag queries that scan whole collections"""
+    for collection, usage in Database.index_usage().items():
+        print(f"{collection}:")
+        if isinstance(usage, dict):
+            print(f"  ⚠ Could not read index stats: {usage['error']}")
+            continue
+        for stats in usage:
+            print(f"  {stats['name']}: {stats['ops']} ops since {stats['since']}")
+    
+    print("Query plans:")
+    for plan in Database.explain_queries():
+        marker = '⚠ COLLSCAN' if plan['collection_scan'] else '✓'
+        print(f"  {marker} {plan['query']}: {' <- '.join(plan['stages'])}")
+
+
+@app.cli.command('rebuild-stats')
+@click.option('--user-id', default=None, help='Only rebuild this user\'s counters')
+def rebuild_stats_command(user_id):
+    """Rebuild per-user prediction counters from the predictions collection"""
+    if user_id:
+        stats = UserStats.rebuild(user_id)
+        print(f"✓ Rebuilt counters for {user_id}: {stats['total']} predictions")
+    else:
+        print(f"✓ Rebuilt counters for {UserStats.rebuild()} users")
+
+
+@app.cli.command('delete-accounts')
+def delete_accounts_command():
+    """Finish queued account deletions, including ones left by stopped workers once their lease runs out"""
+    print(f"✓ Finished {account_deleter.run_pending()} account deletions "
+          f"({account_deleter.deleted} predictions deleted)")
+
+
+COMPACTION_TARGETS = {
+    'house': (lambda: Config.MODEL_PATH, 'Price'),
+    'diabetes': (lambda: Config.DIABETES_MODEL_PATH, 'Diabetes_012')
+}
+
+
+def parse_list(value, item):
+    return [item(part.strip()) for part in value.split(',')] if value else None
+
+
+@app.cli.command('compact-model')
+@click.argument('name', type=click.Choice(sorted(COMPACTION_TARGETS)))
+@click.option('--data', required=True, type=click.Path(exists=True, dir_okay=False),
+              help='CSV of held-out records (rows the model was not trained on)')
+@click.option('--target', default=None, help='Target column (default: Price / Diabetes_012)')
+@click.option('--trees', default=None, help='Tree counts to try, e.g. 10,25,50 (default: 10%-100% of the forest)')
+@click.option('--max-depth', 'depths', default=None, help='Depths to try, e.g. 8,12,none (default: 6-20 and uncut)')
+@click.option('--max-loss', default=0.005, type=float, show_default=True,
+              help='Largest drop in R² (house) or accuracy (diabetes) accepted')
+@click.option('--max-rows', default=20000, type=int, show_default=True, help='Held-out rows used')
+@click.option('--output', default=None, help='Compact artifact path (default: next to the model, .compact.pkl)')
+@click.option('--json', 'json_path', default=None, help='Write the report to this file')
+def compact_model_command(name, data, target, trees, depths, max_loss, max_rows, output, json_path):
+    """Prune a forest's trees and depth, store it in float32 and report accuracy, size and latency"""
+    import joblib
+    from model_compaction import ForestCompactor, load_dataset
+    
+    model_path, default_target = COMPACTION_TARGETS[name]
+    model_path = model_path()
+    encoder = house_encoder if name == 'house' else diabetes_encoder
+    try:
+        X, y, skipped = load_dataset(data, encoder, target or default_target, max_rows)
+        if name == 'diabetes':
+            X = encoder.bind(joblib.load(Config.DIABETES_SCALER_PATH), 'Diabetes scaler').transform(X)
+        compactor = ForestCompactor(encoder.bind(joblib.load(model_path), f"{name} model"), X, y)
+    except (TypeError, ValueError) as e:
+        raise click.ClickException(str(e))
+    print(f"✓ {len(X)} held-out rows from {data}" + (f" ({skipped} unusable rows skipped)" if skipped else ""))
+    
+    baseline, candidates, forest, chosen = compactor.search(
+        parse_list(trees, int),
+        parse_list(depths, lambda depth: None if depth.lower() == 'none' else int(depth)),
+        max_loss
+    )
+    
+    metric = 'accuracy' if compactor.classifier else 'R²'
+    print(f"  {'trees':>5} {'depth':>5} {metric:>9} {'loss':>8} {'size KB':>9} {'row ms':>8} {'batch ms':>9}")
+    for row in [baseline] + candidates:
+        marker = '' if row is baseline else ('✓' if row['accepted'] else ' ')
+        loss = f"{row['loss']:8.4f}" if row is not baseline else f"{'original':>8}"
+        print(f"  {row['trees']:>5} {row['max_depth'] or '-':>5} {row['score']:9.4f} {loss} "
+              f"{row['size_bytes'] / 1024:9.0f} {row['row_ms']:8.3f} {row['batch_ms']:9.2f} {marker}")
+    
+    report = {
+        'model': name, 'source': model_path, 'data': data, 'rows': len(X), 'metric': metric,
+        'max_loss': max_loss, 'baseline': baseline, 'candidates': candidates, 'chosen': chosen
+    }
+    if chosen is None:
+        print(f"✗ No candidate is within {max_loss} {metric} of the original; nothing written")
+    else:
+        output = output or os.path.splitext(model_path)[0] + '.compact.pkl'
+        # Uncompressed so MODEL_MMAP_MODE can map it, and swapped in whole so running workers never read a half-written file
+        replace_model_file(forest, output)
+        report['output'] = output
+        print(f"✓ {chosen['trees']} trees, depth {chosen['max_depth'] or 'uncut'}: {metric} {chosen['score']:.4f} "
+              f"({-chosen['loss']:+.4f}), {baseline['size_bytes'] / chosen['size_bytes']:.1f}x smaller, "
+              f"{baseline['row_ms'] / chosen['row_ms']:.1f}x faster per row")
+        print(f"✓ Compact model written to {output}; point {'MODEL_PATH' if name == 'house' else 'DIABETES_MODEL_PATH'} at it to serve it")
+    
+    if json_path:
+        with open(json_path, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"✓ Report written to {json_path}")
+    if chosen is None:
+        raise SystemExit(1)
+
+
 # ==================== APP RUNNER ====================
 
 if __name__ == '__main__':
     # Get port from environment variable (Heroku assigns this dynamically)
     port = int(os.environ.get('PORT', 5000))
+    
+    # The debug reloader re-runs this module in a child process; only warm up the one that serves
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        warm_up()
     app.run(debug=True, host='0.0.0.0', port=port)
\ No newline at end of file
@@ -0,0 +1,289 @@
+"""Async serving mode: the same API on an ASGI server.
+
+    uvicorn asgi:app --host 0.0.0.0 --port 8000 --workers 2
+
+Login, single predictions, prediction history and stats are served natively: MongoDB calls go
+through motor and model inference runs on a bounded thread pool, so one process keeps many
+requests in flight without a thread (or a pooled connection) per request. Every other route
+is handed to the Flask app, on its own thread pool.
+"""
+import time
+import asyncio
+import multiprocessing
+from functools import wraps
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+from a2wsgi import WSGIMiddleware
+from werkzeug.http import parse_accept_header, parse_etags, quote_etag
+from starlette.applications import Starlette
+from starlette.responses import Response
+from starlette.routing import Mount, Route
+import app as app_module
+import metrics
+from metrics import stage
+from config import Config
+from database import AsyncDatabase
+from models.user import User
+from models.prediction import Prediction
+from models.user_stats import UserStats
+from auth import authenticate_async, issue_token
+from password_hashing import HashingOverloaded
+from http_cache import strong_etag, matching_etag
+
+# warm_up starts the password hashing pool on a thread of this already threaded process (event loop,
+# inference pool, motor), where forking is unsafe; spawned pool processes start from a fresh interpreter
+User.hasher.mp_context = multiprocessing.get_context('spawn')
+
+# Model calls run here; sklearn and NumPy release the GIL for most of a predict
+inference_pool = ThreadPoolExecutor(max_workers=Config.ASYNC_INFERENCE_WORKERS, thread_name_prefix='inference')
+
+# Calls beyond the running and queued ones wait on the event loop instead of piling up in the pool
+inference_slots = asyncio.Semaphore(Config.ASYNC_INFERENCE_WORKERS + Config.ASYNC_INFERENCE_MAX_PENDING)
+
+
+async def run_inference(fn, *args):
+    """Run a blocking model call on the inference pool"""
+    async with inference_slots:
+        return await asyncio.get_running_loop().run_in_executor(inference_pool, fn, *args)
+
+
+def json_response(payload, status=200):
+    """JSON body encoded exactly like Flask's jsonify"""
+    body = app_module.app.json.dumps(payload, separators=(',', ':'))
+    return Response(body + '\n', status, media_type='application/json')
+
+
+def etagged_json_response(request, payload):
+    """json_response with a strong ETag, a 304 when the client has the body and negotiated compression"""
+    body = (app_module.app.json.dumps(payload, separators=(',', ':')) + '\n').encode()
+    etag = strong_etag(body)
+    headers = {'Cache-Control': 'private, no-cache', 'Vary': 'Accept-Encoding'}
+    
+    matched = matching_etag(parse_etags(request.headers.get('if-none-match')), etag)
+    if matched:
+        headers['ETag'] = quote_etag(matched)
+        return Response(status_code=304, headers=headers)
+    
+    compressor = app_module.compressor
+    if compressor is not None and compressor.compressible('application/json', len(body)):
+        encoding = compressor.encoding_for(parse_accept_header(request.headers.get('accept-encoding')))
+        if encoding is not None:
+            body = compressor.compress(body, encoding, etag)
+            headers['Content-Encoding'] = encoding
+            etag = f"{etag}-{encoding}"
+    headers['ETag'] = quote_etag(etag)
+    return Response(body, 200, headers=headers, media_type='application/json')
+
+
+async def read_json(request):
+    """Request body parsed as JSON, or None when it is missing or malformed"""
+    try:
+        return app_module.app.json.loads(await request.body())
+    except ValueError:
+        return None
+
+
+def int_param(request, name, default):
+    """Integer query parameter, falling back to the default like Flask's args.get(type=int)"""
+    try:
+        return int(request.query_params[name])
+    except (KeyError, ValueError):
+        return default
+
+
+def token_required(handler):
+    """Authenticate like auth.token_required; the handler gets (request, current_user)"""
+    @wraps(handler)
+    async def decorated(request):
+        current_user, message = await authenticate_async(request.cookies, request.headers)
+        if current_user is None:
+            return json_response({'message': message}, 401)
+        return await handler(request, current_user)
+    return decorated
+
+
+def route(path, handler, methods):
+    """A Starlette route recording the same request metrics as the Flask hooks"""
+    async def endpoint(request):
+        if not metrics.registry.enabled:
+            return await handler(request)
+        start = time.perf_counter()
+        response = await handler(request)
+        metrics.HTTP_LATENCY.observe(time.perf_counter() - start, path, request.method)
+        metrics.HTTP_REQUESTS.inc(path, request.method, str(response.status_code))
+        return response
+    return Route(path, endpoint, methods=methods)
+
+
+# ==================== AUTH API ROUTES ====================
+
+async def login(request):
+    """Handle user login"""
+    try:
+        data = await read_json(request)
+        
+        if not data or not data.get('email') or not data.get('password'):
+            return json_response({'success': False, 'message': 'Missing email or password'}, 400)
+        
+        # Verify credentials (the password hash is checked in the hashing pool)
+        user = await User.verify_password_async(data['email'].lower().strip(), data['password'])
+        
+        if not user:
+            return json_response({'success': False, 'message': 'Invalid email or password'}, 401)
+        
+        return json_response({
+            'success': True,
+            'message': 'Login successful',
+            'token': issue_token(user),
+            'user': user.to_dict()
+        }, 200)
+    
+    except HashingOverloaded as e:
+        response = json_response({'success': False, 'message': str(e)}, 503)
+        response.headers['Retry-After'] = '1'
+        return response
+    except Exception as e:
+        return json_response({'success': False, 'message': str(e)}, 500)
+
+
+# ==================== PREDICTION API ====================
+
+@token_required
+async def predict_house(request, current_user):
+    """Handle house price prediction"""
+    try:
+        data = await read_json(request)
+        
+        # get() may load the model on first use, so it runs on the pool too
+        if await run_inference(app_module.model_registry.get, 'house') is None:
+            return json_response({'success': False, 'message': 'Model not available'}, 400)
+        
+        # Validate required fields
+        if not data or 'SquareFootage' not in data or 'Bedrooms' not in data or 'Location' not in data:
+            return json_response({'success': False, 'message': 'Missing required fields'}, 400)
+        
+        with stage('encode_features'):
+            # A new row per request: it is read on a pool thread while the loop serves other requests
+            features = app_module.house_encoder.encode(data)
+        
+        prediction, loaded = await run_inference(app_module.predict_house_prices, features)
+        output_price = float(prediction[0])
+        
+        prediction_records = await Prediction.create_predictions_async([{
+            'user_id': str(current_user._id),
+            'prediction_type': 'house',
+            'input_data': app_module.house_input_data(data),
+            'predicted_value': output_price,
+            'metadata': {'model_version': loaded.version}
+        }])
+        
+        return json_response({
+            'success': True,
+            **app_module.house_output(output_price, loaded, str(prediction_records[0]._id))
+        }, 200)
+    
+    except Exception as e:
+        return json_response({'success': False, 'message': str(e)}, 500)
+
+
+@token_required
+async def predict_diabetes(request, current_user):
+    """Handle diabetes prediction"""
+    try:
+        data = await read_json(request)
+        
+        if not data or await run_inference(app_module.model_registry.get, 'diabetes') is None:
+            return json_response({'success': False, 'message': 'Model not available'}, 400)
+        
+        try:
+            with stage('encode_features'):
+                features = app_module.diabetes_encoder.encode(data)
+        except ValueError as e:
+            return json_response({'success': False, 'message': str(e)}, 400)
+        
+        prediction_proba, loaded = await run_inference(app_module.predict_diabetes_probabilities, features)
+        output = app_module.diabetes_output(prediction_proba[0], loaded)
+        
+        prediction_records = await Prediction.create_predictions_async([{
+            'user_id': str(current_user._id),
+            'prediction_type': 'diabetes',
+            'input_data': data,
+            'predicted_value': output['prediction'],
+            'metadata': app_module.diabetes_metadata(output, loaded)
+        }])
+        
+        return json_response({
+            'success': True,
+            **output,
+            'model_version': loaded.version,
+            'prediction_id': str(prediction_records[0]._id)
+        }, 200)
+    
+    except Exception as e:
+        print(f"Error in diabetes prediction: {e}")
+        return json_response({'success': False, 'message': str(e)}, 500)
+
+
+# ==================== USER API ROUTES ====================
+
+@token_required
+async def get_predictions(request, current_user):
+    """Get user's prediction history"""
+    try:
+        limit = int_param(request, 'limit', Config.HISTORY_PAGE_SIZE)
+        limit = max(1, min(limit, Config.HISTORY_MAX_PAGE_SIZE))
+        cursor = request.query_params.get('cursor')
+        skip = int_param(request, 'skip', 0) if not cursor else 0
+        
+        if cursor:
+            try:
+                Prediction.decode_cursor(cursor)
+            except ValueError as e:
+                return json_response({'success': False, 'message': str(e)}, 400)
+        
+        user_id = str(current_user._id)
+        total_count = (await UserStats.summary_async(user_id))['total_predictions']
+        
+        # Fetch one extra row to know whether another page exists
+        rows = await Prediction.user_prediction_dicts_async(user_id, limit=limit + 1, skip=skip, after=cursor)
+        
+        return etagged_json_response(request, app_module.prediction_page(rows, limit, total_count))
+    
+    except Exception as e:
+        return json_response({'success': False, 'message': str(e)}, 500)
+
+
+@token_required
+async def get_user_stats(request, current_user):
+    """Get user statistics"""
+    try:
+        return json_response({
+            'success': True,
+            'stats': await UserStats.summary_async(str(current_user._id))
+        }, 200)
+    
+    except Exception as e:
+        return json_response({'success': False, 'message': str(e)}, 500)
+
+
+@asynccontextmanager
+async def lifespan(_app):
+    # The Flask-served routes use the sync client; connect it and load the models before serving
+    await asyncio.get_running_loop().run_in_executor(None, app_module.warm_up)
+    yield
+    AsyncDatabase.close()
+    inference_pool.shutdown(wait=False)
+
+
+app = Starlette(
+    routes=[
+        route('/api/auth/login', login, ['POST']),
+        route('/api/predict/house', predict_house, ['POST']),
+        route('/api/predict/diabetes', predict_diabetes, ['POST']),
+        route('/api/user/predictions', get_predictions, ['GET']),
+        route('/api/user/stats', get_user_stats, ['GET']),
+        # Everything else (pages, signup, batches, exports, admin, /metrics) is served by Flask
+        Mount('/', app=WSGIMiddleware(app_module.app, workers=Config.ASYNC_WSGI_WORKERS))
+    ],
+    lifespan=lifespan
+)
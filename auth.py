@@ -1,31 +1,60 @@
+import hmac
 from functools import wraps
 from flask import request, jsonify
 import jwt
+from datetime import datetime
 from config import Config
 from models.user import User
+from metrics import stage
+
+def issue_token(user):
+    """Signed access token for a user"""
+    return jwt.encode(
+        {
+            'email': user.email,
+            'name': user.name,
+            'exp': datetime.utcnow() + Config.JWT_ACCESS_TOKEN_EXPIRES
+        },
+        Config.JWT_SECRET_KEY,
+        algorithm='HS256'
+    )
+
+
+def request_token(cookies, headers):
+    """Token from the 'token' cookie or the Authorization header; raises ValueError if malformed"""
+    if 'token' in cookies:
+        return cookies.get('token')
+    if 'Authorization' in headers:
+        try:
+            return headers['Authorization'].split(" ")[1]  # Bearer <token>
+        except IndexError:
+            raise ValueError('Token format is invalid')
+    return None
+
+
+def decode_token(token):
+    """Email of the token's user (raises jwt.InvalidTokenError subclasses)"""
+    with stage('jwt_decode'):
+        return jwt.decode(token, Config.JWT_SECRET_KEY, algorithms=["HS256"])['email']
+
 
 def token_required(f):
     @wraps(f)
     def decorated(*args, **kwargs):
-        token = None
-        
         # Check if token is in cookies or Authorization header
-        if 'token' in request.cookies:
-            token = request.cookies.get('token')
-        elif 'Authorization' in request.headers:
-            auth_header = request.headers['Authorization']
-            try:
-                token = auth_header.split(" ")[1]  # Bearer <token>
-            except IndexError:
-                return jsonify({'message': 'Token format is invalid'}), 401
+        try:
+            token = request_token(request.cookies, request.headers)
+        except ValueError as e:
+            return jsonify({'message': str(e)}), 401
         
         if not token:
             return jsonify({'message': 'Token is missing'}), 401
         
         try:
-            data = jwt.decode(token, Config.JWT_SECRET_KEY, algorithms=["HS256"])
-            current_user = User.find_by_email(data['email'])
-            if not current_user:
+            email = decode_token(token)
+            with stage('user_lookup'):
+                current_user = User.find_by_email_cached(email)
+            if not current_user or current_user.deleted_at:
                 return jsonify({'message': 'User not found'}), 401
         except jwt.ExpiredSignatureError:
             return jsonify({'message': 'Token has expired'}), 401
@@ -35,3 +64,43 @@ def token_required(f):
         return f(current_user, *args, **kwargs)
     
     return decorated
+
+
+async def authenticate_async(cookies, headers):
+    """token_required for the async serving mode: returns (user, None) or (None, error message)"""
+    try:
+        token = request_token(cookies, headers)
+    except ValueError as e:
+        return None, str(e)
+    
+    if not token:
+        return None, 'Token is missing'
+    
+    try:
+        email = decode_token(token)
+        with stage('user_lookup'):
+            current_user = await User.find_by_email_cached_async(email)
+        if not current_user or current_user.deleted_at:
+            return None, 'User not found'
+    except jwt.ExpiredSignatureError:
+        return None, 'Token has expired'
+    except jwt.InvalidTokenError:
+        return None, 'Token is invalid'
+    
+    return current_user, None
+
+
+def admin_required(f):
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        # Admin endpoints are disabled unless ADMIN_TOKEN is configured
+        if not Config.ADMIN_TOKEN:
+            return jsonify({'message': 'Admin API is disabled'}), 403
+        
+        token = request.headers.get('X-Admin-Token', '')
+        if not hmac.compare_digest(token, Config.ADMIN_TOKEN):
+            return jsonify({'message': 'Admin token is invalid'}), 401
+        
+        return f(*args, **kwargs)
+    
+    return decorated
@@ -0,0 +1,97 @@
+import os
+import time
+import queue
+import threading
+from concurrent.futures import Future
+import numpy as np
+
+
+class MicroBatcher:
+    """Coalesce concurrent predict calls for one model into batched calls.
+
+    predict_fn(context, features) is called once per flushed group of jobs that share
+    the same context (e.g. the loaded model version the requests were routed to).
+    """
+
+    def __init__(self, predict_fn, max_batch_size=64, max_delay=0.005):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self.batches = 0
+        self.rows = 0
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def predict(self, features, context=None):
+        """Queue feature rows and block until their outputs are ready"""
+        job = (np.asarray(features), Future(), context)
+        self._ensure_worker().put(job)
+        return job[1].result()
+
+    def _ensure_worker(self):
+        # The worker thread does not survive a fork, so start one per process
+        if self._pid == os.getpid() and self._thread.is_alive():
+            return self._queue
+        with self._lock:
+            if self._pid != os.getpid() or not self._thread.is_alive():
+                self._queue = queue.Queue()
+                self._thread = threading.Thread(target=self._run, args=(self._queue,), daemon=True)
+                self._thread.start()
+                self._pid = os.getpid()
+        return self._queue
+
+    def _run(self, jobs_queue):
+        while True:
+            jobs = [jobs_queue.get()]
+            rows = len(jobs[0][0])
+            deadline = time.monotonic() + self.max_delay
+
+            # Collect more jobs until the batch is full or the deadline passes
+            while rows < self.max_batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    job = jobs_queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                jobs.append(job)
+                rows += len(job[0])
+
+            # Jobs for different contexts (e.g. around a model swap) are flushed separately
+            groups = {}
+            for job in jobs:
+                groups.setdefault(id(job[2]), []).append(job)
+            for group in groups.values():
+                self._flush(group)
+
+    def _flush(self, jobs):
+        try:
+            if len(jobs) == 1:
+                features = jobs[0][0]
+            else:
+                features = np.concatenate([features for features, _, _ in jobs])
+            outputs = self.predict_fn(jobs[0][2], features)
+        except Exception as e:
+            for _, future, _ in jobs:
+                future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.rows += len(features)
+        offset = 0
+        for features, future, _ in jobs:
+            future.set_result(outputs[offset:offset + len(features)])
+            offset += len(features)
+
+    def stats(self):
+        """Number of flushed batches and rows, for tuning size and deadline"""
+        return {
+            'batches': self.batches,
+            'rows': self.rows,
+            'average_batch_size': self.rows / self.batches if self.batches else 0.0,
+            'max_batch_size': self.max_batch_size,
+            'max_delay_ms': self.max_delay * 1000
+        }
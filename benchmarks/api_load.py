@@ -0,0 +1,292 @@
+"""Load-test the prediction API and save latency/throughput results as JSON.
+
+Usage (from the project root, with the app's .env in place; in-process runs need mongomock,
+pip install -r requirements-dev.txt):
+    python benchmarks/api_load.py                                    # in-process app, mongomock database
+    python benchmarks/api_load.py --concurrency 1,8,32 --history 0,10000 --requests 500
+    python benchmarks/api_load.py --json results/HEAD.json --compare results/main.json
+    python benchmarks/api_load.py --url http://localhost:8000        # a running server (and its MongoDB)
+
+For every history size a fresh user is created and given that many saved predictions (through
+the batch endpoint), then each scenario is run at each concurrency level. In-process runs use
+mongomock, so absolute numbers leave out MongoDB itself; compare runs made the same way.
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import argparse
+import platform
+import threading
+import subprocess
+import http.client
+from datetime import datetime
+from urllib.parse import urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SCENARIOS = ('house', 'diabetes', 'history', 'login')
+LOCATIONS = ('Urban', 'Suburb', 'Rural')
+PASSWORD = 'benchmark-password'
+
+
+class InProcessClient:
+    """Flask test client without cookies, so every request authenticates by header"""
+
+    def __init__(self, app):
+        self.client = app.test_client(use_cookies=False)
+
+    def request(self, method, path, body=None, headers=None):
+        response = self.client.open(path, method=method, json=body, headers=headers or {})
+        return response.status_code, response.get_data()
+
+
+class HttpClient:
+    """Keep-alive HTTP connection to a running server (one per thread)"""
+
+    def __init__(self, url):
+        parts = urlsplit(url)
+        connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+        self.connection = connection_class(parts.hostname, parts.port, timeout=60)
+
+    def request(self, method, path, body=None, headers=None):
+        headers = dict(headers or {})
+        payload = None
+        if body is not None:
+            payload = json.dumps(body)
+            headers['Content-Type'] = 'application/json'
+        try:
+            self.connection.request(method, path, body=payload, headers=headers)
+            response = self.connection.getresponse()
+        except (http.client.HTTPException, OSError):
+            # Reconnect once if the server closed the keep-alive connection
+            self.connection.close()
+            self.connection.request(method, path, body=payload, headers=headers)
+            response = self.connection.getresponse()
+        return response.status, response.read()
+
+
+def make_client_factory(url):
+    if url:
+        return lambda: HttpClient(url)
+
+    # Point Database at mongomock before the app touches MongoDB
+    import mongomock
+    from database import Database
+    Database.initialize(mongomock.MongoClient('mongodb://localhost/lkpredictor_benchmark'))
+
+    from app import app, warm_up
+    warm_up(database=False)
+    return lambda: InProcessClient(app)
+
+
+def house_input(rng):
+    return {
+        'SquareFootage': rng.randint(500, 5000),
+        'Bedrooms': rng.randint(1, 6),
+        'Location': rng.choice(LOCATIONS)
+    }
+
+
+def diabetes_input(rng, columns):
+    return {column: rng.randint(0, 1) if column != 'BMI' else rng.randint(15, 45) for column in columns}
+
+
+def create_user(client, history, batch_size):
+    """Sign up a fresh user and save `history` predictions for them"""
+    email = f"benchmark-{uuid.uuid4().hex[:12]}@example.com"
+    status, body = client.request('POST', '/api/auth/signup', {
+        'email': email, 'name': 'Benchmark', 'password': PASSWORD
+    })
+    if status != 201:
+        raise SystemExit(f"✗ Signup failed ({status}): {body[:200]!r}")
+    headers = {'Authorization': f"Bearer {json.loads(body)['token']}"}
+
+    rng = random.Random(f"history-{history}")
+    remaining = history
+    while remaining:
+        count = min(remaining, batch_size)
+        status, body = client.request(
+            'POST', '/api/predict/house/batch', [house_input(rng) for _ in range(count)], headers
+        )
+        if status != 200:
+            raise SystemExit(f"✗ Seeding history failed ({status}): {body[:200]!r}")
+        remaining -= count
+    return email, headers
+
+
+def scenario_request(scenario, rng, email, headers, diabetes_columns):
+    if scenario == 'house':
+        return 'POST', '/api/predict/house', house_input(rng), headers
+    if scenario == 'diabetes':
+        return 'POST', '/api/predict/diabetes', diabetes_input(rng, diabetes_columns), headers
+    if scenario == 'history':
+        return 'GET', '/api/user/predictions', None, headers
+    return 'POST', '/api/auth/login', {'email': email, 'password': PASSWORD}, None
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def run_scenario(client_factory, scenario, concurrency, total_requests, email, headers, diabetes_columns, seed):
+    """Send total_requests requests from `concurrency` threads; returns latency and throughput stats"""
+    per_thread = [total_requests // concurrency + (i < total_requests % concurrency) for i in range(concurrency)]
+    latencies = [[] for _ in range(concurrency)]
+    errors = [0] * concurrency
+    clients = [client_factory() for _ in range(concurrency)]
+    start_barrier = threading.Barrier(concurrency + 1)
+
+    def worker(index):
+        # Inputs are reproducible between runs but differ between phases, so the
+        # prediction cache only helps where the same run repeats an input
+        rng = random.Random(f"{seed}-{index}")
+        client = clients[index]
+        start_barrier.wait()
+        for _ in range(per_thread[index]):
+            method, path, body, request_headers = scenario_request(scenario, rng, email, headers, diabetes_columns)
+            start = time.perf_counter()
+            try:
+                status, _ = client.request(method, path, body, request_headers)
+            except Exception:
+                status = None
+            latencies[index].append(time.perf_counter() - start)
+            if status != 200:
+                errors[index] += 1
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    start_barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    values = sorted(value * 1000 for thread_latencies in latencies for value in thread_latencies)
+    return {
+        'requests': len(values),
+        'errors': sum(errors),
+        'seconds': elapsed,
+        'rps': len(values) / elapsed if elapsed else None,
+        'latency_ms': {
+            'mean': sum(values) / len(values) if values else None,
+            'p50': percentile(values, 0.50),
+            'p90': percentile(values, 0.90),
+            'p99': percentile(values, 0.99),
+            'max': values[-1] if values else None
+        }
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path, max_regression):
+    """Print changes against a saved run; returns the number of regressions over the threshold"""
+    with open(baseline_path, 'r') as f:
+        baseline = {
+            (r['scenario'], r['history'], r['concurrency']): r for r in json.load(f)['results']
+        }
+
+    print(f"\nCompared with {baseline_path} (regression threshold {max_regression:.0%})")
+    regressions = 0
+    for result in results:
+        old = baseline.get((result['scenario'], result['history'], result['concurrency']))
+        if old is None or not old['rps'] or not old['latency_ms']['p99']:
+            continue
+        rps_change = result['rps'] / old['rps'] - 1
+        p99_change = result['latency_ms']['p99'] / old['latency_ms']['p99'] - 1
+        regressed = rps_change < -max_regression or p99_change > max_regression
+        regressions += regressed
+        print(f"  {'✗' if regressed else '✓'} {result['scenario']:<9} history={result['history']:<6} "
+              f"c={result['concurrency']:<3} rps {rps_change:+7.1%}  p99 {p99_change:+7.1%}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', help='benchmark a running server instead of the in-process app')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help='comma-separated: ' + ', '.join(SCENARIOS))
+    parser.add_argument('--concurrency', default='1,4,16', help='comma-separated thread counts')
+    parser.add_argument('--history', default='0,1000', help='comma-separated saved predictions per user')
+    parser.add_argument('--requests', type=int, default=200, help='requests per scenario and concurrency level')
+    parser.add_argument('--warmup', type=int, default=10, help='unmeasured requests before each scenario')
+    parser.add_argument('--seed-batch-size', type=int, default=1000)
+    parser.add_argument('--json', help='write the results to this file')
+    parser.add_argument('--compare', help='a previous --json file to compare against')
+    parser.add_argument('--max-regression', type=float, default=0.2,
+                        help='with --compare, exit 1 if rps drops or p99 grows by more than this fraction')
+    args = parser.parse_args()
+
+    scenarios = [scenario for scenario in args.scenarios.split(',') if scenario]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    concurrency_levels = [int(value) for value in args.concurrency.split(',')]
+    history_sizes = [int(value) for value in args.history.split(',')]
+
+    client_factory = make_client_factory(args.url)
+    from config import Config
+    with open(os.path.join(ROOT, Config.DIABETES_COLUMNS_PATH), 'r') as f:
+        diabetes_columns = json.load(f)
+
+    results = []
+    print(f"  {'scenario':<9} {'history':>7} {'conc.':>5} {'rps':>9} {'p50 ms':>8} {'p99 ms':>8} {'errors':>6}")
+    for history in history_sizes:
+        email, headers = create_user(client_factory(), history, args.seed_batch_size)
+        for scenario in scenarios:
+            if args.warmup:
+                run_scenario(client_factory, scenario, 1, args.warmup, email, headers, diabetes_columns,
+                             f"warmup-{scenario}-{history}")
+            for concurrency in concurrency_levels:
+                stats = run_scenario(
+                    client_factory, scenario, concurrency, args.requests, email, headers, diabetes_columns,
+                    f"{scenario}-{history}-{concurrency}"
+                )
+                stats.update({'scenario': scenario, 'history': history, 'concurrency': concurrency})
+                results.append(stats)
+                latency = stats['latency_ms']
+                print(f"  {scenario:<9} {history:>7} {concurrency:>5} {stats['rps']:9.1f} "
+                      f"{latency['p50']:8.2f} {latency['p99']:8.2f} {stats['errors']:>6}")
+
+    if args.json:
+        os.makedirs(os.path.dirname(os.path.abspath(args.json)), exist_ok=True)
+        with open(args.json, 'w') as f:
+            json.dump({
+                'meta': {
+                    'commit': git_commit(),
+                    'timestamp': datetime.utcnow().isoformat() + 'Z',
+                    'python': platform.python_version(),
+                    'target': args.url or 'in-process (mongomock)',
+                    'requests': args.requests,
+                    'settings': {
+                        'MODEL_ENGINE': Config.MODEL_ENGINE,
+                        'PREDICTION_CACHE_ENABLED': Config.PREDICTION_CACHE_ENABLED,
+                        'MICRO_BATCH_ENABLED': Config.MICRO_BATCH_ENABLED,
+                        'WRITE_BEHIND_ENABLED': Config.WRITE_BEHIND_ENABLED,
+                        'USER_CACHE_TTL': Config.USER_CACHE_TTL
+                    }
+                },
+                'results': results
+            }, f, indent=2)
+        print(f"✓ Results written to {args.json}")
+
+    if args.compare and compare(results, args.compare, args.max_regression):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
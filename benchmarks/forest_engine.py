@@ -0,0 +1,121 @@
+"""Compare sklearn's predict with the compiled NumPy forest engine.
+
+Usage (from the project root, with the app's .env in place):
+    python benchmarks/forest_engine.py                          # both models, batch sizes 1 to 10k
+    python benchmarks/forest_engine.py --model house --sizes 1,8,64
+    python benchmarks/forest_engine.py --json forest_engine.json
+
+Inputs are drawn around each feature's split thresholds so every tree is walked to realistic
+depths. Outputs are checked against sklearn before anything is timed.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import joblib
+import numpy as np
+from config import Config
+from forest_engine import CompiledForest
+
+warnings.filterwarnings('ignore', message='X does not have valid feature names')
+
+MODELS = {
+    'house': lambda: Config.MODEL_PATH,
+    'diabetes': lambda: Config.DIABETES_MODEL_PATH
+}
+
+
+def sample_inputs(model, rows, seed=0):
+    """Random rows spanning the range of thresholds each feature is split on"""
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(rows, model.n_features_in_))
+    for f in range(model.n_features_in_):
+        thresholds = np.concatenate([
+            tree.tree_.threshold[tree.tree_.feature == f] for tree in model.estimators_
+        ])
+        if len(thresholds):
+            low, high = thresholds.min(), thresholds.max()
+            margin = (high - low) * 0.1 + 1.0
+            X[:, f] = rng.uniform(low - margin, high + margin, rows)
+    return X
+
+
+def predict_fn(model):
+    return model.predict_proba if getattr(model, 'classes_', None) is not None else model.predict
+
+
+def best_of(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(name, sizes, repeat):
+    model = joblib.load(MODELS[name]())
+    start = time.perf_counter()
+    compiled = CompiledForest.from_sklearn(model)
+    compile_seconds = time.perf_counter() - start
+
+    X = sample_inputs(model, max(max(sizes), 2000))
+    expected, actual = predict_fn(model)(X), predict_fn(compiled)(X)
+    max_error = float(np.abs(expected - actual).max())
+    assert np.allclose(expected, actual, rtol=1e-9, atol=1e-9), f"{name}: outputs differ by {max_error}"
+    if getattr(model, 'classes_', None) is not None:
+        assert np.array_equal(model.predict(X), compiled.predict(X)), f"{name}: predicted classes differ"
+
+    print(f"{name}: {compiled.n_estimators} trees, {compiled.node_count} nodes, "
+          f"{compiled.nbytes() / 1024 / 1024:.1f} MB compiled in {compile_seconds * 1000:.0f} ms, "
+          f"max |difference| {max_error:.2e}")
+    print(f"  {'rows':>6} {'sklearn ms':>11} {'compiled ms':>12} {'speedup':>8}")
+
+    results = []
+    for size in sizes:
+        batch = X[:size]
+        sklearn_seconds = best_of(lambda: predict_fn(model)(batch), repeat)
+        compiled_seconds = best_of(lambda: predict_fn(compiled)(batch), repeat)
+        print(f"  {size:>6} {sklearn_seconds * 1000:11.3f} {compiled_seconds * 1000:12.3f} "
+              f"{sklearn_seconds / compiled_seconds:7.2f}x")
+        results.append({'rows': size, 'sklearn_ms': sklearn_seconds * 1000, 'compiled_ms': compiled_seconds * 1000})
+
+    # Largest batch size where the compiled engine is still faster (a guide for MODEL_ENGINE_FALLBACK_ROWS)
+    faster = [result['rows'] for result in results if result['compiled_ms'] < result['sklearn_ms']]
+    crossover = max(faster) if faster else None
+    print(f"  compiled engine faster up to {crossover} rows" if crossover else "  sklearn faster at every size")
+    return {
+        'model': name,
+        'trees': compiled.n_estimators,
+        'nodes': compiled.node_count,
+        'compiled_mb': compiled.nbytes() / 1024 / 1024,
+        'max_difference': max_error,
+        'faster_up_to_rows': crossover,
+        'results': results
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--model', choices=sorted(MODELS), help='benchmark one model (default: both)')
+    parser.add_argument('--sizes', default='1,10,100,1000,10000', help='comma-separated batch sizes')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--json', help='write the results to this file')
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+    reports = [run(name, sizes, args.repeat) for name in ([args.model] if args.model else sorted(MODELS))]
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(reports, f, indent=2)
+        print(f"✓ Results written to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+"""Compare the object-based prediction history path with the one /api/user/predictions runs.
+
+The endpoint builds projected row dicts, wraps them with prediction_page and encodes the
+payload with the app's JSON provider (orjson unless JSON_PROVIDER says otherwise).
+
+Usage (from the project root, with the app's .env in place):
+    python benchmarks/history_serialization.py              # serialization only
+    python benchmarks/history_serialization.py --mongo      # also read 10k records through MongoDB
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from datetime import datetime, timedelta
+from bson import ObjectId
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import Database
+from models.prediction import Prediction
+from app import app, prediction_page
+
+
+def make_documents(user_id, count):
+    start = datetime(2025, 1, 1)
+    docs = []
+    for i in range(count):
+        if i % 2:
+            docs.append({
+                '_id': ObjectId(),
+                'user_id': user_id,
+                'prediction_type': 'house',
+                'input_data': {'SquareFootage': 1500 + i, 'Bedrooms': 3, 'Location': 'Urban'},
+                'predicted_value': 25000000.0 + i,
+                'metadata': {},
+                'created_at': start + timedelta(seconds=i)
+            })
+        else:
+            docs.append({
+                '_id': ObjectId(),
+                'user_id': user_id,
+                'prediction_type': 'diabetes',
+                'input_data': {'BMI': 28, 'Age': 7, 'HighBP': 1},
+                'predicted_value': 1,
+                'metadata': {
+                    'result_text': 'Prediabetes',
+                    'confidence': 61.0,
+                    'probabilities': {'no_diabetes': 30.0, 'prediabetes': 61.0, 'diabetes': 9.0}
+                },
+                'created_at': start + timedelta(seconds=i)
+            })
+    return docs
+
+
+def legacy_to_dict(prediction):
+    """to_dict as it was before the fast path (strftime plus slicing)"""
+    return {
+        'id': str(prediction._id),
+        'user_id': prediction.user_id,
+        'prediction_type': prediction.prediction_type,
+        'input_data': prediction.input_data,
+        'predicted_value': prediction.predicted_value,
+        'metadata': prediction.metadata,
+        'created_at': prediction.created_at.strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
+    }
+
+
+def object_path(docs):
+    predictions = [
+        Prediction(
+            user_id=doc['user_id'],
+            prediction_type=doc['prediction_type'],
+            input_data=doc['input_data'],
+            predicted_value=doc['predicted_value'],
+            metadata=doc.get('metadata', {}),
+            created_at=doc.get('created_at'),
+            _id=doc['_id']
+        )
+        for doc in docs
+    ]
+    return json.dumps({'success': True, 'predictions': [legacy_to_dict(p) for p in predictions]})
+
+
+def endpoint_payload(rows):
+    """The history response body for one page holding every row"""
+    return app.json.dumps(prediction_page(rows, len(rows), len(rows)))
+
+
+def endpoint_path(docs, user_id):
+    return endpoint_payload([Prediction.history_dict(doc, user_id) for doc in docs])
+
+
+def best_of(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def report(label, old, new):
+    print(f"{label}")
+    print(f"  object path:   {old * 1000:8.1f} ms")
+    print(f"  endpoint path: {new * 1000:8.1f} ms  ({old / new:.2f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--records', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--mongo', action='store_true', help='also benchmark reads from MONGO_URI')
+    args = parser.parse_args()
+
+    user_id = f'benchmark-{ObjectId()}'
+    docs = make_documents(user_id, args.records)
+
+    assert json.loads(object_path(docs[:100]))['predictions'] == json.loads(endpoint_path(docs[:100], user_id))['predictions']
+    report(
+        f"Serialization of {args.records} records with {type(app.json).__name__} (best of {args.repeat})",
+        best_of(lambda: object_path(docs), args.repeat),
+        best_of(lambda: endpoint_path(docs, user_id), args.repeat)
+    )
+
+    if args.mongo:
+        db = Database.get_db()
+        db.predictions.insert_many(docs)
+        try:
+            report(
+                f"MongoDB read + serialization of {args.records} records (best of {args.repeat})",
+                best_of(lambda: object_path(list(Prediction.find_user_predictions(user_id))), args.repeat),
+                best_of(lambda: endpoint_payload(list(Prediction.iter_user_prediction_dicts(user_id))), args.repeat)
+            )
+        finally:
+            db.predictions.delete_many({'user_id': user_id})
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""Verify the house price lookup index against the forest and time both.
+
+Usage (from the project root, with the app's .env in place):
+    python benchmarks/house_lookup.py                        # 100k random inputs
+    python benchmarks/house_lookup.py --samples 1000000 --max-bedrooms 10
+    python benchmarks/house_lookup.py --json house_lookup.json
+
+Square footage is drawn across the whole threshold range and also placed exactly on split
+thresholds and one float32 step either side of them; bedroom counts and locations include
+values outside the tables. Every price must equal model.predict exactly; exits 1 otherwise.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import joblib
+import numpy as np
+from config import Config
+from encoders import HouseFeatureEncoder
+from house_index import HouseLookupIndex
+
+warnings.filterwarnings('ignore', message='X does not have valid feature names')
+
+
+def sample_inputs(index, encoder, samples, seed=0):
+    """Encoded rows covering interval interiors, exact change points and rows the tables skip"""
+    rng = np.random.default_rng(seed)
+    X = encoder.matrix(samples)
+
+    change_points = np.unique(np.concatenate(index.bounds)) if index.interval_count > index.table_count else np.zeros(1)
+    low, high = float(change_points.min()), float(change_points.max())
+    margin = (high - low) * 0.1 + 1.0
+    square_footage = rng.uniform(low - margin, high + margin, samples)
+    on_threshold = rng.random(samples) < 0.5
+    picked = rng.choice(change_points, samples).astype(np.float32)
+    step = rng.integers(-1, 2, samples)
+    picked = np.where(step < 0, np.nextafter(picked, np.float32(-np.inf)),
+                      np.where(step > 0, np.nextafter(picked, np.float32(np.inf)), picked))
+    X[:, encoder.square_footage_index] = np.where(on_threshold, picked, square_footage)
+
+    X[:, encoder.bedrooms_index] = rng.integers(-2, index.max_bedrooms + 4, samples)
+    fractional = rng.random(samples) < 0.01
+    X[fractional, encoder.bedrooms_index] += 0.5
+
+    locations = list(encoder.location_index.values())
+    states = rng.integers(0, len(locations) + 1, samples)
+    for state, column in enumerate(locations):
+        X[states == state, column] = 1
+    return X
+
+
+def best_of(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--samples', type=int, default=100000)
+    parser.add_argument('--max-bedrooms', type=int, default=Config.HOUSE_LOOKUP_MAX_BEDROOMS)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help='write the results to this file')
+    args = parser.parse_args()
+
+    encoder = HouseFeatureEncoder.from_file(Config.MODEL_COLUMNS_PATH)
+    model = joblib.load(Config.MODEL_PATH)
+
+    start = time.perf_counter()
+    index = HouseLookupIndex.from_forest(model, encoder, args.max_bedrooms)
+    build_seconds = time.perf_counter() - start
+    print(f"Index: {index.table_count} tables, {index.interval_count} intervals, "
+          f"{index.nbytes() / 1024:.0f} KB, built in {build_seconds:.2f}s from {len(model.estimators_)} trees")
+
+    X = sample_inputs(index, encoder, args.samples, args.seed)
+    _, covered = index.lookup(X)
+    expected = model.predict(X)
+    actual = index.predict(X)
+    mismatches = int(np.count_nonzero(expected != actual))
+    max_error = float(np.abs(expected - actual).max()) if len(X) else 0.0
+    print(f"{'✓' if not mismatches else '✗'} {args.samples} inputs ({covered.mean():.1%} from the tables): "
+          f"{mismatches} differ from model.predict (max |difference| {max_error:.2e})")
+
+    row = X[covered][:1]
+    model_ms = best_of(lambda: model.predict(row), args.repeat) * 1000
+    index_ms = best_of(lambda: index.predict(row), args.repeat) * 1000
+    batch = X[covered][:1000]
+    model_batch_ms = best_of(lambda: model.predict(batch), args.repeat) * 1000
+    index_batch_ms = best_of(lambda: index.predict(batch), args.repeat) * 1000
+    print(f"  {'rows':>6} {'model ms':>9} {'index ms':>9} {'speedup':>8}")
+    print(f"  {1:>6} {model_ms:9.3f} {index_ms:9.3f} {model_ms / index_ms:7.1f}x")
+    print(f"  {len(batch):>6} {model_batch_ms:9.3f} {index_batch_ms:9.3f} {model_batch_ms / index_batch_ms:7.1f}x")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({
+                'trees': len(model.estimators_),
+                'tables': index.table_count,
+                'intervals': index.interval_count,
+                'index_kb': index.nbytes() / 1024,
+                'build_seconds': build_seconds,
+                'samples': args.samples,
+                'covered': float(covered.mean()),
+                'mismatches': mismatches,
+                'max_difference': max_error,
+                'single_row_ms': {'model': model_ms, 'index': index_ms},
+                'batch_ms': {'rows': len(batch), 'model': model_batch_ms, 'index': index_batch_ms}
+            }, f, indent=2)
+        print(f"✓ Results written to {args.json}")
+
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
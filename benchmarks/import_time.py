@@ -0,0 +1,97 @@
+"""Measure how long importing the app takes, from parsed `python -X importtime` output.
+
+Usage (from the project root, with the app's .env in place):
+    python benchmarks/import_time.py                       # best of 3 fresh interpreters
+    python benchmarks/import_time.py --max-ms 1500         # exit 1 if the import got slower
+    python benchmarks/import_time.py --json import.json    # save the results for comparison
+"""
+import os
+import re
+import sys
+import json
+import argparse
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# "import time:  self [us] | cumulative | imported package" (nesting shown by indentation)
+LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)$')
+
+# Modules that should stay off the import path (loaded with the models instead)
+HEAVY_MODULES = ('pandas', 'sklearn', 'scipy', 'joblib')
+
+
+def measure(module):
+    """Import a module in a fresh interpreter.
+
+    Returns {name: (self_us, cumulative_us, depth)} and the direct imports of each top-level module.
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=ROOT, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise SystemExit(f"✗ Importing {module} failed:\n{result.stderr[-2000:]}")
+
+    imports = {}
+    children = {}
+    pending = []
+    for line in result.stderr.splitlines():
+        match = LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            depth = len(indent) // 2
+            imports[name] = (int(self_us), int(cumulative_us), depth)
+            # A module is reported after everything it imports
+            if depth == 1:
+                pending.append(name)
+            elif depth == 0:
+                children[name] = pending
+                pending = []
+    return imports, children
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--module', default='app')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--top', type=int, default=15)
+    parser.add_argument('--max-ms', type=float, help='fail when the import takes longer than this')
+    parser.add_argument('--json', help='write the results to this file')
+    args = parser.parse_args()
+
+    runs = [measure(args.module) for _ in range(args.repeat)]
+    best, children = min(runs, key=lambda run: run[0][args.module][1])
+    total_ms = best[args.module][1] / 1000
+
+    print(f"Import of {args.module}: {total_ms:.1f} ms (best of {args.repeat})")
+    print(f"  {'module':<40} {'self ms':>9} {'cumul. ms':>10}")
+    print(f"  {args.module + ' (own code)':<40} {best[args.module][0] / 1000:9.1f}")
+    direct = [(name, best[name]) for name in children.get(args.module, [])]
+    for name, (self_us, cumulative_us, _) in sorted(direct, key=lambda item: -item[1][1])[:args.top]:
+        print(f"  {name:<40} {self_us / 1000:9.1f} {cumulative_us / 1000:10.1f}")
+
+    heavy = sorted(name for name in best if name in HEAVY_MODULES)
+    if heavy:
+        print(f"⚠ Heavy modules imported: {', '.join(heavy)}")
+    else:
+        print(f"✓ None of {', '.join(HEAVY_MODULES)} imported")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({
+                'module': args.module,
+                'total_ms': total_ms,
+                'runs_ms': [imports[args.module][1] / 1000 for imports, _ in runs],
+                'heavy_modules': heavy,
+                'imports': {name: {'self_ms': s / 1000, 'cumulative_ms': c / 1000} for name, (s, c, _) in best.items()}
+            }, f, indent=2)
+        print(f"✓ Results written to {args.json}")
+
+    if args.max_ms is not None and total_ms > args.max_ms:
+        print(f"✗ Import took {total_ms:.1f} ms, over the {args.max_ms:.1f} ms budget")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+import os
+import sys
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+
+
+def file_fingerprint(*paths):
+    """Fingerprint model artifacts by path, size and modification time"""
+    digest = hashlib.blake2b(digest_size=8)
+    for path in paths:
+        stat = os.stat(path)
+        digest.update(f'{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns};'.encode())
+    return digest.hexdigest()
+
+
+def _sizeof(value):
+    if isinstance(value, np.ndarray):
+        return value.nbytes + 112
+    return sys.getsizeof(value)
+
+
+class PredictionCache:
+    """Thread-safe LRU/TTL cache of model outputs keyed on encoded feature rows"""
+
+    # Rough per-entry overhead of the key, tuple and OrderedDict node
+    ENTRY_OVERHEAD = 200
+
+    def __init__(self, max_entries=10000, max_bytes=16 * 1024 * 1024, ttl=3600):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def make_key(model_name, version, row):
+        """Canonical hash of a float64 feature row plus the model version"""
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(f'{model_name}:{version}:'.encode())
+        digest.update(np.ascontiguousarray(row, dtype=np.float64).tobytes())
+        return (model_name, digest.digest())
+
+    def _check_version(self, model_name, version):
+        # A new model version drops every entry cached for the old one
+        if self._versions.get(model_name) != version:
+            if model_name in self._versions:
+                self._drop(lambda key: key[0] == model_name)
+            self._versions[model_name] = version
+
+    def _drop(self, predicate):
+        for key in [key for key in self._entries if predicate(key)]:
+            _, _, size = self._entries.pop(key)
+            self._bytes -= size
+        self.invalidations += 1
+
+    def get(self, key):
+        """Return the cached value for key, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at, size = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self._bytes -= size
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """Store a value, evicting least recently used entries to stay in bounds"""
+        size = _sizeof(value) + self.ENTRY_OVERHEAD
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[2]
+            self._entries[key] = (value, time.monotonic() + self.ttl, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def predict(self, model_name, version, features, predict_fn):
+        """Return one output per feature row, calling predict_fn once on the misses"""
+        with self._lock:
+            self._check_version(model_name, version)
+
+        keys = [self.make_key(model_name, version, row) for row in features]
+        outputs = [self.get(key) for key in keys]
+        missing = [i for i, output in enumerate(outputs) if output is None]
+
+        if missing:
+            computed = predict_fn(features[missing] if len(missing) < len(features) else features)
+            for i, output in zip(missing, computed):
+                if isinstance(output, np.ndarray):
+                    output = output.copy()
+                outputs[i] = output
+                self.put(keys[i], output)
+        return np.asarray(outputs)
+
+    def invalidate(self, model_name=None):
+        """Drop cached entries for one model, or all of them"""
+        with self._lock:
+            if model_name is None:
+                self._drop(lambda key: True)
+                self._versions.clear()
+            else:
+                self._drop(lambda key: key[0] == model_name)
+                self._versions.pop(model_name, None)
+
+    def stats(self):
+        """Counters and current size, for tuning the bounds"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations
+            }
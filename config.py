@@ -43,4 +43,120 @@ class Config:
     DIABETES_COLUMNS_PATH = os.getenv('DIABETES_COLUMNS_PATH')
     if not DIABETES_COLUMNS_PATH:
         raise ValueError("DIABETES_COLUMNS_PATH environment variable is required!")
-
+    
+    # Batch prediction endpoints
+    MAX_BATCH_SIZE = int(os.getenv('MAX_BATCH_SIZE', 10000))
+    
+    # Prediction result cache
+    PREDICTION_CACHE_ENABLED = os.getenv('PREDICTION_CACHE_ENABLED', 'true').lower() == 'true'
+    PREDICTION_CACHE_MAX_ENTRIES = int(os.getenv('PREDICTION_CACHE_MAX_ENTRIES', 10000))
+    PREDICTION_CACHE_MAX_BYTES = int(os.getenv('PREDICTION_CACHE_MAX_BYTES', 16 * 1024 * 1024))
+    PREDICTION_CACHE_TTL = int(os.getenv('PREDICTION_CACHE_TTL', 3600))
+    
+    # Micro-batching of concurrent model calls (opt-in)
+    MICRO_BATCH_ENABLED = os.getenv('MICRO_BATCH_ENABLED', 'false').lower() == 'true'
+    MICRO_BATCH_MAX_SIZE = int(os.getenv('MICRO_BATCH_MAX_SIZE', 64))
+    MICRO_BATCH_MAX_DELAY_MS = float(os.getenv('MICRO_BATCH_MAX_DELAY_MS', 5))
+    
+    # Authenticated user cache (seconds, 0 disables)
+    USER_CACHE_TTL = int(os.getenv('USER_CACHE_TTL', 30))
+    USER_CACHE_MAX_SIZE = int(os.getenv('USER_CACHE_MAX_SIZE', 10000))
+    
+    # Write-behind persistence of prediction records (opt-in)
+    WRITE_BEHIND_ENABLED = os.getenv('WRITE_BEHIND_ENABLED', 'false').lower() == 'true'
+    WRITE_BEHIND_MAX_QUEUE = int(os.getenv('WRITE_BEHIND_MAX_QUEUE', 10000))
+    WRITE_BEHIND_BATCH_SIZE = int(os.getenv('WRITE_BEHIND_BATCH_SIZE', 500))
+    WRITE_BEHIND_FLUSH_INTERVAL = float(os.getenv('WRITE_BEHIND_FLUSH_INTERVAL', 0.5))
+    WRITE_BEHIND_MAX_RETRIES = int(os.getenv('WRITE_BEHIND_MAX_RETRIES', 3))
+    WRITE_BEHIND_SPILL_PATH = os.getenv('WRITE_BEHIND_SPILL_PATH')  # Append-only file used while Mongo is unreachable
+    
+    # Create MongoDB indexes when the app starts
+    CREATE_INDEXES_ON_STARTUP = os.getenv('CREATE_INDEXES_ON_STARTUP', 'true').lower() == 'true'
+    
+    # Prediction history pagination
+    HISTORY_PAGE_SIZE = int(os.getenv('HISTORY_PAGE_SIZE', 50))
+    HISTORY_MAX_PAGE_SIZE = int(os.getenv('HISTORY_MAX_PAGE_SIZE', 500))
+    
+    # Model registry: poll model files for changes every N seconds (0 disables)
+    MODEL_WATCH_INTERVAL = float(os.getenv('MODEL_WATCH_INTERVAL', 0))
+    
+    # Shared secret for /api/admin/* (admin API disabled when unset)
+    ADMIN_TOKEN = os.getenv('ADMIN_TOKEN')
+    
+    # joblib mmap_mode for model files ('r' maps numpy arrays from uncompressed pickles; unset loads into memory)
+    MODEL_MMAP_MODE = os.getenv('MODEL_MMAP_MODE') or None
+    
+    # Load models on first use (or warm_up()) instead of when the app module is imported
+    MODEL_LAZY_LOAD = os.getenv('MODEL_LAZY_LOAD', 'true').lower() == 'true'
+    
+    # Forest inference engine: 'sklearn', or 'compiled' (flattened node arrays evaluated with NumPy)
+    MODEL_ENGINE = os.getenv('MODEL_ENGINE', 'sklearn').lower()
+    MODEL_ENGINE_FALLBACK_ROWS = int(os.getenv('MODEL_ENGINE_FALLBACK_ROWS', 500))  # Larger batches use sklearn (0 never does)
+    
+    # Answer house predictions from exact lookup tables built from the forest at load time
+    HOUSE_LOOKUP_INDEX = os.getenv('HOUSE_LOOKUP_INDEX', 'false').lower() == 'true'
+    HOUSE_LOOKUP_MAX_BEDROOMS = int(os.getenv('HOUSE_LOOKUP_MAX_BEDROOMS', 20))  # Larger counts use the model
+    
+    # Request, model and MongoDB timings exported at /metrics (Prometheus text format)
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+    # Scrapes authenticate with "Authorization: Bearer <METRICS_TOKEN>" or the admin X-Admin-Token header;
+    # with neither token configured /metrics answers 403 unless METRICS_PUBLIC opts out of authentication
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+    METRICS_PUBLIC = os.getenv('METRICS_PUBLIC', 'false').lower() == 'true'
+    
+    # MongoDB client pool and timeouts (unset keeps the MONGO_URI / driver defaults)
+    MONGO_MAX_POOL_SIZE = int(os.getenv('MONGO_MAX_POOL_SIZE')) if os.getenv('MONGO_MAX_POOL_SIZE') else None
+    MONGO_MIN_POOL_SIZE = int(os.getenv('MONGO_MIN_POOL_SIZE')) if os.getenv('MONGO_MIN_POOL_SIZE') else None
+    MONGO_MAX_IDLE_TIME_MS = int(os.getenv('MONGO_MAX_IDLE_TIME_MS')) if os.getenv('MONGO_MAX_IDLE_TIME_MS') else None
+    MONGO_CONNECT_TIMEOUT_MS = int(os.getenv('MONGO_CONNECT_TIMEOUT_MS')) if os.getenv('MONGO_CONNECT_TIMEOUT_MS') else None
+    MONGO_SOCKET_TIMEOUT_MS = int(os.getenv('MONGO_SOCKET_TIMEOUT_MS')) if os.getenv('MONGO_SOCKET_TIMEOUT_MS') else None
+    MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv('MONGO_SERVER_SELECTION_TIMEOUT_MS')) if os.getenv('MONGO_SERVER_SELECTION_TIMEOUT_MS') else None
+    MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv('MONGO_WAIT_QUEUE_TIMEOUT_MS')) if os.getenv('MONGO_WAIT_QUEUE_TIMEOUT_MS') else None
+    MONGO_COMPRESSORS = os.getenv('MONGO_COMPRESSORS')  # e.g. zstd,snappy,zlib (zstd/snappy need their Python packages)
+    
+    # Per-collection write concern (w: 0, 1, N or majority) and read preference
+    # (primary, primaryPreferred, secondary, secondaryPreferred, nearest); unset uses the client default
+    MONGO_WRITE_CONCERNS = {
+        'users': os.getenv('MONGO_USERS_WRITE_CONCERN'),
+        'predictions': os.getenv('MONGO_PREDICTIONS_WRITE_CONCERN'),
+        'user_stats': os.getenv('MONGO_USER_STATS_WRITE_CONCERN')
+    }
+    MONGO_READ_PREFERENCES = {
+        'users': os.getenv('MONGO_USERS_READ_PREFERENCE'),
+        'predictions': os.getenv('MONGO_PREDICTIONS_READ_PREFERENCE'),
+        'user_stats': os.getenv('MONGO_USER_STATS_READ_PREFERENCE')
+    }
+    MONGO_WRITE_TIMEOUT_MS = int(os.getenv('MONGO_WRITE_TIMEOUT_MS')) if os.getenv('MONGO_WRITE_TIMEOUT_MS') else None
+    
+    # Password hashing: werkzeug method (stored hashes made otherwise are upgraded at login), pool
+    # processes per worker (0 hashes on the request thread), operations allowed in flight before
+    # new sign-ins get a 503, and the longest a request waits for its hash
+    PASSWORD_HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD', 'scrypt')
+    PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', 2))
+    PASSWORD_HASH_MAX_PENDING = int(os.getenv('PASSWORD_HASH_MAX_PENDING', 8))
+    PASSWORD_HASH_TIMEOUT = float(os.getenv('PASSWORD_HASH_TIMEOUT', 10))
+    
+    # Background account deletion: predictions removed per batch, pause between batches (seconds),
+    # how long a process holds a job before another may resume it, how often idle workers poll, and how
+    # long after the request the last sweep runs (other workers keep cached users for USER_CACHE_TTL)
+    ACCOUNT_DELETION_BATCH_SIZE = int(os.getenv('ACCOUNT_DELETION_BATCH_SIZE', 500))
+    ACCOUNT_DELETION_BATCH_DELAY = float(os.getenv('ACCOUNT_DELETION_BATCH_DELAY', 0.1))
+    ACCOUNT_DELETION_LEASE = int(os.getenv('ACCOUNT_DELETION_LEASE', 60))
+    ACCOUNT_DELETION_POLL_INTERVAL = float(os.getenv('ACCOUNT_DELETION_POLL_INTERVAL', 5))
+    ACCOUNT_DELETION_SETTLE = int(os.getenv('ACCOUNT_DELETION_SETTLE', USER_CACHE_TTL + 30))
+    
+    # HTTP responses: brotli/gzip compression of text bodies of at least HTTP_COMPRESSION_MIN_SIZE
+    # bytes (brotli needs the brotli package), compressed copies of ETagged bodies kept per worker,
+    # and the JSON provider ('orjson', or 'default' for the standard library)
+    HTTP_COMPRESSION = os.getenv('HTTP_COMPRESSION', 'true').lower() == 'true'
+    HTTP_COMPRESSION_MIN_SIZE = int(os.getenv('HTTP_COMPRESSION_MIN_SIZE', 1024))
+    HTTP_GZIP_LEVEL = int(os.getenv('HTTP_GZIP_LEVEL', 6))
+    HTTP_BROTLI_QUALITY = int(os.getenv('HTTP_BROTLI_QUALITY', 4))
+    HTTP_COMPRESSION_CACHE_SIZE = int(os.getenv('HTTP_COMPRESSION_CACHE_SIZE', 64))
+    JSON_PROVIDER = os.getenv('JSON_PROVIDER', 'orjson')
+    
+    # Async serving mode (asgi.py): threads running model inference, inference calls allowed to
+    # queue for them, and threads serving the routes that are handed to the Flask app
+    ASYNC_INFERENCE_WORKERS = int(os.getenv('ASYNC_INFERENCE_WORKERS', min(4, os.cpu_count() or 1)))
+    ASYNC_INFERENCE_MAX_PENDING = int(os.getenv('ASYNC_INFERENCE_MAX_PENDING', 64))
+    ASYNC_WSGI_WORKERS = int(os.getenv('ASYNC_WSGI_WORKERS', 10))
@@ -1,22 +1,249 @@
-from pymongo import MongoClient
+import os
+import asyncio
+from pymongo import MongoClient, ASCENDING, DESCENDING, ReadPreference, WriteConcern
+from pymongo.errors import OperationFailure
+from datetime import datetime
+from bson import ObjectId
 from config import Config
+from metrics import MongoCommandListener
 
 class Database:
     client = None
     db = None
+    pid = None
+    _collections = {}
+    
+    READ_PREFERENCES = {
+        'primary': ReadPreference.PRIMARY,
+        'primarypreferred': ReadPreference.PRIMARY_PREFERRED,
+        'secondary': ReadPreference.SECONDARY,
+        'secondarypreferred': ReadPreference.SECONDARY_PREFERRED,
+        'nearest': ReadPreference.NEAREST
+    }
+    
+    # Indexes the app's queries rely on: collection -> [(keys, options)]
+    INDEXES = {
+        'users': [
+            ([('email', ASCENDING)], {'name': 'email_unique', 'unique': True})
+        ],
+        'predictions': [
+            ([('user_id', ASCENDING), ('created_at', DESCENDING), ('_id', DESCENDING)], {'name': 'user_id_created_at_id'}),
+            # _id-range batches of background account deletion
+            ([('user_id', ASCENDING), ('_id', ASCENDING)], {'name': 'user_id_id'})
+        ],
+        'account_deletions': [
+            ([('token', ASCENDING)], {'name': 'token_unique', 'unique': True}),
+            ([('status', ASCENDING), ('requested_at', ASCENDING)], {'name': 'status_requested_at'}),
+            # Finished jobs (and their status pages) are kept for a week
+            ([('finished_at', ASCENDING)], {'name': 'finished_at_ttl', 'expireAfterSeconds': 7 * 24 * 3600})
+        ]
+    }
     
     @staticmethod
-    def initialize():
-        Database.client = MongoClient(Config.MONGO_URI)
+    def client_options():
+        """MongoClient keyword arguments from Config (unset options are left to MONGO_URI)"""
+        options = {
+            'maxPoolSize': Config.MONGO_MAX_POOL_SIZE,
+            'minPoolSize': Config.MONGO_MIN_POOL_SIZE,
+            'maxIdleTimeMS': Config.MONGO_MAX_IDLE_TIME_MS,
+            'connectTimeoutMS': Config.MONGO_CONNECT_TIMEOUT_MS,
+            'socketTimeoutMS': Config.MONGO_SOCKET_TIMEOUT_MS,
+            'serverSelectionTimeoutMS': Config.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+            'waitQueueTimeoutMS': Config.MONGO_WAIT_QUEUE_TIMEOUT_MS,
+            'compressors': Config.MONGO_COMPRESSORS
+        }
+        options = {name: value for name, value in options.items() if value is not None}
+        if Config.METRICS_ENABLED:
+            options['event_listeners'] = [MongoCommandListener()]
+        return options
+    
+    @staticmethod
+    def initialize(client=None):
+        """Create this process's client (or use the given one, e.g. mongomock in benchmarks)"""
+        Database.client = client or MongoClient(Config.MONGO_URI, **Database.client_options())
         Database.db = Database.client.get_database()
+        Database.pid = os.getpid()
+        Database._collections = {}
         
     @staticmethod
     def get_db():
-        if Database.db is None:
+        # MongoClient is not fork-safe: a forked worker creates its own instead of using the parent's
+        if Database.db is None or Database.pid != os.getpid():
             Database.initialize()
         return Database.db
     
+    @staticmethod
+    def collection(name, acknowledged=False):
+        """A collection with its configured read preference and write concern.
+        
+        acknowledged=True upgrades an unacknowledged (w=0) write concern to w=1, for writes
+        whose result the caller needs (e.g. deleting an account).
+        """
+        db = Database.get_db()
+        collection = Database._collections.get((name, acknowledged))
+        if collection is None:
+            collection = db.get_collection(
+                name,
+                read_preference=Database.read_preference(Config.MONGO_READ_PREFERENCES.get(name)),
+                write_concern=Database.write_concern(Config.MONGO_WRITE_CONCERNS.get(name))
+            )
+            if acknowledged and not collection.write_concern.acknowledged:
+                collection = collection.with_options(write_concern=WriteConcern(w=1))
+            Database._collections[(name, acknowledged)] = collection
+        return collection
+    
+    @staticmethod
+    def read_preference(name):
+        if not name:
+            return None
+        try:
+            return Database.READ_PREFERENCES[name.lower()]
+        except KeyError:
+            raise ValueError(f"Unknown read preference: {name}")
+    
+    @staticmethod
+    def write_concern(w):
+        if not w:
+            return None
+        w = int(w) if w.isdigit() else w
+        if w in (0, 1) or Config.MONGO_WRITE_TIMEOUT_MS is None:
+            return WriteConcern(w=w)
+        return WriteConcern(w=w, wtimeout=Config.MONGO_WRITE_TIMEOUT_MS)
+    
     @staticmethod
     def close():
         if Database.client:
             Database.client.close()
+    
+    @staticmethod
+    def ensure_indexes():
+        """Create missing indexes (safe to run repeatedly)"""
+        db = Database.get_db()
+        created = []
+        for collection, indexes in Database.INDEXES.items():
+            for keys, options in indexes:
+                created.append(db[collection].create_index(keys, **options))
+        return created
+    
+    @staticmethod
+    def explain_queries():
+        """Explain the app's hot queries and report whether each one uses an index"""
+        db = Database.get_db()
+        now = datetime.utcnow()
+        queries = {
+            'users.find_by_email': db.command('explain', {
+                'find': 'users', 'filter': {'email': ''}, 'limit': 1
+            }),
+            'predictions.find_user_predictions': db.command('explain', {
+                'find': 'predictions', 'filter': {'user_id': ''}, 'sort': {'created_at': -1, '_id': -1}
+            }),
+            'user_stats.get': db.command('explain', {
+                'find': 'user_stats', 'filter': {'_id': ''}, 'limit': 1
+            }),
+            'account_deletions.claim': db.command('explain', {
+                'find': 'account_deletions',
+                'filter': {'$or': [{'status': 'pending'}, {'status': 'running', 'lease_until': {'$lt': now}}]},
+                'sort': {'requested_at': 1},
+                'limit': 1
+            }),
+            'account_deletions.status': db.command('explain', {
+                'find': 'account_deletions', 'filter': {'token': ''}, 'limit': 1
+            }),
+            'predictions.account_deletion_batch': db.command('explain', {
+                'find': 'predictions', 'filter': {'user_id': '', '_id': {'$gt': ObjectId()}}, 'sort': {'_id': 1}, 'limit': 500
+            })
+        }
+        
+        report = []
+        for name, explain in queries.items():
+            stages = Database._plan_stages(explain['queryPlanner']['winningPlan'])
+            report.append({
+                'query': name,
+                'stages': stages,
+                'uses_index': bool({'IXSCAN', 'COUNT_SCAN', 'IDHACK', 'EXPRESS_IXSCAN'} & set(stages)),
+                'collection_scan': 'COLLSCAN' in stages
+            })
+        return report
+    
+    @staticmethod
+    def _plan_stages(plan):
+        """Flatten the stage names of an explain plan tree"""
+        stages = []
+        while plan:
+            stages.append(plan.get('stage'))
+            if 'queryPlan' in plan:
+                plan = plan['queryPlan']
+            elif 'inputStage' in plan:
+                plan = plan['inputStage']
+            elif plan.get('inputStages'):
+                for child in plan['inputStages']:
+                    stages.extend(Database._plan_stages(child))
+                break
+            else:
+                break
+        return stages
+    
+    @staticmethod
+    def index_usage():
+        """Per-index access counts since server start ($indexStats)"""
+        db = Database.get_db()
+        usage = {}
+        for collection in Database.INDEXES:
+            try:
+                usage[collection] = [
+                    {'name': stats['name'], 'ops': stats['accesses']['ops'], 'since': stats['accesses']['since']}
+                    for stats in db[collection].aggregate([{'$indexStats': {}}])
+                ]
+            except OperationFailure as e:
+                usage[collection] = {'error': str(e)}
+        return usage
+
+
+class AsyncDatabase:
+    """Motor (asyncio) counterpart of Database for the async serving mode (asgi.py)"""
+    client = None
+    db = None
+    pid = None
+    loop = None
+    _collections = {}
+    
+    @staticmethod
+    def initialize(client=None):
+        """Create this process's async client (or use the given one) on the running event loop"""
+        if client is None:
+            # Only the async serving mode needs motor
+            from motor.motor_asyncio import AsyncIOMotorClient
+            client = AsyncIOMotorClient(Config.MONGO_URI, **Database.client_options())
+        AsyncDatabase.client = client
+        AsyncDatabase.db = client.get_database()
+        AsyncDatabase.pid = os.getpid()
+        AsyncDatabase.loop = asyncio.get_running_loop()
+        AsyncDatabase._collections = {}
+    
+    @staticmethod
+    def get_db():
+        # A motor client belongs to the event loop it was created on, and like MongoClient to one process
+        if AsyncDatabase.db is None or AsyncDatabase.pid != os.getpid() or AsyncDatabase.loop is not asyncio.get_running_loop():
+            AsyncDatabase.initialize()
+        return AsyncDatabase.db
+    
+    @staticmethod
+    def collection(name, acknowledged=False):
+        """A motor collection with the same read preference and write concern as Database.collection"""
+        db = AsyncDatabase.get_db()
+        collection = AsyncDatabase._collections.get((name, acknowledged))
+        if collection is None:
+            collection = db.get_collection(
+                name,
+                read_preference=Database.read_preference(Config.MONGO_READ_PREFERENCES.get(name)),
+                write_concern=Database.write_concern(Config.MONGO_WRITE_CONCERNS.get(name))
+            )
+            if acknowledged and not collection.write_concern.acknowledged:
+                collection = collection.with_options(write_concern=WriteConcern(w=1))
+            AsyncDatabase._collections[(name, acknowledged)] = collection
+        return collection
+    
+    @staticmethod
+    def close():
+        if AsyncDatabase.client:
+            AsyncDatabase.client.close()
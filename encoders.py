@@ -0,0 +1,93 @@
+import abc
+import json
+import numpy as np
+
+
+class FeatureEncoder(abc.ABC):
+    """Encode request data straight into float64 rows in model column order"""
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+        self.width = len(self.columns)
+        self.index = {col: i for i, col in enumerate(self.columns)}
+
+    @classmethod
+    def from_file(cls, path):
+        """Build an encoder from a JSON column list"""
+        with open(path, 'r') as f:
+            return cls(json.load(f))
+
+    def bind(self, estimator, label):
+        """Check a fitted estimator expects these columns in order, then let it take plain float rows"""
+        names = getattr(estimator, 'feature_names_in_', None)
+        if names is None:
+            return estimator
+        if list(names) != self.columns:
+            raise ValueError(f"{label} was fitted on columns {list(names)}, not {self.columns}")
+        # Fitted on a DataFrame: sklearn would warn on every array call once the columns are known to match
+        del estimator.feature_names_in_
+        return estimator
+
+    def matrix(self, rows):
+        """Allocate a zeroed feature matrix for a batch"""
+        return np.zeros((rows, self.width), dtype=np.float64)
+
+    def encode(self, data):
+        """Encode one record into a new (1, width) row the caller owns"""
+        row = self.matrix(1)
+        self.encode_into(row[0], data)
+        return row
+
+    @abc.abstractmethod
+    def encode_into(self, out, data):
+        """Write one record into a preallocated row, raising ValueError on bad input"""
+
+
+class HouseFeatureEncoder(FeatureEncoder):
+    """Encoder for the house price model (numeric fields plus location one-hot)"""
+
+    REQUIRED_FIELDS = ('SquareFootage', 'Bedrooms', 'Location')
+
+    def __init__(self, columns):
+        super().__init__(columns)
+        self.square_footage_index = self.index['SquareFootage']
+        self.bedrooms_index = self.index['Bedrooms']
+        self.location_index = {
+            col[len('Location_'):]: i
+            for col, i in self.index.items()
+            if col.startswith('Location_')
+        }
+
+    def encode_into(self, out, data):
+        if not isinstance(data, dict) or any(field not in data for field in self.REQUIRED_FIELDS):
+            raise ValueError('Missing required fields')
+
+        out.fill(0)
+        out[self.square_footage_index] = float(data['SquareFootage'])
+        out[self.bedrooms_index] = int(data['Bedrooms'])
+
+        # Unknown locations leave every one-hot column at zero
+        location_index = self.location_index.get(data['Location'])
+        if location_index is not None:
+            out[location_index] = 1
+        return out
+
+
+class DiabetesFeatureEncoder(FeatureEncoder):
+    """Encoder for the diabetes model (objects or arrays in column order)"""
+
+    def encode_into(self, out, data):
+        if isinstance(data, list):
+            if len(data) != self.width:
+                raise ValueError(f'Expected {self.width} values')
+            for i, value in enumerate(data):
+                out[i] = float(value)
+            return out
+
+        if not isinstance(data, dict):
+            raise ValueError('Invalid row')
+        for i, col in enumerate(self.columns):
+            if col not in data:
+                raise ValueError(f'Missing field: {col}')
+            out[i] = float(data[col])
+        return out
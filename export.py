@@ -0,0 +1,57 @@
+import io
+import csv
+import json
+import zlib
+
+# Rows are buffered into chunks of roughly this many bytes before being sent
+CHUNK_SIZE = 64 * 1024
+
+CSV_COLUMNS = ['id', 'prediction_type', 'created_at', 'predicted_value', 'input_data', 'metadata']
+
+
+def ndjson_chunks(rows):
+    """Serialize rows as newline-delimited JSON"""
+    buffer = []
+    size = 0
+    for row in rows:
+        line = json.dumps(row, separators=(',', ':')) + '\n'
+        buffer.append(line)
+        size += len(line)
+        if size >= CHUNK_SIZE:
+            yield ''.join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield ''.join(buffer)
+
+
+def csv_chunks(rows):
+    """Serialize rows as CSV; nested input_data and metadata are JSON-encoded cells"""
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(CSV_COLUMNS)
+    for row in rows:
+        writer.writerow([
+            row['id'],
+            row['prediction_type'],
+            row['created_at'],
+            row['predicted_value'],
+            json.dumps(row['input_data'], separators=(',', ':')),
+            json.dumps(row['metadata'], separators=(',', ':'))
+        ])
+        if output.tell() >= CHUNK_SIZE:
+            yield output.getvalue()
+            output.seek(0)
+            output.truncate()
+    if output.tell():
+        yield output.getvalue()
+
+
+def gzip_chunks(chunks):
+    """Compress a stream of text chunks into a gzip stream"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode())
+        if data:
+            yield data
+    yield compressor.flush()
@@ -0,0 +1,233 @@
+import numpy as np
+
+# (row, tree) pairs evaluated together; keeps the working arrays cache-sized for large batches
+CHUNK_LANES = 1 << 16
+
+# Finished (row, tree) pairs are dropped every this many levels
+COMPACT_EVERY = 4
+
+
+class CompiledForest:
+    """A fitted sklearn random forest flattened into node arrays and evaluated with NumPy.
+
+    All trees share one set of arrays indexed by global node id; every (row, tree) pair is
+    stepped down one level at a time until it reaches a leaf. Leaves point to themselves so
+    pairs that finish early can keep stepping until the next compaction.
+
+    NumPy traversal beats sklearn's per-call overhead on the small batches the API serves but
+    not its compiled loop on large ones, so batches over fallback_rows go to the original
+    estimator when one is kept.
+    """
+
+    def __init__(self, feature, threshold, children, missing_left, value, roots, n_features,
+                 classes=None, fallback=None, fallback_rows=None):
+        self.feature = feature
+        self.threshold = threshold
+        self.children = children
+        self.missing_left = missing_left
+        self.value = value
+        self.roots = roots
+        self.is_leaf = children[0::2] == np.arange(len(feature))
+        self.n_features_in_ = n_features
+        self.classes_ = classes
+        self.n_classes_ = len(classes) if classes is not None else None
+        self.fallback = fallback
+        self.fallback_rows = fallback_rows
+
+    @classmethod
+    def from_sklearn(cls, model, fallback_rows=None, n_estimators=None, max_depth=None):
+        """Compile a fitted RandomForestRegressor/Classifier (or another forest of decision trees).
+
+        With fallback_rows set, the model is kept and used for batches larger than that.
+        n_estimators keeps only the first trees and max_depth cuts every tree at that depth
+        (the nodes there become leaves predicting their training average).
+        """
+        estimators = getattr(model, 'estimators_', None)
+        if not estimators or not all(hasattr(tree, 'tree_') for tree in estimators):
+            raise TypeError(f"{type(model).__name__} is not a fitted forest of decision trees")
+        if getattr(model, 'n_outputs_', 1) != 1:
+            raise ValueError("Only single-output forests can be compiled")
+        pruned = n_estimators is not None or max_depth is not None
+        if pruned and fallback_rows is not None:
+            raise ValueError("A pruned forest cannot fall back to the full model")
+
+        classes = getattr(model, 'classes_', None)
+        features, thresholds, children, missing, values, roots = [], [], [], [], [], []
+        offset = 0
+        for estimator in estimators[:n_estimators]:
+            tree = estimator.tree_
+            kept, children_left, children_right = cls._truncate(tree, max_depth)
+            nodes = np.arange(len(kept), dtype=np.intp)
+            is_leaf = children_left == -1
+
+            features.append(np.where(is_leaf, 0, tree.feature[kept]))
+            thresholds.append(np.where(is_leaf, np.inf, tree.threshold[kept]))
+            children.append(np.stack([
+                np.where(is_leaf, nodes, children_left),
+                np.where(is_leaf, nodes, children_right)
+            ], axis=1).ravel() + offset)
+            missing_go_to_left = getattr(tree, 'missing_go_to_left', None)
+            missing.append(
+                np.zeros(len(kept), dtype=bool) if missing_go_to_left is None
+                else np.asarray(missing_go_to_left, dtype=bool)[kept] & ~is_leaf
+            )
+
+            if classes is None:
+                values.append(tree.value[kept, 0, 0])
+            else:
+                # Same normalization as DecisionTreeClassifier.predict_proba
+                proba = tree.value[kept, 0, :len(classes)].astype(np.float64)
+                normalizer = proba.sum(axis=1, keepdims=True)
+                normalizer[normalizer == 0.0] = 1.0
+                values.append(proba / normalizer)
+
+            roots.append(offset)
+            offset += len(kept)
+
+        return cls(
+            feature=np.concatenate(features).astype(np.intp),
+            threshold=float32_thresholds(np.concatenate(thresholds)),
+            children=np.concatenate(children).astype(np.intp),
+            missing_left=np.concatenate(missing),
+            value=np.concatenate(values),
+            roots=np.asarray(roots, dtype=np.intp),
+            n_features=estimators[0].tree_.n_features,
+            classes=None if classes is None else np.asarray(classes),
+            fallback=model if fallback_rows is not None else None,
+            fallback_rows=fallback_rows
+        )
+
+    @staticmethod
+    def _truncate(tree, max_depth):
+        """Nodes kept when a tree is cut at max_depth, with their renumbered children (-1 for leaves)"""
+        children_left, children_right = tree.children_left, tree.children_right
+        if max_depth is None or tree.max_depth <= max_depth:
+            return np.arange(tree.node_count, dtype=np.intp), children_left, children_right
+
+        depth = np.zeros(tree.node_count, dtype=np.intp)
+        frontier = np.zeros(1, dtype=np.intp)
+        level = 0
+        while len(frontier):
+            depth[frontier] = level
+            frontier = frontier[children_left[frontier] != -1]
+            frontier = np.concatenate([children_left[frontier], children_right[frontier]])
+            level += 1
+
+        kept = np.flatnonzero(depth <= max_depth)
+        new_ids = np.full(tree.node_count, -1, dtype=np.intp)
+        new_ids[kept] = np.arange(len(kept))
+        cut = (children_left[kept] == -1) | (depth[kept] == max_depth)
+        return (
+            kept,
+            np.where(cut, -1, new_ids[children_left[kept]]),
+            np.where(cut, -1, new_ids[children_right[kept]])
+        )
+
+    def downcast(self):
+        """Copy with float32 leaf values and int32 node indices, about half the memory.
+
+        Thresholds are float32 already; leaf values lose precision past about 7 significant
+        digits. The copy keeps no sklearn fallback.
+        """
+        if 2 * self.node_count >= np.iinfo(np.int32).max:
+            raise ValueError("Too many nodes for int32 indices")
+        return CompiledForest(
+            feature=self.feature.astype(np.int32),
+            threshold=self.threshold,
+            children=self.children.astype(np.int32),
+            missing_left=self.missing_left,
+            value=self.value.astype(np.float32),
+            roots=self.roots.astype(np.int32),
+            n_features=self.n_features_in_,
+            classes=self.classes_
+        )
+
+    @property
+    def n_estimators(self):
+        return len(self.roots)
+
+    @property
+    def node_count(self):
+        return len(self.feature)
+
+    def leaves(self, X):
+        """Global leaf index reached in every tree, shape (rows, trees)"""
+        # sklearn trees evaluate float32 inputs
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"Expected rows with {self.n_features_in_} features")
+
+        n_trees = len(self.roots)
+        has_missing = bool(np.isnan(X).any())
+        flat = X.ravel()
+
+        # One lane per (row, tree); finished lanes are dropped every few levels so deep
+        # trees only cost work for the rows that actually go that deep
+        nodes = np.tile(self.roots, len(X))
+        lanes = np.arange(len(nodes), dtype=np.intp)
+        row_offsets = lanes // n_trees * self.n_features_in_
+        leaves = np.empty(len(nodes), dtype=np.intp)
+        level = 0
+        while len(nodes):
+            x = flat[row_offsets + self.feature[nodes]]
+            if has_missing:
+                go_right = ~((x <= self.threshold[nodes]) | (np.isnan(x) & self.missing_left[nodes]))
+            else:
+                go_right = x > self.threshold[nodes]
+            nodes = self.children[2 * nodes + go_right]
+
+            level += 1
+            if level % COMPACT_EVERY == 0:
+                done = self.is_leaf[nodes]
+                if done.any():
+                    leaves[lanes[done]] = nodes[done]
+                    active = ~done
+                    nodes, lanes, row_offsets = nodes[active], lanes[active], row_offsets[active]
+        return leaves.reshape(len(X), n_trees)
+
+    def _average(self, X):
+        rows = max(1, CHUNK_LANES // len(self.roots))
+        # Summed in float64 whatever the stored precision
+        if len(X) <= rows:
+            return self.value[self.leaves(X)].sum(axis=1, dtype=np.float64) / self.n_estimators
+        return np.concatenate([
+            self.value[self.leaves(X[start:start + rows])].sum(axis=1, dtype=np.float64) / self.n_estimators
+            for start in range(0, len(X), rows)
+        ])
+
+    def _use_fallback(self, X):
+        return self.fallback is not None and len(X) > self.fallback_rows
+
+    def predict_proba(self, X):
+        if self.classes_ is None:
+            raise AttributeError("predict_proba is only available for classifiers")
+        X = np.asarray(X)
+        if self._use_fallback(X):
+            return self.fallback.predict_proba(X)
+        return self._average(X)
+
+    def predict(self, X):
+        X = np.asarray(X)
+        if self._use_fallback(X):
+            return self.fallback.predict(X)
+        if self.classes_ is None:
+            return self._average(X)
+        return self.classes_.take(np.argmax(self._average(X), axis=1))
+
+    def nbytes(self):
+        """Memory held by the flattened node arrays"""
+        return sum(array.nbytes for array in (
+            self.feature, self.threshold, self.children, self.missing_left, self.value, self.roots
+        ))
+
+
+def float32_thresholds(thresholds):
+    """Largest float32 <= each float64 threshold.
+
+    For float32 inputs, x <= t holds exactly when x <= this value, so splits can be compared
+    in float32 without changing a single decision.
+    """
+    rounded = thresholds.astype(np.float32)
+    over = rounded.astype(np.float64) > thresholds
+    rounded[over] = np.nextafter(rounded[over], np.float32(-np.inf))
+    return rounded
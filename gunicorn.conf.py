@@ -0,0 +1,42 @@
+import os
+import gc
+import sys
+
+# Load the app and its models once in the master; forked workers then share the
+# model memory copy-on-write instead of each holding its own copy
+preload_app = os.getenv('GUNICORN_PRELOAD', 'true').lower() == 'true'
+
+
+def when_ready(server):
+    # Models load lazily on import, so load them here before forking to keep the sharing.
+    # The password hashing pool is not started here: each worker forks its own pool
+    # processes in post_worker_init (warm_up), before it connects to MongoDB or serves requests
+    app_module = sys.modules.get('app')
+    if server.cfg.preload_app and app_module is not None and hasattr(app_module, 'warm_up'):
+        app_module.warm_up(database=False, hashing=False)
+
+
+def pre_fork(server, worker):
+    # Keep the garbage collector in workers from touching (and so copying) objects loaded before the fork
+    gc.freeze()
+
+
+def post_worker_init(worker):
+    """Fork the password hashing pool, connect to MongoDB, load any models not yet loaded and report memory and load times"""
+    from process_stats import memory_usage, format_memory
+
+    app_module = sys.modules.get('app')
+    if app_module is not None and hasattr(app_module, 'warm_up'):
+        app_module.warm_up()
+
+    models = ''
+    if app_module is not None and hasattr(app_module, 'model_registry'):
+        loaded = [
+            f"{name} {status['current']['load_seconds']:.2f}s"
+            for name, status in app_module.model_registry.status().items()
+            if status['current']
+        ]
+        models = f" (model load: {', '.join(loaded)})"
+
+    mode = 'preloaded' if worker.cfg.preload_app else 'loaded in worker'
+    print(f"✓ Worker {os.getpid()} ready, {mode}: {format_memory(memory_usage())}{models}")
@@ -0,0 +1,173 @@
+import numpy as np
+from forest_engine import float32_thresholds
+
+
+class HouseLookupIndex:
+    """Exact lookup table replacing the house price forest for the rows it covers.
+
+    The model only sees SquareFootage, Bedrooms and the Location one-hot columns, so for a
+    fixed (location, bedrooms) pair its output is a step function of SquareFootage that only
+    changes at the forest's SquareFootage split thresholds. Every pair gets a sorted table of
+    those change points and the price on each interval; a lookup is a binary search.
+
+    Bedroom counts with the same position among the forest's Bedrooms thresholds share a
+    table. Rows the tables do not cover (bedrooms outside [0, max_bedrooms], non-integer
+    bedrooms, unexpected one-hot values, non-finite square footage) go to the fallback model.
+    """
+
+    def __init__(self, square_footage_index, bedrooms_index, location_indices, max_bedrooms,
+                 table_ids, bounds, values, n_features, fallback=None):
+        self.square_footage_index = square_footage_index
+        self.bedrooms_index = bedrooms_index
+        self.location_indices = location_indices
+        self.max_bedrooms = max_bedrooms
+        self.table_ids = table_ids  # (location state, bedrooms) -> table; the last state is "no location"
+        self.bounds = bounds        # per table: float32 SquareFootage change points, ascending
+        self.values = values        # per table: price on each of the len(bounds) + 1 intervals
+        self.n_features_in_ = n_features
+        self.fallback = fallback
+
+    @classmethod
+    def from_forest(cls, model, encoder, max_bedrooms=20, fallback=None):
+        """Build the tables from a fitted RandomForestRegressor and the house feature encoder.
+
+        fallback (default: the model) predicts the rows outside the tables.
+        """
+        estimators = getattr(model, 'estimators_', None)
+        if not estimators or not all(hasattr(tree, 'tree_') for tree in estimators):
+            raise TypeError(f"{type(model).__name__} is not a fitted forest of decision trees")
+        if getattr(model, 'n_outputs_', 1) != 1 or getattr(model, 'classes_', None) is not None:
+            raise ValueError("Only single-output regression forests can be indexed")
+
+        square_footage_index = encoder.square_footage_index
+        bedrooms_index = encoder.bedrooms_index
+        location_indices = list(encoder.location_index.values())
+        if encoder.width != 2 + len(location_indices):
+            raise ValueError("The model uses features other than SquareFootage, Bedrooms and Location")
+
+        # Interval i of the SquareFootage axis is (thresholds[i - 1], thresholds[i]]; splits are
+        # compared in float32 like sklearn does (see float32_thresholds)
+        trees = [estimator.tree_ for estimator in estimators]
+        thresholds = np.unique(float32_thresholds(np.concatenate([
+            tree.threshold[tree.feature == square_footage_index] for tree in trees
+        ])))
+
+        # Bedroom counts with the same number of Bedrooms thresholds below them behave the same
+        bedroom_thresholds = np.unique(float32_thresholds(np.concatenate([
+            tree.threshold[tree.feature == bedrooms_index] for tree in trees
+        ])))
+        bedrooms = np.arange(max_bedrooms + 1)
+        buckets = np.searchsorted(bedroom_thresholds, bedrooms.astype(np.float32), side='left')
+
+        walks = [cls._tree_arrays(tree, square_footage_index, thresholds) for tree in trees]
+        table_ids = np.empty((len(location_indices) + 1, len(bedrooms)), dtype=np.intp)
+        bounds, values = [], []
+        for state in range(len(location_indices) + 1):
+            first_in_bucket = {}
+            for count, bucket in zip(bedrooms.tolist(), buckets.tolist()):
+                if bucket not in first_in_bucket:
+                    fixed = {bedrooms_index: float(np.float32(count))}
+                    for i, column in enumerate(location_indices):
+                        fixed[column] = 1.0 if i == state else 0.0
+
+                    # Summed in estimator order and divided like RandomForestRegressor.predict
+                    total = np.zeros(len(thresholds) + 1)
+                    for walk in walks:
+                        total += cls._step_values(walk, fixed, square_footage_index, len(thresholds))
+                    total /= len(trees)
+
+                    # Keep only the thresholds where the price actually changes
+                    changes = total[1:] != total[:-1]
+                    bounds.append(thresholds[changes])
+                    values.append(np.concatenate([total[:1], total[1:][changes]]))
+                    first_in_bucket[bucket] = len(bounds) - 1
+                table_ids[state, count] = first_in_bucket[bucket]
+
+        return cls(
+            square_footage_index=square_footage_index,
+            bedrooms_index=bedrooms_index,
+            location_indices=location_indices,
+            max_bedrooms=max_bedrooms,
+            table_ids=table_ids,
+            bounds=bounds,
+            values=values,
+            n_features=encoder.width,
+            fallback=fallback if fallback is not None else model
+        )
+
+    @staticmethod
+    def _tree_arrays(tree, square_footage_index, thresholds):
+        """Node arrays as lists (fast to index from Python), with each SquareFootage split's interval"""
+        split_interval = np.searchsorted(thresholds, float32_thresholds(tree.threshold), side='left')
+        return (
+            tree.children_left.tolist(), tree.children_right.tolist(), tree.feature.tolist(),
+            tree.threshold.tolist(), split_interval.tolist(), tree.value[:, 0, 0].tolist()
+        )
+
+    @staticmethod
+    def _step_values(walk, fixed, square_footage_index, n_thresholds):
+        """One tree's output on every SquareFootage interval for fixed values of the other features"""
+        children_left, children_right, feature, threshold, split_interval, value = walk
+        out = np.empty(n_thresholds + 1)
+        stack = [(0, 0, n_thresholds)]
+        while stack:
+            node, low, high = stack.pop()
+            left = children_left[node]
+            if left == -1:
+                out[low:high + 1] = value[node]
+            elif feature[node] == square_footage_index:
+                # x <= threshold for exactly the intervals up to split_interval
+                split = split_interval[node]
+                if low <= split:
+                    stack.append((left, low, min(high, split)))
+                if high > split:
+                    stack.append((children_right[node], max(low, split + 1), high))
+            else:
+                stack.append((left if fixed[feature[node]] <= threshold[node] else children_right[node], low, high))
+        return out
+
+    @property
+    def table_count(self):
+        return len(self.bounds)
+
+    @property
+    def interval_count(self):
+        return sum(len(values) for values in self.values)
+
+    def nbytes(self):
+        """Memory held by the tables"""
+        return self.table_ids.nbytes + sum(b.nbytes for b in self.bounds) + sum(v.nbytes for v in self.values)
+
+    def lookup(self, X):
+        """Prices for the rows the tables cover; returns (prices, covered mask)"""
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"Expected rows with {self.n_features_in_} features")
+
+        square_footage = X[:, self.square_footage_index].astype(np.float32)
+        bedrooms = X[:, self.bedrooms_index]
+        locations = X[:, self.location_indices]
+        location_count = locations.sum(axis=1)
+
+        covered = (
+            np.isfinite(square_footage)
+            & (bedrooms >= 0) & (bedrooms <= self.max_bedrooms) & (bedrooms == np.floor(bedrooms))
+            & ((locations == 0) | (locations == 1)).all(axis=1) & (location_count <= 1)
+        )
+        states = np.where(location_count == 0, len(self.location_indices), locations.argmax(axis=1))
+        table_ids = np.full(len(X), -1, dtype=np.intp)
+        table_ids[covered] = self.table_ids[states[covered], bedrooms[covered].astype(np.intp)]
+
+        prices = np.empty(len(X))
+        for table_id in np.unique(table_ids[covered]).tolist():
+            rows = table_ids == table_id
+            intervals = np.searchsorted(self.bounds[table_id], square_footage[rows], side='left')
+            prices[rows] = self.values[table_id][intervals]
+        return prices, covered
+
+    def predict(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        prices, covered = self.lookup(X)
+        if not covered.all():
+            prices[~covered] = self.fallback.predict(X[~covered])
+        return prices
@@ -0,0 +1,175 @@
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import wraps
+from flask import current_app, request, make_response, render_template
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = {
+    'text/html', 'text/css', 'text/plain', 'text/csv', 'text/javascript',
+    'application/json', 'application/javascript', 'application/x-ndjson', 'image/svg+xml'
+}
+
+
+def strong_etag(data):
+    """Strong entity tag (unquoted) for a response body"""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def matching_etag(if_none_match, etag):
+    """The tag in If-None-Match (a werkzeug ETags) naming this body in any encoding, or None"""
+    if not if_none_match:
+        return None
+    if if_none_match.star_tag:
+        return etag
+    for tag in (etag, f"{etag}-br", f"{etag}-gzip"):
+        if if_none_match.contains_weak(tag):
+            return tag
+    return None
+
+
+def conditional(response, etag):
+    """Tag a response and turn it into a 304 when the client already has this body"""
+    # A compressed copy is tagged etag-<encoding>; echo back whichever one the client holds
+    response.set_etag(matching_etag(request.if_none_match, etag) or etag)
+    response.vary.add('Accept-Encoding')
+    return response.make_conditional(request)
+
+
+def etagged(view):
+    """Give a view's 200 responses a strong ETag and answer 304 when the client has that body"""
+    @wraps(view)
+    def decorated(*args, **kwargs):
+        response = make_response(view(*args, **kwargs))
+        if response.status_code != 200 or response.is_streamed:
+            return response
+        # Per-user content: browsers may keep it but must revalidate, shared caches may not
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        return conditional(response, strong_etag(response.get_data()))
+    return decorated
+
+
+class StaticPages:
+    """Templates without per-request content, rendered once per process and served as cached bytes"""
+
+    def __init__(self):
+        self._pages = {}
+
+    def page(self, template):
+        """(body, etag) of a rendered template"""
+        cached = self._pages.get(template)
+        if cached is None:
+            body = render_template(template).encode()
+            cached = (body, strong_etag(body))
+            # Re-rendered on every request while templates auto-reload (debug mode)
+            if not current_app.jinja_env.auto_reload:
+                self._pages[template] = cached
+        return cached
+
+    def response(self, template):
+        body, etag = self.page(template)
+        response = current_app.response_class(body, mimetype='text/html')
+        response.cache_control.public = True
+        response.cache_control.no_cache = True
+        return conditional(response, etag)
+
+    def warm(self, *templates):
+        for template in templates:
+            self.page(template)
+
+
+class ResponseCompressor:
+    """Negotiated brotli/gzip compression of text responses above a size threshold.
+
+    Compressed copies of bodies with a strong ETag are kept in a small LRU cache, so pages
+    that are the same on every request (and repeated API bodies) are compressed once.
+    brotli is used when the package is installed and the client accepts it.
+    """
+
+    def __init__(self, min_size=1024, gzip_level=6, brotli_quality=4, cache_size=64):
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.cache_size = cache_size
+        self.encodings = ('br', 'gzip') if brotli is not None else ('gzip',)
+        self.compressed = 0
+        self.cache_hits = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def encoding_for(self, accept_encodings):
+        """Best encoding the client accepts (a werkzeug Accept), preferring brotli on a tie"""
+        best = max(self.encodings, key=lambda encoding: accept_encodings[encoding])
+        return best if accept_encodings[best] > 0 else None
+
+    def compress(self, data, encoding, etag=None):
+        """Compressed body, reused from the cache when the same ETag was compressed before"""
+        key = (etag, encoding)
+        if etag is not None:
+            with self._lock:
+                cached = self._cache.get(key)
+                if cached is not None:
+                    self._cache.move_to_end(key)
+                    self.cache_hits += 1
+                    return cached
+
+        if encoding == 'br':
+            compressed = brotli.compress(data, quality=self.brotli_quality)
+        else:
+            compressed = gzip.compress(data, self.gzip_level, mtime=0)
+
+        with self._lock:
+            self.compressed += 1
+            self.bytes_in += len(data)
+            self.bytes_out += len(compressed)
+            if etag is not None and self.cache_size:
+                self._cache[key] = compressed
+                if len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return compressed
+
+    def compressible(self, mimetype, size):
+        return mimetype in COMPRESSIBLE_TYPES and size >= self.min_size
+
+    def apply(self, response, accept_encodings):
+        """Compress a Flask response in place when worthwhile and accepted"""
+        if (response.status_code < 200 or response.status_code >= 300 or response.status_code in (204, 206)
+                or response.direct_passthrough or response.is_streamed
+                or 'Content-Encoding' in response.headers
+                or 'no-transform' in response.headers.get('Cache-Control', '')):
+            return response
+
+        data = response.get_data()
+        if not self.compressible(response.mimetype, len(data)):
+            return response
+
+        response.vary.add('Accept-Encoding')
+        encoding = self.encoding_for(accept_encodings)
+        if encoding is None:
+            return response
+
+        etag, weak = response.get_etag()
+        response.set_data(self.compress(data, encoding, etag if etag and not weak else None))
+        response.headers['Content-Encoding'] = encoding
+        if etag:
+            # Each encoding is a different representation, so it gets its own strong tag
+            response.set_etag(f"{etag}-{encoding}", weak)
+        return response
+
+    def stats(self):
+        return {
+            'encodings': list(self.encodings),
+            'compressed': self.compressed,
+            'cache_hits': self.cache_hits,
+            'cache_entries': len(self._cache),
+            'bytes_in': self.bytes_in,
+            'bytes_out': self.bytes_out
+        }
@@ -0,0 +1,59 @@
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+COMPACT_SEPARATORS = (',', ':')
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Flask JSON provider encoding and decoding with orjson (several times faster on large payloads).
+
+    Output matches the default provider's compact output (sorted keys, dates as HTTP dates)
+    except that non-ASCII characters are written as UTF-8 instead of \\u escapes and NaN is
+    written as null. Calls orjson cannot serve (indent, unusual separators, integers over
+    64 bits) fall back to the standard library.
+    """
+
+    def __init__(self, app):
+        if orjson is None:
+            raise ImportError("orjson is not installed (pip install orjson)")
+        super().__init__(app)
+        self.options = (
+            orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_PASSTHROUGH_DATETIME
+            | (orjson.OPT_SORT_KEYS if self.sort_keys else 0)
+        )
+
+    def _dumps_bytes(self, obj):
+        try:
+            return orjson.dumps(obj, default=self.default, option=self.options)
+        except TypeError:
+            return None
+
+    def dumps(self, obj, **kwargs):
+        if not kwargs.keys() <= {'separators'} or kwargs.get('separators', COMPACT_SEPARATORS) != COMPACT_SEPARATORS:
+            return super().dumps(obj, **kwargs)
+        data = self._dumps_bytes(obj)
+        if data is None:
+            return super().dumps(obj, **kwargs)
+        return data.decode()
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        try:
+            return orjson.loads(s)
+        except ValueError:
+            # Raises the standard library's error for input that is really invalid
+            return super().loads(s)
+
+    def response(self, *args, **kwargs):
+        # Compact bodies go out as orjson's bytes without a round trip through str
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            return super().response(*args, **kwargs)
+        data = self._dumps_bytes(self._prepare_response_obj(args, kwargs))
+        if data is None:
+            return super().response(*args, **kwargs)
+        return self._app.response_class(data + b'\n', mimetype=self.mimetype)
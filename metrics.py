@@ -0,0 +1,237 @@
+import time
+import threading
+from bisect import bisect_left
+from functools import wraps
+from pymongo import monitoring
+
+# Latency buckets in seconds (upper bounds; +Inf is implied)
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=''):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Counter:
+    """Monotonic count per label set"""
+
+    type_name = 'counter'
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for labels, value in sorted(values.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {value}"
+
+
+class Histogram:
+    """Bucketed observations (e.g. latencies) per label set"""
+
+    type_name = 'histogram'
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # [per-bucket counts (last is +Inf), sum]
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def time(self, *labels):
+        """Context manager observing the duration of its block"""
+        return _Timer(self, labels)
+
+    def samples(self):
+        with self._lock:
+            series = {labels: (list(counts), total) for labels, (counts, total) in self._series.items()}
+        for labels, (counts, total) in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float('inf') else f'le="{bound}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, labels)} {total}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}"
+
+
+class _Timer:
+    __slots__ = ('histogram', 'labels', 'start')
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, *self.labels)
+        return False
+
+
+class MetricsRegistry:
+    """Metrics of this process, rendered in the Prometheus text format"""
+
+    def __init__(self):
+        self.enabled = True
+        self._metrics = []
+        self._collectors = []
+
+    def add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector):
+        """Register a callable returning [(name, type, help, value)] gauges read at scrape time"""
+        self._collectors.append(collector)
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.type_name}")
+            lines.extend(metric.samples())
+        for collector in self._collectors:
+            try:
+                gauges = collector()
+            except Exception:
+                continue
+            for name, type_name, help_text, value in gauges:
+                if value is None:
+                    continue
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {type_name}")
+                lines.append(f"{name} {value}")
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+HTTP_REQUESTS = registry.add(Counter(
+    'http_requests_total', 'HTTP requests by route, method and status', ('route', 'method', 'status')
+))
+HTTP_LATENCY = registry.add(Histogram(
+    'http_request_duration_seconds', 'HTTP request latency by route and method', ('route', 'method')
+))
+STAGE_LATENCY = registry.add(Histogram(
+    'request_stage_duration_seconds', 'Time spent in each stage of request handling', ('stage',)
+))
+MODEL_LATENCY = registry.add(Histogram(
+    'model_inference_duration_seconds', 'Model predict calls by model', ('model',)
+))
+MODEL_ROWS = registry.add(Counter(
+    'model_inference_rows_total', 'Rows passed through each model', ('model',)
+))
+MONGO_LATENCY = registry.add(Histogram(
+    'mongo_operation_duration_seconds', 'MongoDB commands by collection and command', ('collection', 'command')
+))
+MONGO_ERRORS = registry.add(Counter(
+    'mongo_operation_errors_total', 'Failed MongoDB commands by collection and command', ('collection', 'command')
+))
+
+PASSWORD_HASH_LATENCY = registry.add(Histogram(
+    'password_hash_duration_seconds', 'Password hashing and checks by operation, including time queued', ('operation',)
+))
+PASSWORD_HASH_COMPUTE = registry.add(Histogram(
+    'password_hash_compute_seconds', 'Time the hashing pool spent on each operation', ('operation',)
+))
+PASSWORD_HASH_REJECTED = registry.add(Counter(
+    'password_hash_rejected_total', 'Password operations refused because the hashing queue was full', ('operation',)
+))
+
+
+class _NoopTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP_TIMER = _NoopTimer()
+
+
+def stage(name):
+    """Time one stage of handling a request (no-op when metrics are disabled)"""
+    return STAGE_LATENCY.time(name) if registry.enabled else _NOOP_TIMER
+
+
+def timed_stage(name):
+    """Decorator timing every call of a function as a request stage"""
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            if not registry.enabled:
+                return f(*args, **kwargs)
+            with STAGE_LATENCY.time(name):
+                return f(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def timed_model(name, rows):
+    """Time one model predict call over a number of rows"""
+    if not registry.enabled:
+        return _NOOP_TIMER
+    MODEL_ROWS.inc(name, amount=rows)
+    return MODEL_LATENCY.time(name)
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """Record the duration of every MongoDB command the driver sends"""
+
+    # Commands that are driver housekeeping rather than app queries
+    IGNORED = {'hello', 'ismaster', 'isMaster', 'ping', 'saslStart', 'saslContinue', 'endSessions'}
+
+    def __init__(self):
+        self._collections = {}
+
+    def started(self, event):
+        if event.command_name not in self.IGNORED:
+            # Most commands name their collection as the command's value; getMore has a 'collection' field
+            collection = event.command.get(event.command_name)
+            if not isinstance(collection, str):
+                collection = event.command.get('collection', '')
+            self._collections[event.request_id] = collection
+
+    def succeeded(self, event):
+        collection = self._collections.pop(event.request_id, None)
+        if collection is not None and registry.enabled:
+            MONGO_LATENCY.observe(event.duration_micros / 1e6, collection, event.command_name)
+
+    def failed(self, event):
+        collection = self._collections.pop(event.request_id, None)
+        if collection is not None and registry.enabled:
+            MONGO_LATENCY.observe(event.duration_micros / 1e6, collection, event.command_name)
+            MONGO_ERRORS.inc(collection, event.command_name)
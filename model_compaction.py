@@ -0,0 +1,116 @@
+import csv
+import time
+import pickle
+import itertools
+import numpy as np
+from forest_engine import CompiledForest
+
+# Rows timed for the batch latency column
+BATCH_ROWS = 1000
+
+
+def load_dataset(path, encoder, target, max_rows=None):
+    """Encoded feature rows and target values from a CSV of held-out records; returns (X, y, skipped)"""
+    with open(path, newline='') as f:
+        records = list(itertools.islice(csv.DictReader(f), max_rows))
+
+    X = encoder.matrix(len(records))
+    y = np.empty(len(records))
+    valid = np.ones(len(records), dtype=bool)
+    for i, record in enumerate(records):
+        try:
+            encoder.encode_into(X[i], record)
+            y[i] = float(record[target])
+        except (KeyError, TypeError, ValueError):
+            valid[i] = False
+    if not valid.any():
+        raise ValueError(f"No usable rows in {path} (is '{target}' the target column?)")
+    return X[valid], y[valid], int((~valid).sum())
+
+
+def default_tree_counts(n_estimators):
+    return sorted({max(1, round(n_estimators * share)) for share in (0.1, 0.25, 0.5, 0.75, 1.0)})
+
+
+def default_depths(max_depth):
+    """Cuts shallower than the deepest tree, then the uncut trees (None)"""
+    return [depth for depth in (6, 8, 10, 12, 16, 20) if depth < max_depth] + [None]
+
+
+class ForestCompactor:
+    """Smaller versions of a fitted sklearn forest, scored and timed on held-out data.
+
+    A candidate keeps the first n trees (the trees of a random forest are interchangeable),
+    cuts them at a maximum depth and is stored as a CompiledForest with float32 values and
+    int32 node indices. The score is R² for regressors and accuracy for classifiers.
+    """
+
+    def __init__(self, model, X, y, repeat=5):
+        if not isinstance(getattr(model, 'estimators_', None), list):
+            raise TypeError(f"{type(model).__name__} is not a fitted sklearn forest (already compacted?)")
+        self.model = model
+        self.X = X
+        self.y = y
+        self.repeat = repeat
+        self.classifier = getattr(model, 'classes_', None) is not None
+        self.max_depth = max(estimator.tree_.max_depth for estimator in model.estimators_)
+
+    def score(self, predictor):
+        predicted = predictor.predict(self.X)
+        if self.classifier:
+            return float(np.mean(predicted == self.y))
+        total = np.sum((self.y - self.y.mean()) ** 2)
+        return float(1 - np.sum((self.y - predicted) ** 2) / total) if total else 0.0
+
+    def _best_of(self, fn):
+        best = float('inf')
+        for _ in range(self.repeat):
+            start = time.perf_counter()
+            fn()
+            best = min(best, time.perf_counter() - start)
+        return best
+
+    def measure(self, predictor, n_estimators, max_depth):
+        """Score, pickled size and single-row / batch latency of a predictor"""
+        run = predictor.predict_proba if self.classifier else predictor.predict
+        row, batch = self.X[:1], self.X[:BATCH_ROWS]
+        run(row)
+        return {
+            'trees': n_estimators,
+            'max_depth': max_depth,
+            'score': self.score(predictor),
+            'size_bytes': len(pickle.dumps(predictor, protocol=pickle.HIGHEST_PROTOCOL)),
+            'row_ms': self._best_of(lambda: run(row)) * 1000,
+            'batch_ms': self._best_of(lambda: run(batch)) * 1000,
+            'batch_rows': len(batch)
+        }
+
+    def baseline(self):
+        return self.measure(self.model, len(self.model.estimators_), self.max_depth)
+
+    def candidate(self, n_estimators, max_depth):
+        """(compact forest, its measurements) for one tree count and depth (None keeps full depth)"""
+        forest = CompiledForest.from_sklearn(self.model, n_estimators=n_estimators, max_depth=max_depth).downcast()
+        return forest, self.measure(forest, n_estimators, max_depth)
+
+    def search(self, tree_counts=None, depths=None, max_loss=0.005):
+        """Measure every combination and pick the smallest within max_loss of the original's score.
+
+        Returns (baseline, candidates, chosen forest or None, chosen candidate or None).
+        """
+        tree_counts = tree_counts or default_tree_counts(len(self.model.estimators_))
+        depths = depths or default_depths(self.max_depth)
+        baseline = self.baseline()
+
+        candidates, chosen, chosen_forest = [], None, None
+        for n_estimators in tree_counts:
+            for max_depth in depths:
+                forest, result = self.candidate(min(n_estimators, len(self.model.estimators_)), max_depth)
+                result['loss'] = baseline['score'] - result['score']
+                result['accepted'] = result['loss'] <= max_loss
+                candidates.append(result)
+                if result['accepted'] and (
+                    chosen is None or (result['size_bytes'], result['row_ms']) < (chosen['size_bytes'], chosen['row_ms'])
+                ):
+                    chosen, chosen_forest = result, forest
+        return baseline, candidates, chosen_forest, chosen
@@ -0,0 +1,181 @@
+import os
+import time
+import threading
+from cache import file_fingerprint
+
+
+def replace_model_file(artifact, path):
+    """Write an artifact with joblib.dump (uncompressed) to a temporary file, then move it over path.
+
+    Workers that memory-map the old file (MODEL_MMAP_MODE) keep reading it until they reload;
+    rewriting the file in place would truncate it under them and crash them with SIGBUS.
+    """
+    import joblib
+    # Same directory, so os.replace is an atomic rename on the same filesystem
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        joblib.dump(artifact, temp_path)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+
+
+class LoadedModel:
+    """One loaded version of a model's artifacts"""
+
+    __slots__ = ('name', 'version', 'artifact', 'loaded_at', 'load_seconds')
+
+    def __init__(self, name, version, artifact, loaded_at, load_seconds):
+        self.name = name
+        self.version = version
+        self.artifact = artifact
+        self.loaded_at = loaded_at
+        self.load_seconds = load_seconds
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'version': self.version,
+            'loaded_at': self.loaded_at,
+            'load_seconds': self.load_seconds
+        }
+
+
+class ModelSpec:
+    """How to load, warm and fingerprint one named model"""
+
+    def __init__(self, name, label, loader, paths, warmup=None):
+        self.name = name
+        self.label = label
+        self.loader = loader
+        self.paths = paths
+        self.warmup = warmup
+        self.reload_lock = threading.Lock()
+
+
+class ModelRegistry:
+    """Named models with versioned artifacts, hot reload and atomic swaps.
+
+    Only the current version's artifact is kept; the last keep_versions versions are
+    remembered as metadata, so a replaced model is freed once its in-flight requests finish.
+    """
+
+    def __init__(self, keep_versions=2, watch_interval=0, on_swap=None):
+        self.keep_versions = keep_versions
+        self.watch_interval = watch_interval
+        self.on_swap = on_swap
+        self._specs = {}
+        self._current = {}
+        self._versions = {}
+        self._lock = threading.Lock()
+        self._watch_pid = None
+        self._load_failures = {}
+
+    # Seconds to wait before retrying a model that failed to load on first use
+    RETRY_INTERVAL = 30
+
+    def register(self, name, loader, paths, label=None, warmup=None, lazy=False):
+        """Register a model; it loads now, or on first use / warm() when lazy"""
+        self._specs[name] = ModelSpec(name, label or name, loader, list(paths), warmup)
+        self._versions[name] = {}
+        if not lazy:
+            self._load(name)
+
+    def _load(self, name):
+        try:
+            loaded = self.reload(name)
+            self._load_failures.pop(name, None)
+            print(f"✓ {self._specs[name].label} model loaded successfully (version {loaded.version})")
+            return loaded
+        except Exception as e:
+            self._load_failures[name] = time.monotonic()
+            print(f"✗ Error loading {self._specs[name].label.lower()} model: {e}")
+            return None
+
+    def get(self, name):
+        """Current version of a model, loading it on first use; None if it cannot be loaded"""
+        if self.watch_interval and self._watch_pid != os.getpid():
+            self._start_watcher()
+        loaded = self._current.get(name)
+        if loaded is None and name in self._specs:
+            failed_at = self._load_failures.get(name)
+            if failed_at is None or time.monotonic() - failed_at > self.RETRY_INTERVAL:
+                # reload() serializes loads per model, so concurrent first requests load it once
+                loaded = self._current.get(name) or self._load(name)
+        return loaded
+
+    def warm(self, names=None):
+        """Load any models that are not loaded yet (startup warm-up hook)"""
+        for name in names or list(self._specs):
+            if name not in self._current:
+                self._load(name)
+
+    def reload(self, name, force=False):
+        """Load, warm and swap in a model if its files changed (or always with force)"""
+        spec = self._specs[name]
+        with spec.reload_lock:
+            version = file_fingerprint(*spec.paths)
+            current = self._current.get(name)
+            if current is not None and current.version == version and not force:
+                return current
+
+            # Load and warm outside the registry lock; requests keep using the old version
+            start = time.perf_counter()
+            artifact = spec.loader()
+            if spec.warmup:
+                spec.warmup(artifact)
+            loaded = LoadedModel(name, version, artifact, time.time(), time.perf_counter() - start)
+
+            with self._lock:
+                self._current[name] = loaded
+                versions = self._versions[name]
+                versions[version] = loaded.to_dict()
+                while len(versions) > self.keep_versions:
+                    versions.pop(next(iter(versions)))
+
+        if current is not None and self.on_swap:
+            self.on_swap(name, loaded)
+        return loaded
+
+    def reload_in_background(self, name=None, force=False):
+        """Reload one model (or all of them) on a background thread"""
+        names = [name] if name else list(self._specs)
+        thread = threading.Thread(target=self._reload_all, args=(names, force), daemon=True)
+        thread.start()
+        return names
+
+    def _reload_all(self, names, force=False):
+        for name in names:
+            try:
+                current = self._current.get(name)
+                loaded = self.reload(name, force=force)
+                if loaded is not current:
+                    print(f"✓ {self._specs[name].label} model reloaded (version {loaded.version})")
+            except Exception as e:
+                print(f"✗ Error reloading {self._specs[name].label.lower()} model: {e}")
+
+    def _start_watcher(self):
+        # One watcher thread per process; threads do not survive a gunicorn fork
+        with self._lock:
+            if self._watch_pid == os.getpid():
+                return
+            self._watch_pid = os.getpid()
+        threading.Thread(target=self._watch, daemon=True).start()
+
+    def _watch(self):
+        while True:
+            time.sleep(self.watch_interval)
+            self._reload_all(list(self._specs))
+
+    def status(self):
+        """Current and retained versions of every model"""
+        return {
+            name: {
+                'current': self._current[name].to_dict() if name in self._current else None,
+                'versions': list(self._versions[name].values()),
+                'paths': self._specs[name].paths
+            }
+            for name in self._specs
+        }
@@ -1,8 +1,36 @@
-from database import Database
+from config import Config
+from database import Database, AsyncDatabase
+from write_behind import WriteBehindWriter
+from models.user_stats import UserStats
+from metrics import stage, timed_stage
 from datetime import datetime
 from bson import ObjectId
+import base64
+import json
 
 class Prediction:
+    __slots__ = ('user_id', 'prediction_type', 'input_data', 'predicted_value', 'metadata', 'created_at', '_id')
+    
+    # Fields the history views need (user_id is already known to the caller)
+    HISTORY_PROJECTION = {
+        'prediction_type': 1,
+        'input_data': 1,
+        'predicted_value': 1,
+        'metadata': 1,
+        'created_at': 1
+    }
+    
+    # Optional background writer; predictions return before Mongo acknowledges them
+    writer = WriteBehindWriter(
+        'predictions',
+        max_queue=Config.WRITE_BEHIND_MAX_QUEUE,
+        batch_size=Config.WRITE_BEHIND_BATCH_SIZE,
+        flush_interval=Config.WRITE_BEHIND_FLUSH_INTERVAL,
+        max_retries=Config.WRITE_BEHIND_MAX_RETRIES,
+        spill_path=Config.WRITE_BEHIND_SPILL_PATH,
+        on_written=UserStats.record
+    ) if Config.WRITE_BEHIND_ENABLED else None
+    
     def __init__(self, user_id, prediction_type, input_data, predicted_value, metadata=None, created_at=None, _id=None):
         self.user_id = user_id
         self.prediction_type = prediction_type  # 'house', 'diabetes', etc.
@@ -13,6 +41,7 @@ class Prediction:
         self._id = _id
     
     @staticmethod
+    @timed_stage('save_prediction')
     def create_prediction(user_id, prediction_type, input_data, predicted_value, metadata=None):
         """Create a new prediction record"""
         prediction = Prediction(
@@ -23,56 +52,174 @@ class Prediction:
             metadata=metadata or {}
         )
         
-        db = Database.get_db()
-        result = db.predictions.insert_one({
-            'user_id': user_id,
-            'prediction_type': prediction_type,
-            'input_data': input_data,
-            'predicted_value': predicted_value,
-            'metadata': prediction.metadata,
-            'created_at': prediction.created_at
-        })
+        doc = prediction.to_document()
+        
+        if Prediction.writer is not None:
+            doc['_id'] = ObjectId()
+            Prediction.writer.submit([doc])
+            prediction._id = doc['_id']
+            return prediction
+        
+        result = Database.collection('predictions').insert_one(doc)
         prediction._id = result.inserted_id
+        UserStats.record([doc])
         return prediction
     
     @staticmethod
-    def get_user_predictions(user_id, limit=None, skip=0):
-        """Get all predictions for a user"""
-        db = Database.get_db()
+    @timed_stage('save_prediction')
+    def create_predictions(records):
+        """Create many prediction records with a single insert_many"""
+        predictions = Prediction.from_records(records)
+        if not predictions:
+            return []
+        
+        docs = [prediction.to_document() for prediction in predictions]
+        
+        if Prediction.writer is not None:
+            for prediction, doc in zip(predictions, docs):
+                prediction._id = doc['_id'] = ObjectId()
+            Prediction.writer.submit(docs)
+            return predictions
+        
+        result = Database.collection('predictions').insert_many(docs)
+        for prediction, inserted_id in zip(predictions, result.inserted_ids):
+            prediction._id = inserted_id
+        UserStats.record(docs)
+        return predictions
+    
+    @staticmethod
+    async def create_predictions_async(records):
+        """create_predictions on the async driver"""
+        with stage('save_prediction'):
+            predictions = Prediction.from_records(records)
+            if not predictions:
+                return []
+            
+            docs = [prediction.to_document() for prediction in predictions]
+            
+            if Prediction.writer is not None:
+                for prediction, doc in zip(predictions, docs):
+                    prediction._id = doc['_id'] = ObjectId()
+                await Prediction.writer.submit_async(docs)
+                return predictions
+            
+            result = await AsyncDatabase.collection('predictions').insert_many(docs)
+            for prediction, inserted_id in zip(predictions, result.inserted_ids):
+                prediction._id = inserted_id
+            await UserStats.record_async(docs)
+            return predictions
+    
+    @staticmethod
+    def from_records(records):
+        """New (unsaved) predictions from create_predictions-style record dicts"""
+        return [
+            Prediction(
+                user_id=record['user_id'],
+                prediction_type=record['prediction_type'],
+                input_data=record['input_data'],
+                predicted_value=record['predicted_value'],
+                metadata=record.get('metadata') or {}
+            )
+            for record in records
+        ]
+    
+    def to_document(self):
+        """The document stored for a new prediction"""
+        return {
+            'user_id': self.user_id,
+            'prediction_type': self.prediction_type,
+            'input_data': self.input_data,
+            'predicted_value': self.predicted_value,
+            'metadata': self.metadata,
+            'created_at': self.created_at
+        }
+    
+    @staticmethod
+    def find_user_predictions(user_id, limit=None, skip=0, after=None, projection=None,
+                              prediction_type=None, created_from=None, created_to=None, collection=None):
+        """Open a cursor over a user's predictions, newest first, optionally after a page cursor.
+        
+        collection defaults to Database's; pass AsyncDatabase's for a motor cursor.
+        """
         query = {'user_id': user_id}
         
-        cursor = db.predictions.find(query).sort('created_at', -1)
+        if prediction_type:
+            query['prediction_type'] = prediction_type
+        if created_from or created_to:
+            query['created_at'] = {}
+            if created_from:
+                query['created_at']['$gte'] = created_from
+            if created_to:
+                query['created_at']['$lt'] = created_to
+        
+        # Keyset pagination: everything strictly older than the (created_at, _id) cursor
+        if after:
+            created_at, last_id = Prediction.decode_cursor(after)
+            query['$and'] = [{'$or': [
+                {'created_at': {'$lt': created_at}},
+                {'created_at': created_at, '_id': {'$lt': last_id}}
+            ]}]
+        
+        # Pass a copy: some drivers (e.g. mongomock) normalize the projection in place, and
+        # HISTORY_PROJECTION is shared by every request thread
+        projection = dict(projection) if projection else None
+        if collection is None:
+            collection = Database.collection('predictions')
+        cursor = collection.find(query, projection).sort([('created_at', -1), ('_id', -1)])
         
         if skip:
             cursor = cursor.skip(skip)
         if limit:
-            cursor = cursor.limit(limit)
-        
-        predictions = []
+            cursor = cursor.limit(limit).batch_size(min(limit, 1000))
+        return cursor
+    
+    @staticmethod
+    def iter_user_prediction_dicts(user_id, limit=None, skip=0, after=None, **filters):
+        """Yield history rows as to_dict-shaped dicts straight from projected documents"""
+        cursor = Prediction.find_user_predictions(
+            user_id, limit=limit, skip=skip, after=after, projection=Prediction.HISTORY_PROJECTION, **filters
+        )
         for pred_data in cursor:
-            predictions.append(Prediction(
-                user_id=pred_data['user_id'],
-                prediction_type=pred_data['prediction_type'],
-                input_data=pred_data['input_data'],
-                predicted_value=pred_data['predicted_value'],
-                metadata=pred_data.get('metadata', {}),
-                created_at=pred_data.get('created_at'),
-                _id=pred_data['_id']
-            ))
-        
-        return predictions
+            yield Prediction.history_dict(pred_data, user_id)
+    
+    @staticmethod
+    async def user_prediction_dicts_async(user_id, limit=None, skip=0, after=None, **filters):
+        """iter_user_prediction_dicts on the async driver, as a list"""
+        cursor = Prediction.find_user_predictions(
+            user_id, limit=limit, skip=skip, after=after, projection=Prediction.HISTORY_PROJECTION,
+            collection=AsyncDatabase.collection('predictions'), **filters
+        )
+        return [Prediction.history_dict(pred_data, user_id) async for pred_data in cursor]
+    
+    @staticmethod
+    def history_dict(pred_data, user_id):
+        """Format a raw prediction document like to_dict, without building a Prediction"""
+        created_at = pred_data.get('created_at')
+        return {
+            'id': str(pred_data['_id']),
+            'user_id': user_id,
+            'prediction_type': pred_data['prediction_type'],
+            'input_data': pred_data['input_data'],
+            'predicted_value': pred_data['predicted_value'],
+            'metadata': pred_data.get('metadata', {}),
+            'created_at': created_at.isoformat(timespec='milliseconds') + 'Z' if created_at else None
+        }
     
     @staticmethod
-    def get_user_prediction_count(user_id):
-        """Get total count of predictions for a user"""
-        db = Database.get_db()
-        return db.predictions.count_documents({'user_id': user_id})
+    def encode_cursor(created_at, _id):
+        """Build an opaque page cursor from a prediction's (created_at, _id)"""
+        raw = json.dumps([created_at.isoformat(), str(_id)])
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
     
     @staticmethod
-    def delete_user_predictions(user_id):
-        """Delete all predictions for a user"""
-        db = Database.get_db()
-        return db.predictions.delete_many({'user_id': user_id})
+    def decode_cursor(token):
+        """Parse a page cursor, raising ValueError if it is malformed"""
+        try:
+            raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+            created_at, last_id = json.loads(raw)
+            return datetime.fromisoformat(created_at), ObjectId(last_id)
+        except Exception:
+            raise ValueError('Invalid cursor')
     
     def to_dict(self):
         """Convert prediction to dictionary"""
@@ -80,7 +227,7 @@ class Prediction:
         created_at_str = None
         if self.created_at:
             # Add 'Z' suffix to indicate UTC time
-            created_at_str = self.created_at.strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
+            created_at_str = self.created_at.isoformat(timespec='milliseconds') + 'Z'
         
         return {
             'id': str(self._id),
@@ -1,23 +1,39 @@
-from werkzeug.security import generate_password_hash, check_password_hash
-from database import Database
+import time
+import threading
+from collections import OrderedDict
+from password_hashing import PasswordHasher, HashingOverloaded
+from config import Config
+from database import Database, AsyncDatabase
 from datetime import datetime
 
 class User:
-    def __init__(self, email, name, password_hash, created_at=None, _id=None):
+    # Per-process cache of user documents keyed by email: email -> (expires_at, user_data)
+    _cache = OrderedDict()
+    _cache_lock = threading.Lock()
+    
+    # Password hashing runs in a bounded process pool (raises HashingOverloaded when it is full)
+    hasher = PasswordHasher(
+        method=Config.PASSWORD_HASH_METHOD,
+        workers=Config.PASSWORD_HASH_WORKERS,
+        max_pending=Config.PASSWORD_HASH_MAX_PENDING,
+        timeout=Config.PASSWORD_HASH_TIMEOUT
+    )
+    
+    def __init__(self, email, name, password_hash, created_at=None, _id=None, deleted_at=None):
         self.email = email
         self.name = name
         self.password_hash = password_hash
         self.created_at = created_at or datetime.utcnow()
         self._id = _id
+        self.deleted_at = deleted_at  # Set while the account's data is being deleted
     
     @staticmethod
     def create_user(email, name, password):
         """Create a new user with hashed password"""
-        password_hash = generate_password_hash(password)
+        password_hash = User.hasher.hash(password)
         user = User(email=email, name=name, password_hash=password_hash)
         
-        db = Database.get_db()
-        result = db.users.insert_one({
+        result = Database.collection('users').insert_one({
             'email': user.email,
             'name': user.name,
             'password_hash': user.password_hash,
@@ -29,43 +45,157 @@ class User:
     @staticmethod
     def find_by_email(email):
         """Find user by email"""
-        db = Database.get_db()
-        user_data = db.users.find_one({'email': email})
+        user_data = Database.collection('users').find_one({'email': email})
         
         if user_data:
-            return User(
-                email=user_data['email'],
-                name=user_data['name'],
-                password_hash=user_data['password_hash'],
-                created_at=user_data.get('created_at'),
-                _id=user_data['_id']
-            )
+            return User.from_document(user_data)
+        return None
+    
+    @staticmethod
+    def from_document(user_data):
+        """Build a User from a users document"""
+        return User(
+            email=user_data['email'],
+            name=user_data['name'],
+            password_hash=user_data['password_hash'],
+            created_at=user_data.get('created_at'),
+            _id=user_data['_id'],
+            deleted_at=user_data.get('deleted_at')
+        )
+    
+    @staticmethod
+    def find_by_email_cached(email):
+        """Find user by email, served from a short-lived cache when possible"""
+        if Config.USER_CACHE_TTL <= 0:
+            return User.find_by_email(email)
+        
+        user = User._cached(email)
+        if user is None:
+            user = User.find_by_email(email)
+            if user:
+                User._remember(user)
+        return user
+    
+    @staticmethod
+    async def find_by_email_async(email):
+        """Find user by email on the async driver"""
+        user_data = await AsyncDatabase.collection('users').find_one({'email': email})
+        return User.from_document(user_data) if user_data else None
+    
+    @staticmethod
+    async def find_by_email_cached_async(email):
+        """find_by_email_cached on the async driver (same cache)"""
+        if Config.USER_CACHE_TTL <= 0:
+            return await User.find_by_email_async(email)
+        
+        user = User._cached(email)
+        if user is None:
+            user = await User.find_by_email_async(email)
+            if user:
+                User._remember(user)
+        return user
+    
+    @staticmethod
+    def _cached(email):
+        now = time.monotonic()
+        with User._cache_lock:
+            entry = User._cache.get(email)
+            if entry and entry[0] > now:
+                User._cache.move_to_end(email)
+                return User(**entry[1])
         return None
     
+    @staticmethod
+    def _remember(user):
+        with User._cache_lock:
+            User._cache[user.email] = (time.monotonic() + Config.USER_CACHE_TTL, {
+                'email': user.email,
+                'name': user.name,
+                'password_hash': user.password_hash,
+                'created_at': user.created_at,
+                '_id': user._id,
+                'deleted_at': user.deleted_at
+            })
+            User._cache.move_to_end(user.email)
+            while len(User._cache) > Config.USER_CACHE_MAX_SIZE:
+                User._cache.popitem(last=False)
+    
+    @staticmethod
+    def invalidate_cache(email=None, user_id=None):
+        """Drop cached users by email or id"""
+        with User._cache_lock:
+            if email is not None:
+                User._cache.pop(email, None)
+            if user_id is not None:
+                for cached_email in [e for e, (_, data) in User._cache.items() if data['_id'] == user_id]:
+                    del User._cache[cached_email]
+    
     @staticmethod
     def verify_password(email, password):
-        """Verify user password"""
+        """Verify user password, upgrading a hash made with older parameters"""
         user = User.find_by_email(email)
-        if user and check_password_hash(user.password_hash, password):
-            return user
-        return None
+        if user is None or user.deleted_at or not User.hasher.verify(user.password_hash, password):
+            return None
+        if User.hasher.needs_rehash(user.password_hash):
+            try:
+                User._save_password_hash(user, User.hasher.hash(password))
+            except HashingOverloaded:
+                pass  # Upgraded on a later login
+        return user
+    
+    @staticmethod
+    async def verify_password_async(email, password):
+        """verify_password on the async driver"""
+        user = await User.find_by_email_async(email)
+        if user is None or user.deleted_at or not await User.hasher.verify_async(user.password_hash, password):
+            return None
+        if User.hasher.needs_rehash(user.password_hash):
+            try:
+                password_hash = await User.hasher.hash_async(password)
+            except HashingOverloaded:
+                return user
+            await AsyncDatabase.collection('users').update_one(
+                {'_id': user._id}, {'$set': {'password_hash': password_hash}}
+            )
+            User._password_hash_saved(user, password_hash)
+        return user
+    
+    @staticmethod
+    def _save_password_hash(user, password_hash):
+        Database.collection('users').update_one({'_id': user._id}, {'$set': {'password_hash': password_hash}})
+        User._password_hash_saved(user, password_hash)
+    
+    @staticmethod
+    def _password_hash_saved(user, password_hash):
+        user.password_hash = password_hash
+        User.hasher.rehashed += 1
+        User.invalidate_cache(email=user.email)
     
     def update_name(self, new_name):
         """Update user's name"""
-        db = Database.get_db()
-        db.users.update_one(
+        Database.collection('users').update_one(
             {'_id': self._id},
             {'$set': {'name': new_name}}
         )
         self.name = new_name
+        User.invalidate_cache(email=self.email)
         return True
     
+    @staticmethod
+    def mark_deleted(user):
+        """Flag an account as deleted (its tokens and password stop working) ahead of removing it"""
+        user.deleted_at = datetime.utcnow()
+        Database.collection('users', acknowledged=True).update_one(
+            {'_id': user._id}, {'$set': {'deleted_at': user.deleted_at}}
+        )
+        User.invalidate_cache(email=user.email)
+    
     @staticmethod
     def delete_user(user_id):
         """Delete user account"""
-        db = Database.get_db()
         # Delete user
-        result = db.users.delete_one({'_id': user_id})
+        result = Database.collection('users', acknowledged=True).delete_one({'_id': user_id})
+        User.invalidate_cache(user_id=user_id)
         return result.deleted_count > 0
     
     def to_dict(self):
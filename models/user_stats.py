@@ -0,0 +1,174 @@
+import asyncio
+from collections import defaultdict
+from datetime import datetime
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+from bson import ObjectId
+from database import Database, AsyncDatabase
+
+class UserStats:
+    # One summary document per user in db.user_stats:
+    # {_id: user_id, total, by_type: {type: n}, months: {'YYYY-MM': {total, by_type: {type: n}}}}
+
+    @staticmethod
+    def month_key(when):
+        """Bucket key for a UTC datetime"""
+        return when.strftime('%Y-%m')
+
+    @staticmethod
+    def record(docs):
+        """Increment counters for newly stored prediction documents"""
+        updates = UserStats.updates(docs)
+        if updates:
+            Database.collection('user_stats').bulk_write(updates, ordered=False)
+
+    @staticmethod
+    async def record_async(docs):
+        """record on the async driver"""
+        updates = UserStats.updates(docs)
+        if updates:
+            await AsyncDatabase.collection('user_stats').bulk_write(updates, ordered=False)
+
+    @staticmethod
+    def updates(docs):
+        """One update per user incrementing the counters for the given prediction documents"""
+        increments = defaultdict(lambda: defaultdict(int))
+        for doc in docs:
+            month = UserStats.month_key(doc['created_at'])
+            prediction_type = doc['prediction_type']
+            counters = increments[doc['user_id']]
+            counters['total'] += 1
+            counters[f'by_type.{prediction_type}'] += 1
+            counters[f'months.{month}.total'] += 1
+            counters[f'months.{month}.by_type.{prediction_type}'] += 1
+
+        # Only summaries built from db.predictions are incremented; a user without one (new, or
+        # from before counters existed) gets it rebuilt, new predictions included, on first read
+        return [
+            UpdateOne({'_id': user_id}, {'$inc': dict(counters)})
+            for user_id, counters in increments.items()
+        ]
+
+    @staticmethod
+    def built(stats):
+        """Whether a summary was built by rebuild (older versions upserted partial ones from increments)"""
+        return stats is not None and 'rebuild_id' in stats
+
+    @staticmethod
+    def get(user_id):
+        """Read a user's counters, rebuilding them from predictions if missing"""
+        stats = Database.collection('user_stats').find_one({'_id': user_id})
+        if not UserStats.built(stats):
+            stats = UserStats._rebuild_user(user_id, force=False)
+        return stats
+
+    @staticmethod
+    async def get_async(user_id):
+        """get on the async driver (a missing document is rebuilt on a worker thread)"""
+        stats = await AsyncDatabase.collection('user_stats').find_one({'_id': user_id})
+        if not UserStats.built(stats):
+            stats = await asyncio.get_running_loop().run_in_executor(None, UserStats._rebuild_user, user_id, False)
+        return stats
+
+    @staticmethod
+    def summary(user_id, now=None):
+        """Totals for the stats API from a single point read"""
+        return UserStats.summarize(UserStats.get(user_id), now)
+
+    @staticmethod
+    async def summary_async(user_id, now=None):
+        """summary on the async driver"""
+        return UserStats.summarize(await UserStats.get_async(user_id), now)
+
+    @staticmethod
+    def summarize(stats, now=None):
+        month = stats.get('months', {}).get(UserStats.month_key(now or datetime.utcnow()), {})
+        return {
+            'total_predictions': stats.get('total', 0),
+            'month_predictions': month.get('total', 0),
+            'by_type': stats.get('by_type', {}),
+            'month_by_type': month.get('by_type', {})
+        }
+
+    @staticmethod
+    def reset(user_id):
+        """Drop a user's counters"""
+        Database.collection('user_stats').delete_one({'_id': user_id})
+
+    # Times a user's rebuild counts their predictions again when increments arrive meanwhile
+    REBUILD_ATTEMPTS = 3
+
+    @staticmethod
+    def rebuild(user_id=None):
+        """Recompute counters from db.predictions for one user (returns them), or for everyone (returns how many)"""
+        if user_id is not None:
+            return UserStats._rebuild_user(user_id)
+
+        run_id = ObjectId()
+        rebuilt = 0
+        users = Database.collection('predictions').aggregate([{'$group': {'_id': '$user_id'}}], allowDiskUse=True)
+        for user in users:
+            UserStats._rebuild_user(user['_id'])
+            rebuilt += 1
+        # Users without predictions any more keep no counters. Only summaries from before this run
+        # are removed: ones rebuilt (or being rebuilt) meanwhile carry a later id and are kept
+        Database.collection('user_stats').delete_many({'$or': [
+            {'rebuild_id': {'$lt': run_id}},
+            {'rebuild_id': {'$exists': False}, 'rebuilding': {'$not': {'$gte': run_id}}}
+        ]})
+        return rebuilt
+
+    @staticmethod
+    def _rebuild_user(user_id, force=True):
+        """Count a user's predictions into their summary; without force a summary built meanwhile is kept"""
+        collection = Database.collection('user_stats', acknowledged=True)
+        for attempt in range(UserStats.REBUILD_ATTEMPTS):
+            run_id = ObjectId()
+            # Park an empty summary first: record only increments existing summaries, so
+            # predictions stored while this one counts theirs land on it instead of being lost
+            try:
+                collection.update_one(
+                    {'_id': user_id} if force else {'_id': user_id, 'rebuild_id': {'$exists': False}},
+                    {'$set': {'total': 0, 'by_type': {}, 'months': {}, 'rebuilding': run_id}, '$unset': {'rebuild_id': ''}},
+                    upsert=True
+                )
+            except DuplicateKeyError:
+                # Built by a concurrent rebuild since it was read
+                return collection.find_one({'_id': user_id})
+
+            stats = UserStats._count(user_id, run_id)
+            # Swap in the counts only if no increment arrived meanwhile (it might not be in them);
+            # the last attempt keeps them anyway, and rebuild-stats repairs any drift
+            unchanged = {'_id': user_id, 'rebuilding': run_id}
+            if attempt < UserStats.REBUILD_ATTEMPTS - 1:
+                unchanged['total'] = 0
+            if collection.replace_one(unchanged, stats).matched_count:
+                return stats
+
+            current = collection.find_one({'_id': user_id})
+            if UserStats.built(current):
+                return current
+        return stats
+
+    @staticmethod
+    def _count(user_id, run_id):
+        """A built summary document from the user's stored predictions"""
+        stats = {'_id': user_id, 'total': 0, 'by_type': {}, 'months': {}, 'rebuild_id': run_id}
+        pipeline = [
+            {'$match': {'user_id': user_id}},
+            {'$group': {
+                '_id': {
+                    'type': '$prediction_type',
+                    'month': {'$dateToString': {'format': '%Y-%m', 'date': '$created_at'}}
+                },
+                'count': {'$sum': 1}
+            }}
+        ]
+        for group in Database.collection('predictions').aggregate(pipeline):
+            key = group['_id']
+            month = stats['months'].setdefault(key['month'], {'total': 0, 'by_type': {}})
+            stats['total'] += group['count']
+            stats['by_type'][key['type']] = stats['by_type'].get(key['type'], 0) + group['count']
+            month['total'] += group['count']
+            month['by_type'][key['type']] = month['by_type'].get(key['type'], 0) + group['count']
+        return stats
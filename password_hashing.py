@@ -0,0 +1,176 @@
+import os
+import time
+import asyncio
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError, wait
+from concurrent.futures.process import BrokenProcessPool
+from werkzeug.security import generate_password_hash, check_password_hash
+from metrics import registry, PASSWORD_HASH_LATENCY, PASSWORD_HASH_COMPUTE, PASSWORD_HASH_REJECTED
+
+
+class HashingOverloaded(Exception):
+    """Raised when too many hashes are queued (or one waited too long); answer with a 503"""
+
+
+def _noop():
+    pass
+
+
+def _timed(fn, *args):
+    # Runs in the pool process, which cannot update this process's metrics
+    start = time.perf_counter()
+    return fn(*args), time.perf_counter() - start
+
+
+class PasswordHasher:
+    """Hash and check passwords in a small process pool so they do not hold request threads' GIL.
+
+    At most max_pending operations are queued or running per process; callers past that get
+    HashingOverloaded straight away instead of waiting behind a login burst. workers=0 hashes
+    in the calling thread (still subject to max_pending). mp_context chooses how the pool
+    processes are started (the platform default, fork on Linux, when None).
+    """
+
+    def __init__(self, method='scrypt', workers=2, max_pending=8, timeout=10, mp_context=None):
+        self.method = method
+        self.workers = workers
+        self.mp_context = mp_context
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.rejected = 0
+        self.rehashed = 0
+        self._pending = 0
+        self._prefix = None
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    @property
+    def pending(self):
+        return self._pending
+
+    def start(self):
+        """Fork the pool processes now, e.g. right after a worker forks and before it starts threads"""
+        if not self.workers:
+            return
+        # ProcessPoolExecutor forks nothing until its first submit, which would otherwise be a
+        # signup or login request arriving once this process is running threads
+        executor = self._ensure_pool()
+        wait([executor.submit(_noop) for _ in range(self.workers)], timeout=self.timeout)
+
+    def _ensure_pool(self):
+        # Pool processes belong to the process that started them, so start one per process
+        if self._pid == os.getpid() and self._executor is not None:
+            return self._executor
+        with self._lock:
+            if self._pid != os.getpid() or self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=self.mp_context)
+                self._pid = os.getpid()
+        return self._executor
+
+    def _acquire(self, operation):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.rejected += 1
+                if registry.enabled:
+                    PASSWORD_HASH_REJECTED.inc(operation)
+                raise HashingOverloaded('Too many sign-ins in progress, please retry')
+            self._pending += 1
+
+    def _release(self, _future=None):
+        with self._lock:
+            self._pending -= 1
+
+    def _submit(self, operation, fn, *args):
+        self._acquire(operation)
+        try:
+            future = self._ensure_pool().submit(_timed, fn, *args)
+        except BrokenProcessPool:
+            # A pool process died; replace the pool and try once more
+            self._executor = None
+            try:
+                future = self._ensure_pool().submit(_timed, fn, *args)
+            except BaseException:
+                self._release()
+                raise
+        except BaseException:
+            self._release()
+            raise
+        future.add_done_callback(self._release)
+        return future
+
+    def _run(self, operation, fn, *args):
+        start = time.perf_counter()
+        if not self.workers:
+            self._acquire(operation)
+            try:
+                result, seconds = _timed(fn, *args)
+            finally:
+                self._release()
+        else:
+            try:
+                result, seconds = self._submit(operation, fn, *args).result(timeout=self.timeout)
+            except FutureTimeoutError:
+                raise HashingOverloaded('Sign-in timed out, please retry')
+            except BrokenProcessPool:
+                self._executor = None
+                raise
+        self._observe(operation, start, seconds)
+        return result
+
+    async def _run_async(self, operation, fn, *args):
+        start = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        if not self.workers:
+            self._acquire(operation)
+            try:
+                result, seconds = await loop.run_in_executor(None, _timed, fn, *args)
+            finally:
+                self._release()
+        else:
+            try:
+                result, seconds = await asyncio.wait_for(
+                    asyncio.wrap_future(self._submit(operation, fn, *args)), self.timeout
+                )
+            except asyncio.TimeoutError:
+                raise HashingOverloaded('Sign-in timed out, please retry')
+            except BrokenProcessPool:
+                self._executor = None
+                raise
+        self._observe(operation, start, seconds)
+        return result
+
+    def _observe(self, operation, start, seconds):
+        if registry.enabled:
+            PASSWORD_HASH_LATENCY.observe(time.perf_counter() - start, operation)
+            PASSWORD_HASH_COMPUTE.observe(seconds, operation)
+
+    def hash(self, password):
+        """Hash a password with the configured method"""
+        return self._run('hash', generate_password_hash, password, self.method)
+
+    def verify(self, password_hash, password):
+        """Check a password against a stored hash"""
+        return self._run('verify', check_password_hash, password_hash, password)
+
+    async def hash_async(self, password):
+        return await self._run_async('hash', generate_password_hash, password, self.method)
+
+    async def verify_async(self, password_hash, password):
+        return await self._run_async('verify', check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """Whether a stored hash was made with other parameters than the configured method"""
+        if self._prefix is None:
+            # "method:params" exactly as werkzeug writes it, e.g. scrypt:32768:8:1
+            self._prefix = generate_password_hash('', self.method).split('$', 1)[0]
+        return password_hash.split('$', 1)[0] != self._prefix
+
+    def stats(self):
+        return {
+            'workers': self.workers,
+            'pending': self._pending,
+            'max_pending': self.max_pending,
+            'rejected': self.rejected,
+            'rehashed': self.rehashed
+        }
@@ -0,0 +1,30 @@
+import os
+import resource
+
+
+def memory_usage():
+    """Resident memory of this process in MB.
+
+    rss counts pages shared with other workers; pss splits shared pages between the processes
+    using them and private counts pages only this process holds (Linux only, else None).
+    """
+    usage = {'rss': None, 'pss': None, 'private': None}
+    try:
+        with open('/proc/self/smaps_rollup', 'r') as f:
+            fields = {}
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2 and parts[0].endswith(':') and parts[1].isdigit():
+                    fields[parts[0][:-1]] = int(parts[1])
+        usage['rss'] = fields.get('Rss', 0) / 1024
+        usage['pss'] = fields.get('Pss', 0) / 1024
+        usage['private'] = (fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0)) / 1024
+    except OSError:
+        # Peak RSS is the best portable figure (kilobytes on Linux, bytes on macOS)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        usage['rss'] = peak / (1024 * 1024) if os.uname().sysname == 'Darwin' else peak / 1024
+    return usage
+
+
+def format_memory(usage):
+    return ', '.join(f"{name} {value:.1f} MB" for name, value in usage.items() if value is not None)
@@ -0,0 +1,36 @@
+"""Shared test setup: the environment Config reads, and mongomock in place of MongoDB."""
+import os
+import sys
+import atexit
+import shutil
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Config reads the environment once, when it is first imported, so every test module shares
+# this one; models are trained into MODEL_DIR by the tests that need them
+MODEL_DIR = tempfile.mkdtemp(prefix='lkpredictor-tests-')
+atexit.register(shutil.rmtree, MODEL_DIR, True)
+os.environ.update({
+    'SECRET_KEY': 'test-secret-key-0123456789abcdef0123',
+    'JWT_SECRET_KEY': 'test-jwt-secret-key-0123456789abcdef0123',
+    'MONGO_URI': 'mongodb://localhost/lkpredictor_test',
+    'MODEL_PATH': os.path.join(MODEL_DIR, 'house.pkl'),
+    'DIABETES_MODEL_PATH': os.path.join(MODEL_DIR, 'diabetes.pkl'),
+    'DIABETES_SCALER_PATH': os.path.join(MODEL_DIR, 'scaler.pkl'),
+    'MODEL_COLUMNS_PATH': os.path.join(ROOT, 'model_columns.json'),
+    'DIABETES_COLUMNS_PATH': os.path.join(ROOT, 'diabetes_model_columns.json'),
+    'PASSWORD_HASH_WORKERS': '0'
+})
+
+
+@pytest.fixture
+def mongo():
+    """Database pointed at an empty mongomock database"""
+    mongomock = pytest.importorskip('mongomock')
+    from database import Database
+    Database.initialize(mongomock.MongoClient(os.environ['MONGO_URI']))
+    return Database
@@ -0,0 +1,84 @@
+"""Background account deletion: leases, resuming a dead worker's job, and the settle sweep."""
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from account_deletion import AccountDeleter
+
+
+def save_predictions(mongo, user_id, count):
+    ids = sorted(ObjectId() for _ in range(count))
+    mongo.collection('predictions').insert_many(
+        [{'_id': _id, 'user_id': user_id, 'prediction_type': 'house', 'created_at': datetime.utcnow()} for _id in ids]
+    )
+    return ids
+
+
+def expire(mongo, user_id, seconds=1, **fields):
+    """Move a job's lease (and any other timestamps given) seconds into the past, as if time had passed"""
+    past = datetime.utcnow() - timedelta(seconds=seconds)
+    mongo.collection('account_deletions').update_one(
+        {'_id': user_id}, {'$set': dict({'lease_until': past}, **{field: past for field in fields})}
+    )
+
+
+def test_lease_is_reclaimed_after_the_worker_dies(mongo, monkeypatch):
+    ids = save_predictions(mongo, 'u1', 5)
+    save_predictions(mongo, 'u2', 2)
+    finished = []
+    first = AccountDeleter(batch_size=2, batch_delay=0, lease_seconds=60, on_finished=finished.append)
+    second = AccountDeleter(batch_size=2, batch_delay=0, lease_seconds=60, on_finished=finished.append)
+    monkeypatch.setattr(first, 'start', lambda: None)
+    token = first.request('u1')
+
+    renew = first._renew
+
+    def renew_then_die(user_id, update, lease_until=None):
+        renew(user_id, update, lease_until)
+        raise RuntimeError('worker killed')
+
+    monkeypatch.setattr(first, '_renew', renew_then_die)
+    assert first.run_pending() == 0
+
+    job = mongo.collection('account_deletions').find_one({'_id': 'u1'})
+    assert (job['status'], job['deleted'], job['last_id']) == ('running', 2, ids[1])
+    assert first.status(token)['status'] == 'running'
+
+    # Nobody else takes the job while the dead worker's lease lasts
+    assert second.run_pending() == 0
+    assert mongo.collection('predictions').count_documents({'user_id': 'u1'}) == 3
+
+    expire(mongo, 'u1')
+    assert second.run_pending() == 1
+
+    assert second.deleted == 3
+    assert mongo.collection('predictions').count_documents({'user_id': 'u1'}) == 0
+    assert mongo.collection('predictions').count_documents({'user_id': 'u2'}) == 2
+    assert finished == ['u1']
+    status = second.status(token)
+    assert (status['status'], status['deleted']) == ('done', 5)
+
+    # The first worker, had it only stalled, can no longer write to the job
+    assert renew('u1', {'$set': {'last_id': None}}) is False
+
+
+def test_predictions_landing_while_sessions_settle_are_swept(mongo, monkeypatch):
+    save_predictions(mongo, 'u1', 3)
+    finished = []
+    deleter = AccountDeleter(batch_size=2, batch_delay=0, settle_seconds=60, on_finished=finished.append)
+    monkeypatch.setattr(deleter, 'start', lambda: None)
+    deleter.request('u1')
+
+    assert deleter.run_pending() == 0
+    job = mongo.collection('account_deletions').find_one({'_id': 'u1'})
+    assert job['status'] == 'running' and job['last_id'] is None
+    assert job['lease_until'] >= job['requested_at'] + timedelta(seconds=59)
+
+    # A session cached elsewhere still saves a prediction before the settle period ends
+    save_predictions(mongo, 'u1', 1)
+    assert deleter.run_pending() == 0
+
+    expire(mongo, 'u1', seconds=61, requested_at=True)
+    assert deleter.run_pending() == 1
+    assert mongo.collection('predictions').count_documents({'user_id': 'u1'}) == 0
+    assert finished == ['u1']
@@ -0,0 +1,104 @@
+"""Concurrent predictions through the async serving mode.
+
+Runs in-process against mongomock with small forests trained here, so it needs the async
+extras plus mongomock and mongomock-motor (pip install -r requirements-dev.txt).
+"""
+import os
+import json
+import asyncio
+
+import pytest
+
+pytest.importorskip('starlette')
+pytest.importorskip('a2wsgi')
+httpx = pytest.importorskip('httpx')
+pytest.importorskip('mongomock')
+mongomock_motor = pytest.importorskip('mongomock_motor')
+
+import joblib
+import numpy as np
+from bson import ObjectId
+from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
+from sklearn.preprocessing import StandardScaler
+
+from conftest import ROOT
+
+CONCURRENCY = 40
+
+
+def train_models():
+    """Small forests whose outputs differ from one input to the next, saved where Config looks"""
+    rng = np.random.default_rng(0)
+    with open(os.path.join(ROOT, 'model_columns.json')) as f:
+        house_columns = json.load(f)
+    X = np.zeros((2000, len(house_columns)))
+    X[:, 0] = rng.uniform(500, 5000, len(X))
+    X[:, 1] = rng.integers(1, 7, len(X))
+    X[np.arange(len(X)), rng.integers(2, len(house_columns), len(X))] = 1
+    house = RandomForestRegressor(n_estimators=10, random_state=0).fit(X, X[:, 0] * 1000 + X[:, 1] * 1e5)
+
+    with open(os.path.join(ROOT, 'diabetes_model_columns.json')) as f:
+        diabetes_columns = json.load(f)
+    D = rng.integers(0, 5, (2000, len(diabetes_columns))).astype(float)
+    scaler = StandardScaler().fit(D)
+    diabetes = RandomForestClassifier(n_estimators=10, random_state=0).fit(
+        scaler.transform(D), np.digitize(D[:, 0] + D[:, 1], [3, 6])
+    )
+
+    joblib.dump(house, os.environ['MODEL_PATH'])
+    joblib.dump(diabetes, os.environ['DIABETES_MODEL_PATH'])
+    joblib.dump(scaler, os.environ['DIABETES_SCALER_PATH'])
+
+
+@pytest.fixture
+def asgi_app(mongo):
+    train_models()
+    import asgi
+    return asgi
+
+
+def test_concurrent_predictions_match_their_own_inputs(asgi_app):
+    app_module = asgi_app.app_module
+    from database import Database, AsyncDatabase
+
+    signup = app_module.app.test_client().post(
+        '/api/auth/signup', json={'email': 'load@example.com', 'name': 'Load', 'password': 'pw'}
+    )
+    headers = {'Authorization': f"Bearer {signup.get_json()['token']}"}
+
+    houses = [
+        {'SquareFootage': 1000 + 97 * i, 'Bedrooms': 1 + i % 6, 'Location': ['Rural', 'Suburb', 'Urban'][i % 3]}
+        for i in range(CONCURRENCY)
+    ]
+    patients = [
+        dict({column: 0 for column in app_module.DIABETES_COLUMNS},
+             **{app_module.DIABETES_COLUMNS[0]: i % 5, app_module.DIABETES_COLUMNS[1]: i // 5 % 5})
+        for i in range(CONCURRENCY)
+    ]
+
+    async def run():
+        AsyncDatabase.initialize(mongomock_motor.AsyncMongoMockClient(mock_mongo_client=Database.get_db().client))
+        transport = httpx.ASGITransport(app=asgi_app.app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://test') as client:
+            return await asyncio.gather(
+                *[client.post('/api/predict/house', json=data, headers=headers) for data in houses],
+                *[client.post('/api/predict/diabetes', json=data, headers=headers) for data in patients]
+            )
+
+    responses = [response.json() for response in asyncio.run(run())]
+    house_responses, diabetes_responses = responses[:CONCURRENCY], responses[CONCURRENCY:]
+
+    house = app_module.model_registry.get('house').artifact
+    for data, body in zip(houses, house_responses):
+        assert body['success'], body
+        expected = float(house.predict(app_module.house_encoder.encode(data))[0])
+        assert body['prediction'] == expected
+        saved = Database.collection('predictions').find_one({'_id': ObjectId(body['prediction_id'])})
+        assert saved['input_data']['SquareFootage'] == data['SquareFootage']
+        assert saved['predicted_value'] == expected
+
+    diabetes = app_module.model_registry.get('diabetes').artifact
+    for data, body in zip(patients, diabetes_responses):
+        assert body['success'], body
+        proba = diabetes['model'].predict_proba(diabetes['scaler'].transform(app_module.diabetes_encoder.encode(data)))[0]
+        assert body['probabilities'] == app_module.diabetes_output(proba, app_module.model_registry.get('diabetes'))['probabilities']
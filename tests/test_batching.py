@@ -0,0 +1,95 @@
+"""Micro-batching: concurrent callers share model calls but each gets back its own rows."""
+import threading
+
+import numpy as np
+import pytest
+
+from batching import MicroBatcher
+
+
+def call_together(batcher, requests):
+    """Run batcher.predict for each (features, context) at once, returning outputs or raised errors"""
+    results = [None] * len(requests)
+    start = threading.Barrier(len(requests))
+
+    def call(i, features, context):
+        start.wait()
+        try:
+            results[i] = batcher.predict(features, context)
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=call, args=(i, *request)) for i, request in enumerate(requests)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    return results
+
+
+def test_each_caller_gets_its_own_slice_of_the_batch():
+    calls = []
+
+    def predict(context, features):
+        calls.append(len(features))
+        return features[:, 0] * 10
+
+    batcher = MicroBatcher(predict, max_batch_size=64, max_delay=0.2)
+    requests = [(np.full((i % 3 + 1, 2), i, dtype=np.float64), None) for i in range(8)]
+
+    results = call_together(batcher, requests)
+
+    for (features, _), outputs in zip(requests, results):
+        np.testing.assert_array_equal(outputs, features[:, 0] * 10)
+    assert sum(calls) == batcher.stats()['rows'] == sum(len(features) for features, _ in requests)
+    assert len(calls) < len(requests)
+
+
+def test_model_errors_reach_every_caller_in_the_batch():
+    def predict(context, features):
+        raise ValueError('model exploded')
+
+    batcher = MicroBatcher(predict, max_delay=0.2)
+
+    results = call_together(batcher, [(np.zeros((1, 2)), None) for _ in range(4)])
+
+    assert all(isinstance(result, ValueError) and str(result) == 'model exploded' for result in results)
+    assert batcher.stats()['batches'] == 0
+
+    # The worker keeps serving after a failed batch
+    batcher.predict_fn = lambda context, features: features.sum(axis=1)
+    np.testing.assert_array_equal(batcher.predict(np.ones((2, 3))), [3.0, 3.0])
+
+
+def test_jobs_for_different_contexts_are_not_mixed():
+    old, new = object(), object()
+    seen = []
+
+    def predict(context, features):
+        seen.append((context, len(features)))
+        return features[:, 0] + (1000 if context is new else 0)
+
+    batcher = MicroBatcher(predict, max_delay=0.2)
+    requests = [(np.full((1, 1), i, dtype=np.float64), old if i % 2 else new) for i in range(6)]
+
+    results = call_together(batcher, requests)
+
+    for (features, context), outputs in zip(requests, results):
+        np.testing.assert_array_equal(outputs, features[:, 0] + (1000 if context is new else 0))
+    assert sum(rows for context, rows in seen if context is old) == 3
+    assert sum(rows for context, rows in seen if context is new) == 3
+
+
+def test_a_full_batch_flushes_before_the_deadline():
+    batcher = MicroBatcher(lambda context, features: features[:, 0], max_batch_size=2, max_delay=30)
+
+    results = call_together(batcher, [(np.ones((1, 1)), None), (np.ones((1, 1)), None)])
+
+    assert [list(outputs) for outputs in results] == [[1.0], [1.0]]
+
+
+@pytest.mark.parametrize('rows', [1, 5])
+def test_single_caller_is_passed_through(rows):
+    batcher = MicroBatcher(lambda context, features: features[:, 0] * 2, max_delay=0)
+    np.testing.assert_array_equal(batcher.predict(np.arange(rows, dtype=np.float64).reshape(rows, 1)),
+                                  np.arange(rows) * 2)
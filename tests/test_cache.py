@@ -0,0 +1,105 @@
+"""Prediction cache: LRU eviction, TTL expiry and per-version invalidation."""
+import numpy as np
+import pytest
+
+import cache
+from cache import PredictionCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache.time, 'monotonic', clock)
+    return clock
+
+
+def key(n):
+    return PredictionCache.make_key('house', 'v1', np.array([float(n), 2.0]))
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    prediction_cache = PredictionCache(max_entries=2)
+    prediction_cache.put(key(1), 10.0)
+    prediction_cache.put(key(2), 20.0)
+    assert prediction_cache.get(key(1)) == 10.0  # 2 is now the least recently used
+
+    prediction_cache.put(key(3), 30.0)
+
+    assert prediction_cache.get(key(2)) is None
+    assert prediction_cache.get(key(1)) == 10.0
+    assert prediction_cache.get(key(3)) == 30.0
+    assert prediction_cache.stats()['evictions'] == 1
+
+
+def test_byte_budget_evicts_oldest_entries(clock):
+    row = np.zeros(100)
+    size = row.nbytes + 112 + PredictionCache.ENTRY_OVERHEAD
+    prediction_cache = PredictionCache(max_entries=100, max_bytes=size * 2)
+    for n in range(3):
+        prediction_cache.put(key(n), row.copy())
+
+    assert prediction_cache.get(key(0)) is None
+    assert prediction_cache.stats()['entries'] == 2
+    assert prediction_cache.stats()['bytes'] == size * 2
+
+    # Values that could never fit are not cached at all
+    prediction_cache.put(key(9), np.zeros(1000))
+    assert prediction_cache.get(key(9)) is None
+    assert prediction_cache.stats()['entries'] == 2
+
+
+def test_entries_expire_after_the_ttl(clock):
+    prediction_cache = PredictionCache(ttl=60)
+    prediction_cache.put(key(1), 10.0)
+
+    clock.now += 59
+    assert prediction_cache.get(key(1)) == 10.0
+
+    clock.now += 2
+    assert prediction_cache.get(key(1)) is None
+    stats = prediction_cache.stats()
+    assert (stats['entries'], stats['bytes'], stats['expirations']) == (0, 0, 1)
+
+
+def test_predict_only_computes_missing_rows(clock):
+    prediction_cache = PredictionCache(ttl=60)
+    calls = []
+
+    def predict_fn(features):
+        calls.append(features.copy())
+        return features[:, 0] * 10
+
+    features = np.array([[1.0, 2.0], [2.0, 2.0]])
+    np.testing.assert_array_equal(prediction_cache.predict('house', 'v1', features, predict_fn), [10.0, 20.0])
+
+    clock.now += 30
+    np.testing.assert_array_equal(
+        prediction_cache.predict('house', 'v1', np.array([[2.0, 2.0], [3.0, 2.0]]), predict_fn), [20.0, 30.0]
+    )
+    np.testing.assert_array_equal(calls[1], [[3.0, 2.0]])
+
+    # Past the TTL the first two rows are computed again
+    clock.now += 31
+    prediction_cache.predict('house', 'v1', features, predict_fn)
+    np.testing.assert_array_equal(calls[2], features)
+
+
+def test_new_model_version_drops_old_outputs(clock):
+    prediction_cache = PredictionCache()
+    features = np.array([[1.0, 2.0]])
+    prediction_cache.predict('house', 'v1', features, lambda rows: rows[:, 0])
+    prediction_cache.predict('diabetes', 'v1', features, lambda rows: rows[:, 0])
+
+    outputs = prediction_cache.predict('house', 'v2', features, lambda rows: rows[:, 0] + 1)
+
+    np.testing.assert_array_equal(outputs, [2.0])
+    assert prediction_cache.stats()['entries'] == 2
+    assert prediction_cache.get(PredictionCache.make_key('diabetes', 'v1', features[0])) == 1.0
@@ -0,0 +1,89 @@
+"""Keyset pagination of prediction history: cursors walk every row once, even across created_at ties."""
+import random
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+
+from models.prediction import Prediction
+
+
+@pytest.fixture
+def app_module(mongo):
+    import app
+    return app
+
+
+def save_predictions(mongo, user_id, created_ats):
+    """Insert one prediction per created_at, with _ids in shuffled order so ties are not broken by insert order"""
+    ids = sorted(ObjectId() for _ in created_ats)
+    random.Random(0).shuffle(ids)
+    docs = [
+        {'_id': _id, 'user_id': user_id, 'prediction_type': 'house', 'input_data': {'n': i},
+         'predicted_value': float(i), 'metadata': {}, 'created_at': created_at}
+        for i, (_id, created_at) in enumerate(zip(ids, created_ats))
+    ]
+    mongo.collection('predictions').insert_many(docs)
+    return docs
+
+
+def walk(app_module, user_id, limit, **filters):
+    """Follow next_cursor the way a client of /api/user/predictions does, returning each page's ids"""
+    pages, cursor = [], None
+    # A cursor that fails to move past its last row would page forever
+    for _ in range(100):
+        rows = list(Prediction.iter_user_prediction_dicts(user_id, limit=limit + 1, after=cursor, **filters))
+        page = app_module.prediction_page(rows, limit, len(rows))
+        pages.append([row['id'] for row in page['predictions']])
+        cursor = page['next_cursor']
+        if cursor is None:
+            return pages
+    pytest.fail(f'Still paging after {len(pages)} pages')
+
+
+def newest_first(docs):
+    return [str(doc['_id']) for doc in sorted(docs, key=lambda doc: (doc['created_at'], doc['_id']), reverse=True)]
+
+
+@pytest.mark.parametrize('limit', [1, 3, 4, 25])
+def test_cursor_walk_has_no_duplicates_or_gaps_when_created_at_ties(mongo, app_module, limit):
+    start = datetime(2024, 5, 1, 12, 0, 0, 250000)
+    # Runs of identical timestamps straddle page boundaries, as a batch prediction's rows do
+    created_ats = [start] * 7 + [start - timedelta(seconds=1)] + [start - timedelta(seconds=2)] * 5
+    docs = save_predictions(mongo, 'u1', created_ats)
+    save_predictions(mongo, 'u2', [start] * 3)
+
+    pages = walk(app_module, 'u1', limit)
+
+    assert [row for page in pages for row in page] == newest_first(docs)
+    assert all(len(page) == limit for page in pages[:-1])
+
+
+def test_sub_millisecond_timestamps_round_trip_through_the_cursor(mongo, app_module):
+    # MongoDB keeps milliseconds and the cursor carries the millisecond string the page shows
+    created_ats = [datetime(2024, 5, 1, 12, 0, 0, 999999 - i) for i in range(6)]
+    save_predictions(mongo, 'u1', created_ats)
+    stored = list(mongo.collection('predictions').find())
+    assert len({doc['created_at'] for doc in stored}) == 1
+
+    pages = walk(app_module, 'u1', 2)
+
+    assert [row for page in pages for row in page] == newest_first(stored)
+
+
+def test_cursor_respects_filters(mongo, app_module):
+    start = datetime(2024, 5, 1)
+    docs = save_predictions(mongo, 'u1', [start + timedelta(days=i // 3) for i in range(9)])
+
+    pages = walk(app_module, 'u1', 2, created_from=start + timedelta(days=1))
+
+    assert [row for page in pages for row in page] == newest_first(docs[3:])
+
+
+def test_cursor_round_trip_and_malformed_cursors():
+    created_at, _id = datetime(2024, 5, 1, 12, 0, 0, 123000), ObjectId()
+    assert Prediction.decode_cursor(Prediction.encode_cursor(created_at, _id)) == (created_at, _id)
+
+    for token in ('', 'not-a-cursor', Prediction.encode_cursor(created_at, _id)[:-4]):
+        with pytest.raises(ValueError):
+            Prediction.decode_cursor(token)
@@ -0,0 +1,85 @@
+"""Per-user prediction counters: increments, rebuilds and increments racing a rebuild."""
+from datetime import datetime
+
+from models.user_stats import UserStats
+
+
+def store(mongo, user_id, prediction_type='house', count=1):
+    """Save predictions and count them the way Prediction.create_predictions does"""
+    docs = [{'user_id': user_id, 'prediction_type': prediction_type, 'created_at': datetime.utcnow()}
+            for _ in range(count)]
+    mongo.collection('predictions').insert_many(docs)
+    UserStats.record(docs)
+
+
+def test_first_read_counts_predictions_from_before_counters(mongo):
+    mongo.collection('predictions').insert_many(
+        [{'user_id': 'u1', 'prediction_type': 'house', 'created_at': datetime.utcnow()} for _ in range(5)]
+    )
+    store(mongo, 'u1', 'diabetes')
+    # A partial summary upserted by an older version is rebuilt as well
+    mongo.collection('user_stats').insert_one({'_id': 'u2', 'total': 1, 'by_type': {'house': 1}})
+    store(mongo, 'u2', count=3)
+
+    assert UserStats.summary('u1')['by_type'] == {'house': 5, 'diabetes': 1}
+    assert UserStats.summary('u2')['total_predictions'] == 3
+
+    store(mongo, 'u1')
+    assert UserStats.summary('u1')['total_predictions'] == 7
+
+
+def test_rebuild_counts_again_when_an_increment_lands_meanwhile(mongo, monkeypatch):
+    store(mongo, 'u1', count=2)
+    count = UserStats._count
+    calls = []
+
+    def count_racing_a_prediction(user_id, run_id):
+        stats = count(user_id, run_id)
+        if not calls:
+            # Stored after the aggregate read the predictions, before the counts are written
+            store(mongo, user_id)
+        calls.append(stats['total'])
+        return stats
+
+    monkeypatch.setattr(UserStats, '_count', staticmethod(count_racing_a_prediction))
+    assert UserStats.get('u1')['total'] == 3
+    assert calls == [2, 3]
+    assert mongo.collection('user_stats').find_one({'_id': 'u1'})['total'] == 3
+
+
+def test_full_rebuild_drops_users_without_predictions(mongo):
+    store(mongo, 'u1', count=2)
+    store(mongo, 'u2', 'diabetes')
+    UserStats.get('u1')
+    mongo.collection('user_stats').insert_one({'_id': 'gone', 'total': 4, 'by_type': {}, 'months': {}})
+    mongo.collection('user_stats').update_one({'_id': 'u1'}, {'$set': {'total': 99}})
+
+    assert UserStats.rebuild() == 2
+
+    summaries = {doc['_id']: doc['total'] for doc in mongo.collection('user_stats').find()}
+    assert summaries == {'u1': 2, 'u2': 1}
+
+
+def test_summary_reports_the_current_month(mongo):
+    last_month = datetime(2024, 2, 29, 23, 59)
+    mongo.collection('predictions').insert_one({'user_id': 'u1', 'prediction_type': 'house', 'created_at': last_month})
+    store(mongo, 'u1')
+
+    summary = UserStats.summary('u1', now=last_month)
+    assert summary == {'total_predictions': 2, 'month_predictions': 1,
+                       'by_type': {'house': 2}, 'month_by_type': {'house': 1}}
+
+
+def test_forced_rebuild_hides_the_old_counts_while_it_counts(mongo, monkeypatch):
+    store(mongo, 'u1', count=2)
+    UserStats.get('u1')
+    count = UserStats._count
+    seen = []
+
+    def count_and_look(user_id, run_id):
+        seen.append(UserStats.built(mongo.collection('user_stats').find_one({'_id': user_id})))
+        return count(user_id, run_id)
+
+    monkeypatch.setattr(UserStats, '_count', staticmethod(count_and_look))
+    assert UserStats.rebuild('u1')['total'] == 2
+    assert seen == [False]
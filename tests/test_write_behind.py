@@ -0,0 +1,121 @@
+"""Write-behind spilling while MongoDB is unreachable, and replaying the spill file afterwards."""
+import os
+import time
+import asyncio
+import threading
+
+import pytest
+from bson import ObjectId
+from pymongo.errors import AutoReconnect
+
+from write_behind import WriteBehindWriter
+
+
+def make_docs(count):
+    return [{'_id': ObjectId(), 'user_id': 'u1', 'n': i} for i in range(count)]
+
+
+@pytest.fixture
+def writer(tmp_path):
+    return WriteBehindWriter('predictions', batch_size=3, flush_interval=0, max_retries=0,
+                             spill_path=str(tmp_path / 'spill.jsonl'))
+
+
+def unreachable(docs):
+    raise AutoReconnect('MongoDB is down')
+
+
+def spill_during_outage(writer, monkeypatch, docs):
+    with monkeypatch.context() as patch:
+        patch.setattr(writer, '_insert', unreachable)
+        assert writer._write(docs) is False
+
+
+def test_spilled_records_are_replayed_once_mongo_is_back(mongo, writer, monkeypatch):
+    docs = make_docs(7)
+    spill_during_outage(writer, monkeypatch, docs)
+    assert writer.stats()['spilled'] == 7
+    assert mongo.collection('predictions').count_documents({}) == 0
+
+    writer._replay_spill()
+
+    saved = sorted(doc['n'] for doc in mongo.collection('predictions').find())
+    assert saved == list(range(7))
+    assert not os.path.exists(writer.spill_path)
+    assert not os.path.exists(writer.spill_path + '.replay')
+
+
+def test_replay_skips_records_that_already_landed(mongo, writer, monkeypatch):
+    docs = make_docs(5)
+    spill_during_outage(writer, monkeypatch, docs)
+    # A replay interrupted after its first batch leaves these behind in the replay file
+    mongo.collection('predictions').insert_many(docs[:3])
+
+    writer._replay_spill()
+
+    assert mongo.collection('predictions').count_documents({}) == 5
+
+
+def test_corrupt_spill_line_is_set_aside(mongo, writer, monkeypatch):
+    spill_during_outage(writer, monkeypatch, make_docs(2))
+    with open(writer.spill_path, 'a') as f:
+        # A worker killed mid-write leaves a truncated record
+        f.write('{"_id": {"$oid": "65a0c3\n')
+    spill_during_outage(writer, monkeypatch, make_docs(2))
+
+    writer._replay_spill()
+
+    assert mongo.collection('predictions').count_documents({}) == 4
+    assert writer.stats()['corrupt'] == 1
+    assert not os.path.exists(writer.spill_path + '.replay')
+    with open(writer.spill_path + '.bad') as f:
+        assert f.read() == '{"_id": {"$oid": "65a0c3\n'
+
+    # Later spills replay normally instead of queueing behind the bad line
+    spill_during_outage(writer, monkeypatch, make_docs(1))
+    writer._replay_spill()
+    assert mongo.collection('predictions').count_documents({}) == 5
+
+
+def test_replay_keeps_the_file_while_mongo_is_down(mongo, writer, monkeypatch):
+    spill_during_outage(writer, monkeypatch, make_docs(4))
+    with monkeypatch.context() as patch:
+        patch.setattr(writer, '_insert', unreachable)
+        writer._replay_spill()
+    assert os.path.exists(writer.spill_path + '.replay')
+
+    writer._replay_spill()
+    assert mongo.collection('predictions').count_documents({}) == 4
+    assert not os.path.exists(writer.spill_path + '.replay')
+
+
+def test_async_overflow_is_written_off_the_event_loop(tmp_path, monkeypatch):
+    writer = WriteBehindWriter('predictions', max_queue=1, spill_path=str(tmp_path / 'spill.jsonl'))
+    writes = []
+
+    def slow_write(docs):
+        time.sleep(0.2)
+        writes.append((threading.get_ident(), len(docs)))
+        return True
+
+    monkeypatch.setattr(writer, '_write', slow_write)
+    monkeypatch.setattr(writer, '_run', lambda jobs_queue: None)  # Leave the queue full
+
+    async def run():
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticker = asyncio.create_task(tick())
+        await writer.submit_async(make_docs(3))
+        ticker.cancel()
+        return threading.get_ident(), ticks
+
+    loop_thread, ticks = asyncio.run(run())
+    assert writes == [(writes[0][0], 2)]
+    assert writes[0][0] != loop_thread
+    assert ticks >= 5
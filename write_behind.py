@@ -0,0 +1,230 @@
+import os
+import time
+import queue
+import atexit
+import asyncio
+import threading
+from contextlib import contextmanager
+from bson import json_util
+from pymongo.errors import BulkWriteError, PyMongoError
+from database import Database
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+class WriteBehindWriter:
+    """Queue documents in memory and insert them in the background with insert_many"""
+
+    def __init__(self, collection_name, max_queue=10000, batch_size=500, flush_interval=0.5,
+                 max_retries=3, spill_path=None, on_written=None):
+        self.collection_name = collection_name
+        self.on_written = on_written  # Called with the documents that were actually inserted
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.spill_path = spill_path
+        self.written = 0
+        self.spilled = 0
+        self.dropped = 0
+        self.corrupt = 0
+        self.retries = 0
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._spill_lock = threading.Lock()
+
+    def submit(self, docs):
+        """Queue documents for insertion; writes inline if the queue is full"""
+        overflow = self._enqueue(docs)
+        if overflow:
+            self._write(overflow)
+
+    async def submit_async(self, docs):
+        """submit for the event loop: documents that do not fit are written on a worker thread"""
+        overflow = self._enqueue(docs)
+        if overflow:
+            # The inline write may retry, sleep and take the spill file lock
+            await asyncio.get_running_loop().run_in_executor(None, self._write, overflow)
+
+    def _enqueue(self, docs):
+        """Queue what fits; returns the documents that did not"""
+        jobs_queue = self._ensure_worker()
+        overflow = []
+        for doc in docs:
+            try:
+                jobs_queue.put_nowait(doc)
+            except queue.Full:
+                overflow.append(doc)
+        return overflow
+
+    def _ensure_worker(self):
+        # The worker thread does not survive a fork, so start one per process
+        if self._pid == os.getpid() and self._thread.is_alive():
+            return self._queue
+        with self._lock:
+            if self._pid != os.getpid() or not self._thread.is_alive():
+                self._queue = queue.Queue(maxsize=self.max_queue)
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, args=(self._queue,), daemon=True)
+                self._thread.start()
+                self._pid = os.getpid()
+                atexit.register(self.close)
+        return self._queue
+
+    def _run(self, jobs_queue):
+        while not self._stop.is_set():
+            try:
+                batch = self._drain(jobs_queue, self.flush_interval)
+                if batch and not self._write(batch):
+                    continue
+                if self.spill_path and (os.path.exists(self.spill_path) or os.path.exists(self.spill_path + '.replay')):
+                    self._replay_spill()
+            except Exception as e:
+                print(f"✗ Error in {self.collection_name} write-behind worker: {e}")
+
+    def _drain(self, jobs_queue, timeout):
+        try:
+            batch = [jobs_queue.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(jobs_queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _insert(self, docs):
+        collection = Database.collection(self.collection_name)
+        try:
+            collection.insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            # Documents carry client-generated ids, so duplicates mean an earlier attempt landed
+            errors = e.details.get('writeErrors', [])
+            if any(error.get('code') != 11000 for error in errors):
+                raise
+            duplicates = {error['index'] for error in errors}
+            docs = [doc for i, doc in enumerate(docs) if i not in duplicates]
+        if self.on_written and docs:
+            try:
+                self.on_written(docs)
+            except Exception as e:
+                print(f"✗ Error in {self.collection_name} write callback: {e}")
+
+    def _write(self, docs):
+        """Insert with retries, then spill or drop; returns True if Mongo took the write"""
+        for attempt in range(self.max_retries + 1):
+            try:
+                self._insert(docs)
+                self.written += len(docs)
+                return True
+            except PyMongoError as e:
+                error = e
+                if attempt < self.max_retries:
+                    self.retries += 1
+                    time.sleep(min(0.1 * 2 ** attempt, 5))
+
+        if self.spill_path:
+            self._spill(docs)
+        else:
+            self.dropped += len(docs)
+            print(f"✗ Error writing {len(docs)} {self.collection_name} records: {error}")
+        return False
+
+    @contextmanager
+    def _spill_locked(self):
+        """Exclusive use of the spill files across threads and every process sharing the path"""
+        with self._spill_lock:
+            if fcntl is None:
+                yield
+                return
+            # A separate lock file: a worker that opened the spill file before another one
+            # renamed it for replay would otherwise keep appending to the replay file
+            with open(self.spill_path + '.lock', 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _spill(self, docs):
+        with self._spill_locked():
+            with open(self.spill_path, 'a') as f:
+                for doc in docs:
+                    f.write(json_util.dumps(doc) + '\n')
+        self.spilled += len(docs)
+
+    def _replay_spill(self):
+        """Move spilled documents back into Mongo once it is reachable"""
+        replay_path = self.spill_path + '.replay'
+        # Held for the whole replay, so no other worker appends to or replays the same records
+        with self._spill_locked():
+            if not os.path.exists(replay_path):
+                if not os.path.exists(self.spill_path):
+                    return
+                os.replace(self.spill_path, replay_path)
+
+            docs = []
+            try:
+                with open(replay_path, 'r') as f:
+                    for line in f:
+                        if line.strip():
+                            try:
+                                docs.append(json_util.loads(line))
+                            except (ValueError, TypeError):
+                                # E.g. a line cut short when a worker was killed mid-write
+                                self._set_aside(line)
+                        if len(docs) >= self.batch_size:
+                            self._insert(docs)
+                            docs = []
+                if docs:
+                    self._insert(docs)
+            except PyMongoError:
+                # Keep the replay file; already inserted documents are skipped as duplicates next time
+                pass
+            else:
+                os.remove(replay_path)
+                return
+        time.sleep(self.flush_interval)
+
+    def _set_aside(self, line):
+        """Keep an unreadable spill line in <spill path>.bad instead of replaying it"""
+        with open(self.spill_path + '.bad', 'a') as f:
+            f.write(line if line.endswith('\n') else line + '\n')
+        self.corrupt += 1
+        print(f"⚠ Warning: Unreadable {self.collection_name} spill record moved to {self.spill_path}.bad")
+
+    def flush(self):
+        """Write every queued document from the calling thread"""
+        if self._queue is None or self._pid != os.getpid():
+            return
+        while True:
+            batch = self._drain(self._queue, 0)
+            if not batch:
+                break
+            self._write(batch)
+
+    def close(self, timeout=10):
+        """Stop the worker and flush what is left (registered with atexit)"""
+        if self._thread is None or self._pid != os.getpid():
+            return
+        self._stop.set()
+        self._thread.join(timeout)
+        self.flush()
+
+    def stats(self):
+        """Queue depth and write counters"""
+        return {
+            'queued': self._queue.qsize() if self._queue is not None else 0,
+            'written': self.written,
+            'retries': self.retries,
+            'spilled': self.spilled,
+            'dropped': self.dropped,
+            'corrupt': self.corrupt
+        }